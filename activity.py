@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# Carry chain and switching activity of the divider datapath
+#
+# The batch engine of batch_division.py is run with a probe that records,
+# for every lane and every iteration, the longest carry chain of the n-bit
+# adder and the number of bits toggling in the dividend register, the
+# quotient register and the adder output (sum and carry out). Everything is
+# computed on whole uint64 lanes: the carries of an addition are
+# (a + b + cin) ^ a ^ b, so no gate is simulated.
+#
+# The quotient register is written in place, as in divider_core.py: it is
+# cleared at the start of a division and iteration i sets bit n-1-i to the
+# quotient bit, so at most one of its bits toggles per iteration.
+#
+# The carry chain of an addition is the longest distance a carry travels: 1
+# for a carry generated (or the carry in) and not propagated, +1 for every
+# bit position propagating it, 0 when there is no carry at all. It is the
+# number of full adder delays of a ripple carry adder for this addition.
+#
+# usage: python activity.py n [number_of_divisions]
+
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+from batch_division import CHUNK, MAX_N, VARIANTS, _divide_lanes, divide, random_operands, to_lanes
+from divider_core import ParallelAdderEngine
+from helpers import full_adder
+
+
+class DivisionActivity(NamedTuple):
+	carry_chain: np.ndarray       # (n, lanes) per iteration
+	dividend_toggles: np.ndarray
+	quotient_toggles: np.ndarray
+	adder_toggles: np.ndarray
+
+
+# scalar reference, one full adder at a time
+def carry_chain(n, bits_a, bits_b, carry=0):
+	any_carry = carry
+	run = 0
+	longest = 0
+	for i in range(n):
+		bit_a = (bits_a >> i) & 1
+		bit_b = (bits_b >> i) & 1
+		_, carry_out = full_adder(bit_a, bit_b, carry)
+		run = run + 1 if carry and bit_a ^ bit_b else 0
+		longest = max(longest, run)
+		any_carry |= carry_out
+		carry = carry_out
+	return longest + 1 if any_carry else 0
+
+# carry chain of every lane of a + b + cin, n-bit uint64 lanes
+def carry_chain_lanes(n, bits_a, bits_b, carry):
+	carries = (bits_a + bits_b + carry) ^ bits_a ^ bits_b # carry into every bit, bit n is c_out
+	propagated = (bits_a ^ bits_b) & carries & np.uint64((1 << n) - 1)
+	# longest run of ones: the number of x &= x >> 1 steps until x is 0
+	run = np.zeros(carries.shape, dtype=np.uint8)
+	while propagated.any():
+		run += propagated != 0
+		propagated &= propagated >> np.uint64(1)
+	return np.where(carries != 0, run + 1, 0).astype(np.uint8)
+
+
+# probe of _divide_lanes, fills the per iteration arrays of one chunk
+class ActivityProbe:
+	def __init__(self, n, dividend_reg, divisor_reg):
+		self.n = n
+		self.mask = np.uint64((1 << n) - 1)
+		self.divisor_reg = divisor_reg
+		self.iteration = 0
+		self.previous_dividend = dividend_reg.copy()
+		self.previous_quotient = np.zeros_like(dividend_reg)
+		self.previous_sum = np.zeros_like(dividend_reg) # sum and carry out
+		shape = (n, len(dividend_reg))
+		self.activity = DivisionActivity(*(np.empty(shape, dtype=np.uint8) for _ in DivisionActivity._fields))
+
+	def __call__(self, shifted, op_to_perform, dividend_reg, ops):
+		u64 = np.uint64
+		n_u = u64(self.n)
+		i = self.iteration
+		activity = self.activity
+
+		# adder operands: the upper half, divisor or its complement, carry in
+		# 1 for a substraction
+		bits_a = (shifted >> n_u) & self.mask
+		bits_b = self.divisor_reg ^ ((op_to_perform - u64(1)) & self.mask)
+		carry = u64(1) - op_to_perform
+		activity.carry_chain[i] = carry_chain_lanes(self.n, bits_a, bits_b, carry)
+
+		total = bits_a + bits_b + carry
+		activity.adder_toggles[i] = np.bitwise_count(total ^ self.previous_sum)
+		activity.dividend_toggles[i] = np.bitwise_count(dividend_reg ^ self.previous_dividend)
+		# the quotient bit is the complement of the op just shifted in
+		quotient = self.previous_quotient | (((ops & u64(1)) ^ u64(1)) << u64(self.n - 1 - i))
+		activity.quotient_toggles[i] = np.bitwise_count(quotient ^ self.previous_quotient)
+
+		self.previous_sum = total
+		self.previous_dividend = dividend_reg.copy()
+		self.previous_quotient = quotient
+		self.iteration = i + 1
+
+
+# (quotients, remainders, DivisionActivity) of one batch, kept whole
+def division_activity(n, dividends, divisors, variant="parallel"):
+	if not 1 <= n <= MAX_N:
+		raise ValueError("n must be in [1, {}] for uint64 lanes.".format(MAX_N))
+	if variant not in VARIANTS:
+		raise ValueError("Unknown variant {}.".format(variant))
+	dividend_reg, divisor_reg = np.broadcast_arrays(to_lanes(dividends, 2*n), to_lanes(divisors, n))
+	dividend_reg = dividend_reg.reshape(-1).copy()
+	divisor_reg = divisor_reg.reshape(-1).copy()
+	probe = ActivityProbe(n, dividend_reg, divisor_reg)
+	quotients, remainders, _ = _divide_lanes(n, dividend_reg, divisor_reg, variant == "xor_cout", probe)
+	return (quotients, remainders, probe.activity)
+
+
+# histograms over a whole batch run, by chunks: the counts of every carry
+# chain length over all the iterations, of the longest chain of every
+# division, and of every number of toggles per iteration
+def activity_histograms(n, dividends, divisors, variant="parallel"):
+	dividends = np.asarray(dividends).reshape(-1)
+	divisors = np.broadcast_to(np.asarray(divisors), dividends.shape).reshape(-1)
+	histograms = {
+		"carry_chain": np.zeros(n + 2, dtype=np.int64),
+		"division_carry_chain": np.zeros(n + 2, dtype=np.int64),
+		"dividend_toggles": np.zeros(2*n + 1, dtype=np.int64),
+		"quotient_toggles": np.zeros(2, dtype=np.int64),
+		"adder_toggles": np.zeros(n + 2, dtype=np.int64),
+	}
+	for start in range(0, len(dividends), CHUNK):
+		chunk = slice(start, start + CHUNK)
+		_, _, activity = division_activity(n, dividends[chunk], divisors[chunk], variant)
+		for name in DivisionActivity._fields:
+			histograms[name] += np.bincount(getattr(activity, name).reshape(-1), minlength=len(histograms[name]))
+		histograms["division_carry_chain"] += np.bincount(activity.carry_chain.max(axis=0), minlength=n + 2)
+	return histograms
+
+
+def print_histogram(name, counts, width=40):
+	total = counts.sum()
+	mean = (np.arange(len(counts)) * counts).sum() / total
+	print("{}: mean {:.2f}, max {}".format(name, mean, np.flatnonzero(counts).max()))
+	for value in np.flatnonzero(counts):
+		print("  {:3d}  {:8.3%}  {}".format(value, counts[value] / total, "#" * int(round(width * counts[value] / counts.max()))))
+
+
+def main():
+	n = int(sys.argv[1])
+	count = int(float(sys.argv[2])) if len(sys.argv) > 2 else 100000
+
+	dividends, divisors = random_operands(n, count)
+
+	# the probe sees the additions and registers of the scalar engine
+	quotients, remainders, activity = division_activity(n, dividends[:100], divisors[:100])
+	assert all(q == divide(n, int(x), int(d))[0] for q, x, d in zip(quotients, dividends[:100], divisors[:100]))
+	mask = (1 << n) - 1
+	for lane in range(10):
+		engine = ParallelAdderEngine(n, int(dividends[lane]), int(divisors[lane]))
+		previous_dividend = engine.dividend_reg.get()
+		previous_quotient = engine.quotient_reg.get()
+		for state in engine.steps():
+			i = state.iteration
+			bits_a = state.shifted_dividend >> n
+			bits_b = engine.divisor_reg.get() if state.op_to_perform else ~engine.divisor_reg.get() & mask
+			assert carry_chain(n, bits_a, bits_b, 1-state.op_to_perform) == activity.carry_chain[i, lane]
+			assert bin(state.dividend ^ previous_dividend).count("1") == activity.dividend_toggles[i, lane]
+			assert bin(engine.quotient_reg.get() ^ previous_quotient).count("1") == activity.quotient_toggles[i, lane]
+			previous_dividend = state.dividend
+			previous_quotient = engine.quotient_reg.get()
+
+	histograms = activity_histograms(n, dividends, divisors)
+	print("n = {}, {} divisions".format(n, count))
+	for name, counts in histograms.items():
+		print_histogram(name, counts)
+
+
+if __name__ == "__main__":
+	main()
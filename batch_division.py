@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+# NumPy batch engine for the non-restoring divider of schematic_division.py
+#
+# Every lane of the batch runs the exact same algorithm as the scalar script:
+# left shift of the 2n-bit dividend register, add/sub selected by the signs,
+# quotient bit 1-(sign_dividend ^ sign_divisor) and the final quotient and
+# remainder correction. Registers are uint64 lanes, so n is limited to 32.
+#
+# usage: python batch_division.py n [number_of_divisions]
+
+import sys
+import time
+
+import numpy as np
+
+from divider_core import ParallelAdderEngine
+
+MAX_N = 32
+
+# lanes are processed by chunks small enough to stay in cache
+CHUNK = 1 << 16
+
+
+# scalar reference: the engine of schematic_division.py
+def divide(n, dividend, divisor):
+	result = ParallelAdderEngine(n, dividend, divisor).fast_forward()
+	return (result.quotient, result.remainder)
+
+
+# convert an array of (possibly negative) integers to masked uint64 lanes
+def to_lanes(values, n_bits):
+	values = np.asarray(values)
+	if values.dtype.kind == 'u':
+		lanes = values.astype(np.uint64)
+	else:
+		lanes = values.astype(np.int64).view(np.uint64)
+	return lanes & np.uint64((1 << n_bits) - 1)
+
+# two's complement interpretation of n_bits wide uint64 lanes
+def as_signed(lanes, n_bits):
+	lanes = lanes.astype(np.uint64)
+	if n_bits == 64:
+		return lanes.view(np.int64)
+	sign = np.uint64(1 << (n_bits - 1))
+	return (lanes ^ sign).astype(np.int64) - np.int64(1 << (n_bits - 1))
+
+
+# quotient bit rules, named as the engines of divider_core.py
+VARIANTS = ("parallel", "xor_cout")
+
+
+# vectorized non-restoring division of arrays of 2n-bit dividends by n-bit
+# divisors, returns the signed n-bit (quotient, remainder) arrays, and the
+# correction of every lane (0 none, 1 quotient++, 2 quotient--) when
+# corrections is set
+#
+# variant "parallel" takes the quotient bit 1-(sign_dividend ^ sign_divisor)
+# of schematic_division.py, "xor_cout" the 1-(c_out ^ sign_divisor) of
+# schematic_division_xor_cout.py
+def divide_batch(n, dividends, divisors, variant="parallel", corrections=False):
+	if not 1 <= n <= MAX_N:
+		raise ValueError("n must be in [1, {}] for uint64 lanes.".format(MAX_N))
+	if variant not in VARIANTS:
+		raise ValueError("Unknown variant {}.".format(variant))
+
+	dividend_reg = to_lanes(dividends, 2*n)
+	divisor_reg = to_lanes(divisors, n)
+	dividend_reg, divisor_reg = np.broadcast_arrays(dividend_reg, divisor_reg)
+
+	quotients = np.empty(dividend_reg.shape, dtype=np.int64)
+	remainders = np.empty(dividend_reg.shape, dtype=np.int64)
+	correction = np.empty(dividend_reg.shape, dtype=np.uint8)
+	flat_dividends = dividend_reg.reshape(-1)
+	flat_divisors = divisor_reg.reshape(-1)
+	flat_quotients = quotients.reshape(-1)
+	flat_remainders = remainders.reshape(-1)
+	flat_correction = correction.reshape(-1)
+	for start in range(0, flat_dividends.size, CHUNK):
+		chunk = slice(start, start + CHUNK)
+		flat_quotients[chunk], flat_remainders[chunk], flat_correction[chunk] = _divide_lanes(n, flat_dividends[chunk].copy(), flat_divisors[chunk], variant == "xor_cout")
+
+	if corrections:
+		return (quotients, remainders, correction)
+	return (quotients, remainders)
+
+
+# probe, when given, is called after every iteration with the dividend
+# register after the shift (the adder input), op_to_perform, the updated
+# dividend register and the ops (activity.py)
+def _divide_lanes(n, dividend_reg, divisor_reg, quotient_from_carry, probe=None):
+	u64 = np.uint64
+	one = u64(1)
+	n_u = u64(n)
+	mask = u64((1 << n) - 1)
+	mask_2n = u64((1 << (2*n)) - 1)
+	msb_2n = u64(2*n - 1)
+
+	sign_divisor = divisor_reg >> u64(n - 1)
+	sign_dividend_ff = dividend_reg >> msb_2n
+	# operand_b_adder is divisor_reg for an addition and its two's complement
+	# (1 complement + carry_in_adder) for a substraction: select with a mask
+	divisor_select = divisor_reg ^ (u64(0) - divisor_reg)
+
+	sign_dividend = np.empty_like(dividend_reg)
+	op_to_perform = np.empty_like(dividend_reg)
+	operand_b_adder = np.empty_like(dividend_reg)
+	s_out = np.empty_like(dividend_reg)
+	# the op of every iteration (or c_out ^ sign_divisor for the xor_cout
+	# rule) is shifted in at the LSB, the quotient bits are its complement
+	ops = np.zeros_like(dividend_reg)
+	carry = np.empty_like(dividend_reg)
+
+	for i in range(n):
+		np.right_shift(dividend_reg, msb_2n, out=sign_dividend)
+		# left shift the dividend register, bit 2n is dropped by the update below
+		np.left_shift(dividend_reg, one, out=dividend_reg)
+		if probe is not None:
+			shifted = dividend_reg & mask_2n
+		np.bitwise_xor(sign_divisor, sign_dividend, out=op_to_perform)
+		# op_to_perform - 1 is all ones for a substraction, 0 for an addition
+		np.subtract(op_to_perform, one, out=operand_b_adder)
+		operand_b_adder &= divisor_select
+		operand_b_adder ^= divisor_reg
+		np.right_shift(dividend_reg, n_u, out=s_out)
+		s_out += operand_b_adder
+		ops <<= one
+		if quotient_from_carry:
+			# bit n of s_out is c_out ^ sign_dividend for an addition and its
+			# complement for a substraction (operand_b_adder wraps around 64
+			# bits), sign_dividend being the shifted out bit 2n: with
+			# op_to_perform = sign_divisor ^ sign_dividend this leaves
+			# c_out ^ sign_divisor = 1 - bit n (for n = 32 the shift already
+			# dropped bit 2n, and the sign_dividend term stays)
+			np.right_shift(s_out, n_u, out=carry)
+			carry &= one
+			carry ^= one
+			if n == MAX_N:
+				carry ^= sign_dividend
+			ops |= carry
+		else:
+			ops |= op_to_perform
+		s_out &= mask
+		dividend_reg &= mask
+		s_out <<= n_u
+		dividend_reg |= s_out
+		if probe is not None:
+			probe(shifted, op_to_perform, dividend_reg, ops)
+
+	return correct_lanes(n, ~ops & mask, dividend_reg, divisor_reg, sign_dividend_ff)
+
+
+# quotient and remainder correction of uint64 lanes after the n iterations,
+# returns the signed n-bit (quotient, remainder) arrays and the correction of
+# every lane
+def correct_lanes(n, quotient_reg, dividend_reg, divisor_reg, sign_dividend_ff):
+	u64 = np.uint64
+	one = u64(1)
+	mask = u64((1 << n) - 1)
+
+	remainder_reg = dividend_reg >> u64(n)
+	quotient_reg = quotient_reg ^ (one << u64(n - 1))
+	quotient_reg = ((quotient_reg << one) + one) & mask
+	sign_remainder = dividend_reg >> u64(2*n - 1)
+	sign_divisor = divisor_reg >> u64(n - 1)
+	to_correct = sign_remainder != sign_dividend_ff
+	increment = to_correct & (sign_remainder == sign_divisor)
+	decrement = to_correct & ~increment
+	quotient_reg[increment] += one
+	quotient_reg[decrement] -= one
+	quotient_reg &= mask
+	remainder_reg[increment] -= divisor_reg[increment]
+	remainder_reg[decrement] += divisor_reg[decrement]
+	remainder_reg &= mask
+
+	correction = increment.astype(np.uint8) + 2 * decrement.astype(np.uint8)
+	return (as_signed(quotient_reg, n), as_signed(remainder_reg, n), correction)
+
+
+def random_operands(n, count, seed=0):
+	rng = np.random.default_rng(seed)
+	dividends = rng.integers(-(1 << (2*n - 1)), 1 << (2*n - 1), size=count, dtype=np.int64)
+	divisors = rng.integers(-(1 << (n - 1)), 1 << (n - 1), size=count, dtype=np.int64)
+	return (dividends, divisors)
+
+
+def main():
+	n = int(sys.argv[1])
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+	dividends, divisors = random_operands(n, count)
+
+	start = time.perf_counter()
+	quotients, remainders = divide_batch(n, dividends, divisors)
+	batch_time = (time.perf_counter() - start) / count
+
+	# bit-exactness against the scalar algorithm on a sample of the batch
+	n_check = min(count, 2000)
+	start = time.perf_counter()
+	for k in range(n_check):
+		q, r = divide(n, int(dividends[k]), int(divisors[k]))
+		if (q, r) != (quotients[k], remainders[k]):
+			print("mismatch: {} / {}: scalar ({}, {}) batch ({}, {})".format(dividends[k], divisors[k], q, r, quotients[k], remainders[k]))
+			sys.exit(1)
+	scalar_time = (time.perf_counter() - start) / n_check
+
+	print("n = {}, {} divisions, {} checked against the scalar engine".format(n, count, n_check))
+	print("  scalar: {:.3f} us/division".format(scalar_time * 1e6))
+	print("  batch:  {:.3f} us/division".format(batch_time * 1e6))
+	print("  speedup: {:.0f}x".format(scalar_time / batch_time))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# micro-benchmark of the int-backed HardwareRegister against the former
+# list-backed implementation, on the register bookkeeping done by one clock
+# cycle of schematic_division.py
+#
+# usage: python benchmarks/bench_register.py [repeat]
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import HardwareRegister
+
+
+# the list-backed register as it was before, kept here as the baseline
+class ListHardwareRegister:
+	def __init__(self, n_bits):
+		self.n_bits = n_bits
+		self.register = [0] * n_bits
+
+	def set(self, value):
+		for i in range(self.n_bits):
+			self.register[i] = (value >> i) & 1
+
+	def get(self):
+		return sum([(bit << i) for i, bit in enumerate(self.register)])
+
+	def get_as_list(self):
+		return self.register
+
+	def left_shift(self, n):
+		for _ in range(n):
+			self.register.pop(0)
+			self.register.append(0)
+
+	def right_shift(self, n):
+		for _ in range(n):
+			self.register.pop()
+			self.register.insert(0, 0)
+
+	def as_signed(self):
+		return (self.get() + 2 ** (self.n_bits - 1)) % 2 ** self.n_bits - 2 ** (self.n_bits - 1)
+
+	def as_unsigned(self):
+		return self.get()
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return self.register[index.start:index.stop:index.step]
+		else:
+			if index < 0 or index >= self.n_bits:
+				raise IndexError("Index out of range.")
+			return (self.register[index]) & 1
+
+	def __setitem__(self, index, value):
+		if index < 0 or index >= self.n_bits:
+			raise IndexError("Index out of range.")
+		if value not in [0, 1]:
+			raise ValueError("Value must be either 0 or 1.")
+		self.register[index] = value
+
+
+# one clock cycle of schematic_division.py, without the adder
+def division_cycle(n, i, dividend_reg, quotient_reg):
+	sign_dividend = dividend_reg[2*n-1]
+	dividend_reg.as_signed()
+	dividend_reg.set(dividend_reg.get() << 1)
+	dividend_reg.as_signed()
+	operand_a_adder = (dividend_reg.get()>>n) & ((2**n)-1)
+	quotient_reg[n-1-i] = 1-sign_dividend
+	dividend_reg.set((dividend_reg.get() & ((2**n)-1)) | (operand_a_adder<<n))
+
+
+def check_equivalence(n):
+	fast = HardwareRegister(n)
+	slow = ListHardwareRegister(n)
+	for value in (0, 1, (1 << n) - 1, 0x5555555555555555 & ((1 << n) - 1), -3):
+		fast.set(value)
+		slow.set(value)
+		assert fast.get() == slow.get()
+		assert fast.as_signed() == slow.as_signed()
+		assert fast.get_as_list() == slow.get_as_list()
+		assert fast[1:n:2] == slow[1:n:2]
+		fast.left_shift(3)
+		slow.left_shift(3)
+		assert fast.get() == slow.get()
+		fast.right_shift(5)
+		slow.right_shift(5)
+		assert fast.get() == slow.get()
+		fast[n-1] = 1
+		slow[n-1] = 1
+		assert fast.get() == slow.get()
+
+
+def bench(register_class, n, repeat):
+	dividend_reg = register_class(2*n)
+	quotient_reg = register_class(n)
+	dividend_reg.set(0x123456789abcdef)
+	timer = timeit.Timer(lambda: [division_cycle(n, i % n, dividend_reg, quotient_reg) for i in range(8)])
+	number, _ = timer.autorange()
+	return min(timer.repeat(repeat=repeat, number=number)) / (number * 8)
+
+
+def main():
+	repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+	print("{:>6} {:>14} {:>14} {:>9}".format("n", "list (us)", "int (us)", "speedup"))
+	for n in (8, 32, 64, 128, 1024):
+		check_equivalence(n)
+		t_list = bench(ListHardwareRegister, n, repeat)
+		t_int = bench(HardwareRegister, n, repeat)
+		print("{:>6} {:>14.3f} {:>14.3f} {:>8.1f}x".format(n, t_list * 1e6, t_int * 1e6, t_list / t_int))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# time and accuracy of every strategy combination of
+# divider_core.NonRestoringEngine (adder size x quotient bit rule x
+# correction) on one batch of random divisions, with the NumPy batch engine
+# for the quotient bit rules it implements
+#
+# usage: python benchmarks/bench_strategies.py [n] [number_of_divisions]
+
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from batch_division import divide_batch, random_operands
+from divider_core import CORRECTIONS, QUOTIENT_RULES, NonRestoringEngine
+from verify import truncating_divide
+
+# batch_division variant of every quotient bit rule
+BATCH_VARIANTS = {"sign": "parallel", "carry": "xor_cout"}
+
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+	dividends, divisors = random_operands(n, count)
+	# representable divisions only, the others have no expected result
+	expected_quotients, expected_remainders = truncating_divide(dividends, np.where(divisors == 0, 1, divisors))
+	valid = (divisors != 0) & (expected_quotients >= -(1 << (n-1))) & (expected_quotients < (1 << (n-1)))
+	dividends, divisors = dividends[valid], divisors[valid]
+	expected = list(zip(expected_quotients[valid].tolist(), expected_remainders[valid].tolist()))
+	operands = list(zip(dividends.tolist(), divisors.tolist()))
+
+	print("n = {}, {} divisions".format(n, len(operands)))
+	print("  engine  n_add  quotient rule  correction  us/division  wrong results")
+	for n_add, rule, correction in itertools.product(sorted({n, max(1, n // 4), 1}, reverse=True), QUOTIENT_RULES, CORRECTIONS):
+		start = time.perf_counter()
+		results = [NonRestoringEngine(n, dividend, divisor, n_add, rule, correction).fast_forward()[:2] for dividend, divisor in operands]
+		elapsed = (time.perf_counter() - start) / len(operands)
+		wrong = sum(result != expected_result for result, expected_result in zip(results, expected))
+		print("  core    {:5d}  {:13s}  {:10s}  {:11.2f}  {:13d}".format(n_add, rule, correction, elapsed * 1e6, wrong))
+
+	for rule, variant in BATCH_VARIANTS.items():
+		start = time.perf_counter()
+		quotients, remainders = divide_batch(n, dividends, divisors, variant)
+		elapsed = (time.perf_counter() - start) / len(operands)
+		wrong = sum(result != expected_result for result, expected_result in zip(zip(quotients.tolist(), remainders.tolist()), expected))
+		print("  batch  {:>5s}  {:13s}  {:10s}  {:11.2f}  {:13d}".format("n", rule, "standard", elapsed * 1e6, wrong))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+# time of one wide-operand division against the operand width, to track that
+# it stays close to linear in the number of iterations (n big-int operations
+# of n bits each)
+#
+# usage: python benchmarks/bench_wide.py [repeat]
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wide_division import divide_wide, random_wide_operands
+
+WIDTHS = [256, 512, 1024, 2048, 4096]
+
+
+def main():
+	repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+	print("      n     ms/division  ns/iteration")
+	for n in WIDTHS:
+		operands = random_wide_operands(n, repeat)
+		timer = timeit.Timer(lambda: [divide_wide(n, dividend, divisor) for dividend, divisor in operands])
+		seconds = min(timer.repeat(repeat=3, number=1)) / repeat
+		print("  {:5d}  {:14.3f}  {:12.1f}".format(n, seconds * 1e3, seconds / n * 1e9))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+# Bit-sliced batch simulation of the bit-serial adder datapath of
+# schematic_division_n_bit_adder.py
+#
+# A batch of divisions is transposed into bit planes: plane j of a register is
+# an array of uint64 words holding bit j of that register for 64 lanes per
+# word. The 1-bit serial adder then runs as bitwise operations on whole
+# planes, so one Python-level full adder call advances every lane by one
+# clock cycle.
+#
+# usage: python bit_sliced_division.py n [number_of_lanes]
+
+import sys
+import time
+
+import numpy as np
+
+from divider_core import BitSerialAdderEngine
+from batch_division import to_lanes, as_signed, divide_batch, random_operands
+
+LANES_PER_WORD = 64
+
+
+# gates on bit planes, every bit of a word being an independent lane
+def xor_words(word_a, word_b):
+	return word_a ^ word_b
+
+def half_adder_words(word_a, word_b):
+	return (xor_words(word_a, word_b), word_a & word_b)
+
+def full_adder_words(word_a, word_b, carry):
+	sum1, carry1 = half_adder_words(word_a, word_b)
+	sum2, carry2 = half_adder_words(sum1, carry)
+	return (sum2, carry1 | carry2)
+
+
+# transpose n_bits wide values into n_bits planes of ceil(len/64) words
+def to_bit_planes(values, n_bits):
+	lanes = to_lanes(values, n_bits).reshape(-1)
+	n_words = -(-lanes.size // LANES_PER_WORD)
+	padded = np.zeros(n_words * LANES_PER_WORD, dtype=np.uint64)
+	padded[:lanes.size] = lanes
+	bits = ((padded[None, :] >> np.arange(n_bits, dtype=np.uint64)[:, None]) & np.uint64(1)).astype(np.uint8)
+	planes = np.packbits(bits, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+	return list(planes)
+
+# transpose bit planes back into n_lanes uint64 values
+def from_bit_planes(planes, n_lanes):
+	planes = np.asarray(planes, dtype='<u8')
+	bits = np.unpackbits(planes.view(np.uint8), axis=1, bitorder='little')[:, :n_lanes]
+	shifts = np.arange(len(planes), dtype=np.uint64)[:, None]
+	return np.bitwise_or.reduce(bits.astype(np.uint64) << shifts, axis=0)
+
+
+# ripple-carry addition of two n-plane operands with a carry-in plane
+def ripple_add_planes(planes_a, planes_b, carry):
+	sum_planes = []
+	for word_a, word_b in zip(planes_a, planes_b):
+		sum_word, carry = full_adder_words(word_a, word_b, carry)
+		sum_planes.append(sum_word)
+	return (sum_planes, carry)
+
+
+# bit-sliced bit-serial division, returns the signed n-bit quotients and
+# remainders and the number of clock cycles of every lane
+def divide_bit_sliced(n, dividends, divisors):
+	dividends, divisors = np.broadcast_arrays(np.asarray(dividends), np.asarray(divisors))
+	n_lanes = dividends.size
+
+	dividend_reg = to_bit_planes(dividends, 2*n)
+	divisor_reg = to_bit_planes(divisors, n)
+	zero = np.zeros_like(divisor_reg[0])
+	ones = ~zero
+	quotient_reg = [zero] * n
+
+	sign_divisor_ff = divisor_reg[n-1]
+	sign_dividend_ff = dividend_reg[2*n-1]
+	cycles = 0
+
+	for i in range(n):
+		sign_divisor = divisor_reg[n-1]
+		sign_dividend = dividend_reg[2*n-1]
+
+		# left shift the dividend register
+		dividend_reg = [zero] + dividend_reg[:-1]
+
+		op_to_perform = xor_words(sign_divisor, sign_dividend) # addition if 1, substraction if 0
+		not_op = ~op_to_perform
+		quotient_reg[n-1-i] = not_op
+
+		carry_in_adder = not_op
+		for j in range(n): # n clock cycles
+			# divisor bit or its complement (MUX on op_to_perform)
+			operand_b_adder = xor_words(divisor_reg[j], not_op)
+			dividend_reg[n+j], carry_in_adder = full_adder_words(dividend_reg[n+j], operand_b_adder, carry_in_adder)
+			cycles += 1
+
+	# quotient correction
+	remainder_reg = dividend_reg[n:]
+	quotient_reg[n-1] = ~quotient_reg[n-1]
+	quotient_reg = [ones] + quotient_reg[:-1] # shift left and insert 1 at LSB
+
+	sign_remainder = dividend_reg[2*n-1]
+	to_correct = sign_remainder ^ sign_dividend_ff
+	increment = to_correct & ~(sign_remainder ^ sign_divisor_ff)
+	decrement = to_correct & ~increment
+
+	# quotient + 1 where increment, quotient - 1 (+ all ones) where decrement
+	quotient_reg, _ = ripple_add_planes(quotient_reg, [decrement] * n, increment)
+	# remainder - divisor where increment, remainder + divisor where decrement
+	operand_b_adder = [xor_words(word, increment) & to_correct for word in divisor_reg]
+	remainder_reg, _ = ripple_add_planes(remainder_reg, operand_b_adder, increment)
+
+	# the correction reuses the 1-bit serial adder for n more clock cycles
+	corrected = from_bit_planes([to_correct], n_lanes).astype(np.int64)
+	cycle_counts = cycles + n * corrected
+
+	quotients = as_signed(from_bit_planes(quotient_reg, n_lanes), n)
+	remainders = as_signed(from_bit_planes(remainder_reg, n_lanes), n)
+	return (quotients.reshape(dividends.shape), remainders.reshape(dividends.shape), cycle_counts.reshape(dividends.shape))
+
+
+# scalar reference: the engine of schematic_division_n_bit_adder.py, the
+# correction reusing the serial adder for n more clock cycles
+def divide_bit_serial(n, dividend, divisor):
+	result = BitSerialAdderEngine(n, dividend, divisor).fast_forward()
+	return (result.quotient, result.remainder, result.cycles + (n if result.correction else 0))
+
+
+def main():
+	n = int(sys.argv[1])
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+
+	dividends, divisors = random_operands(n, count)
+
+	start = time.perf_counter()
+	quotients, remainders, cycles = divide_bit_sliced(n, dividends, divisors)
+	sliced_time = (time.perf_counter() - start) / count
+
+	# against the batch engine on every lane
+	batch_quotients, batch_remainders = divide_batch(n, dividends, divisors)
+	assert np.array_equal(quotients, batch_quotients), "quotient mismatch with the batch engine"
+	assert np.array_equal(remainders, batch_remainders), "remainder mismatch with the batch engine"
+
+	# against the scalar bit-serial model on a sample of the lanes
+	n_check = min(count, 200)
+	start = time.perf_counter()
+	for k in range(n_check):
+		expected = divide_bit_serial(n, int(dividends[k]), int(divisors[k]))
+		if expected != (quotients[k], remainders[k], cycles[k]):
+			print("lane {}: {} / {}: scalar {} bit-sliced ({}, {}, {})".format(k, dividends[k], divisors[k], expected, quotients[k], remainders[k], cycles[k]))
+			sys.exit(1)
+	scalar_time = (time.perf_counter() - start) / n_check
+
+	print("n = {}, {} lanes, {} checked against the scalar bit-serial model".format(n, count, n_check))
+	for k in range(min(count, 4)):
+		print("  lane {}: {} / {} -> quotient {} remainder {} in {} cycles".format(k, dividends[k], divisors[k], quotients[k], remainders[k], cycles[k]))
+	print("  scalar:      {:.3f} us/division".format(scalar_time * 1e6))
+	print("  bit-sliced:  {:.3f} us/division".format(sliced_time * 1e6))
+	print("  speedup: {:.0f}x".format(scalar_time / sliced_time))
+
+
+if __name__ == "__main__":
+	main()
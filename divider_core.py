@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+
+# Cycle steppers of the non-restoring divider variants
+#
+# Every engine holds the registers of one division and advances them one
+# clock cycle at a time. steps() is a generator yielding an immutable
+# CycleState after every clock cycle, so consumers (plots, tracing,
+# verification, waveforms) pull the states lazily and may stop early.
+# fast_forward() runs the remaining cycles without building any state and
+# returns the DivisionResult.
+#
+# The non-restoring variants are all NonRestoringEngine, configured by the
+# adder size, the quotient bit rule and the correction; these are resolved
+# once at construction so the cycle loop does not test the configuration.
+#
+#   engine = BitSerialAdderEngine(n, dividend, divisor)
+#   for state in engine.steps():
+#       ...
+#   quotient, remainder = engine.fast_forward()[:2]
+#
+# usage: python divider_core.py n dividend divisor [n_add]
+
+import sys
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+from helpers import HardwareRegister, full_adder_n_bits, carry_save_adder, to_signed
+
+
+class CycleState(NamedTuple):
+	cycle: int
+	iteration: int
+	shifted_dividend: int  # dividend register after the shift of the iteration
+	dividend: int          # dividend register at the end of the cycle
+	op_to_perform: int     # 1 for an addition, 0 for a substraction
+	carry: int             # carry out of the adder
+	quotient_bit: int      # quotient bit of the iteration
+
+
+class DivisionResult(NamedTuple):
+	quotient: int
+	remainder: int
+	cycles: int
+	correction: int        # 0 for none, 1 for quotient++, 2 for quotient--
+	partial_quotient: int
+	partial_remainder: int
+
+
+# bit widths of the CycleState and DivisionResult fields, for tracing.Tracer
+def state_signals(n):
+	return [("cycle", 32), ("iteration", 32), ("shifted_dividend", 2*n), ("dividend", 2*n), ("op_to_perform", 1), ("carry", 1), ("quotient_bit", 1)]
+
+def result_signals(n):
+	return [("quotient", n), ("remainder", n), ("cycles", 32), ("correction", 2), ("partial_quotient", n), ("partial_remainder", n)]
+
+
+# quotient bit rules, resolved once by NonRestoringEngine
+def sign_quotient_bit(sign_dividend, sign_divisor, c_out):
+	return 1-(sign_dividend ^ sign_divisor)
+
+# quotient bit from the carry out of the adder (schematic_division_xor_cout.py)
+def carry_quotient_bit(sign_dividend, sign_divisor, c_out):
+	return 1-(c_out ^ sign_divisor)
+
+QUOTIENT_RULES = {
+	"sign": sign_quotient_bit,
+	"carry": carry_quotient_bit,
+}
+
+
+# corrections of the quotient and remainder registers once the iterations
+# are done, return the correction applied (0 for none, 1 for quotient++ and
+# remainder - divisor, 2 for quotient-- and remainder + divisor)
+def standard_correction(engine):
+	n = engine.n
+	sign_remainder = engine.dividend_reg[2*n-1]
+	if sign_remainder == engine.sign_dividend_ff:
+		return 0
+	if sign_remainder == engine.sign_divisor_ff:
+		engine.quotient_reg.set(engine.quotient_reg.get() + 1)
+		engine.remainder_reg.set(engine.remainder_reg.get() - engine.divisor_reg.get())
+		return 1
+	engine.quotient_reg.set(engine.quotient_reg.get() - 1)
+	engine.remainder_reg.set(engine.remainder_reg.get() + engine.divisor_reg.get())
+	return 2
+
+# standard correction, then one more step when the remainder is +-divisor:
+# this is the exact division with a remainder of 0, which the standard
+# correction misses for negative dividends (verify.py)
+def exact_correction(engine):
+	correction = standard_correction(engine)
+	remainder = engine.remainder_reg.get()
+	divisor = engine.divisor_reg.get()
+	if remainder == 0:
+		return correction
+	if remainder == divisor:
+		engine.quotient_reg.set(engine.quotient_reg.get() + 1)
+		engine.remainder_reg.set(0)
+		return 1
+	if remainder == (-divisor & engine.mask):
+		engine.quotient_reg.set(engine.quotient_reg.get() - 1)
+		engine.remainder_reg.set(0)
+		return 2
+	return correction
+
+CORRECTIONS = {
+	"standard": standard_correction,
+	"exact": exact_correction,
+}
+
+
+class DividerEngine(ABC):
+	_correct = staticmethod(standard_correction)
+
+	def __init__(self, n, dividend, divisor):
+		self.n = n
+		self.divisor_reg  = HardwareRegister(n)
+		self.dividend_reg = HardwareRegister(2*n)
+		self.quotient_reg = HardwareRegister(n)
+		self.remainder_reg = HardwareRegister(n)
+
+		self.divisor_reg.set(divisor)
+		self.dividend_reg.set(dividend)
+		self.sign_divisor_ff = self.divisor_reg[n-1]
+		self.sign_dividend_ff = self.dividend_reg[2*n-1]
+		self.mask = (2**n)-1
+
+		self.cycle = 0
+		self.iteration = 0
+		self.shifted_dividend = self.dividend_reg.get()
+		self.op_to_perform = 0
+		self.carry = 0
+		self.quotient_bit = 0
+		self._result = None
+
+	@property
+	def done(self):
+		return self.iteration == self.n
+
+	# one clock cycle
+	@abstractmethod
+	def _step(self):
+		pass
+
+	def steps(self):
+		while self.iteration < self.n:
+			cycle = self.cycle
+			iteration = self.iteration
+			self._step()
+			yield CycleState(cycle, iteration, self.shifted_dividend, self.dividend_reg.get(), self.op_to_perform, self.carry, self.quotient_bit)
+
+	def fast_forward(self):
+		step = self._step
+		n = self.n
+		while self.iteration < n:
+			step()
+		return self.result()
+
+	# quotient correction, once all the iterations are done
+	def result(self):
+		if self._result is not None:
+			return self._result
+		if not self.done:
+			raise RuntimeError("The division is not finished.")
+
+		n = self.n
+		dividend_reg = self.dividend_reg
+		quotient_reg = self.quotient_reg
+		remainder_reg = self.remainder_reg
+		partial_quotient = quotient_reg.get()
+		partial_remainder = dividend_reg.get()>>n
+
+		remainder_reg.set(dividend_reg.get()>>n)
+		quotient_reg[n-1] = 1 - quotient_reg[n-1]
+		quotient_reg.set((quotient_reg.get()<<1)+1) # shift left and insert 1 at LSB
+
+		correction = self._correct(self)
+
+		self._result = DivisionResult(quotient_reg.as_signed(), remainder_reg.as_signed(), self.cycle, correction, partial_quotient, partial_remainder)
+		return self._result
+
+
+# non-restoring divider with an n_add bit adder (n by default), the divisor
+# is added in chunks of n_add bits LSB first with the carry kept in a
+# flip-flop between chunks, ceil(n/n_add) clock cycles per iteration (the
+# last chunk is narrower when n_add does not divide n)
+#
+# The quotient bit rule (QUOTIENT_RULES) and the correction (CORRECTIONS) are
+# strategies resolved at construction, as is the step function: a single
+# chunk adder runs _step_parallel, which has no chunk bookkeeping.
+class NonRestoringEngine(DividerEngine):
+	def __init__(self, n, dividend, divisor, n_add=None, quotient_rule="sign", correction="standard"):
+		if n_add is None:
+			n_add = n
+		if not 1 <= n_add <= n:
+			raise ValueError("The adder size must be in [1, n].")
+		super().__init__(n, dividend, divisor)
+		self.n_add = n_add
+		self.chunk = 0
+		self.n_chunks = -(-n // n_add)
+		self._quotient_bit = QUOTIENT_RULES[quotient_rule]
+		self._correct = CORRECTIONS[correction]
+		self._step = self._step_parallel if self.n_chunks == 1 else self._step_chunk
+
+	def _step_parallel(self):
+		n = self.n
+		mask = self.mask
+		divisor_reg = self.divisor_reg
+		dividend_reg = self.dividend_reg
+
+		# get the signs of the divisor and dividend
+		sign_divisor = divisor_reg[n-1]
+		sign_dividend = dividend_reg[2*n-1]
+
+		# left shift the dividend register
+		dividend_reg.set(dividend_reg.get() << 1)
+		self.shifted_dividend = dividend_reg.get()
+
+		# get the mathematical operation to do depending on the signs
+		op_to_perform = sign_divisor ^ sign_dividend # xor: addition if 1, substraction if 0
+
+		# get the adder operand depending on op_to_perform (MUX)
+		if op_to_perform == 1:
+			operand_b_adder = divisor_reg.get()
+		else:
+			operand_b_adder = ~divisor_reg.get() & mask
+
+		operand_a_adder = (dividend_reg.get()>>n) & mask # get the n msb of the 2xdividend
+		s_out, c_out = full_adder_n_bits(n, operand_a_adder, operand_b_adder, 1-op_to_perform)
+
+		quotient_bit = self._quotient_bit(sign_dividend, sign_divisor, c_out)
+		self.quotient_reg[n-1-self.iteration] = quotient_bit
+
+		# s_out is used to update the dividend register upper part without affecting the lower part
+		dividend_reg.set((dividend_reg.get() & mask) | (s_out<<n))
+
+		self.op_to_perform = op_to_perform
+		self.carry = c_out
+		self.quotient_bit = quotient_bit
+		self.cycle += 1
+		self.iteration += 1
+
+	# the step of the class, __init__ binds the one of the adder size
+	_step = _step_parallel
+
+	def _step_chunk(self):
+		n = self.n
+		n_add = self.n_add
+		dividend_reg = self.dividend_reg
+
+		if self.chunk == 0:
+			# get the signs of the divisor and dividend
+			self.sign_divisor = self.divisor_reg[n-1]
+			self.sign_dividend = dividend_reg[2*n-1]
+
+			# left shift the dividend register
+			dividend_reg.set(dividend_reg.get() << 1)
+			self.shifted_dividend = dividend_reg.get()
+
+			# get the mathematical operation to do depending on the signs
+			self.op_to_perform = self.sign_divisor ^ self.sign_dividend # xor: addition if 1, substraction if 0
+			carry_in_adder = 1-self.op_to_perform
+		else:
+			carry_in_adder = self.carry # carry flip-flop
+
+		low = self.chunk * n_add
+		width = min(n_add, n - low)
+		chunk_mask = (1 << width) - 1
+
+		# divisor chunk, or its complement (MUX)
+		divisor_chunk = (self.divisor_reg.get() >> low) & chunk_mask
+		if self.op_to_perform == 1:
+			operand_b_adder = divisor_chunk
+		else:
+			operand_b_adder = ~divisor_chunk & chunk_mask
+
+		operand_a_adder = (dividend_reg.get() >> (n + low)) & chunk_mask
+		s_out, c_out = full_adder_n_bits(width, operand_a_adder, operand_b_adder, carry_in_adder)
+		dividend_reg.set((dividend_reg.get() & ~(chunk_mask << (n + low))) | (s_out << (n + low)))
+
+		self.carry = c_out
+		self.cycle += 1
+		if self.chunk == self.n_chunks-1:
+			# the carry out of the last chunk is the carry out of the n bit addition
+			self.quotient_bit = self._quotient_bit(self.sign_dividend, self.sign_divisor, c_out)
+			self.quotient_reg[n-1-self.iteration] = self.quotient_bit
+			self.chunk = 0
+			self.iteration += 1
+		else:
+			self.chunk += 1
+
+
+# n bit adder, one iteration per clock cycle (schematic_division.py)
+class ParallelAdderEngine(NonRestoringEngine):
+	def __init__(self, n, dividend, divisor):
+		super().__init__(n, dividend, divisor)
+
+
+# quotient bit from the carry out of the adder (schematic_division_xor_cout.py)
+class XorCoutEngine(NonRestoringEngine):
+	def __init__(self, n, dividend, divisor):
+		super().__init__(n, dividend, divisor, quotient_rule="carry")
+
+
+# number of leading iterations of a division that an early termination
+# divider skips (0 if none): while the shifted upper half of the dividend
+# stays below the divisor in magnitude, the partial remainder keeps the
+# opposite sign of the dividend, so these iterations only add the same
+# quotient bit and the partial remainder after s of them is
+# upper(dividend << s) -+ divisor. The bound only uses the leading sign count
+# of the dividend and the leading zero count of |divisor|, as a normalizer
+# would.
+def redundant_iterations(n, dividend, divisor):
+	divisor = to_signed(divisor, n)
+	if divisor == 0:
+		return 0
+	dividend = to_signed(dividend, 2*n)
+	dividend_length = (dividend if dividend >= 0 else ~dividend).bit_length()
+	skipped = min(n, abs(divisor).bit_length() + n - dividend_length)
+	return skipped if skipped >= 2 else 0
+
+
+# variable latency non-restoring divider: one normalization cycle (leading
+# sign count and shift of the dividend) replaces the redundant iterations
+# (redundant_iterations), whose quotient bits are known, followed by the
+# add of the last skipped iteration and the remaining iterations. Results
+# are the ones of NonRestoringEngine with the same adder size and correction.
+class EarlyTerminationEngine(NonRestoringEngine):
+	def __init__(self, n, dividend, divisor, n_add=None, correction="standard"):
+		super().__init__(n, dividend, divisor, n_add, "sign", correction)
+		self.skipped = redundant_iterations(n, dividend, divisor)
+		if self.skipped:
+			self._normalize()
+
+	def _normalize(self):
+		n = self.n
+		mask = self.mask
+		skipped = self.skipped
+		dividend_reg = self.dividend_reg
+
+		# the first iteration subtracts or adds the divisor, the following
+		# ones do the opposite
+		op_to_perform = self.sign_divisor_ff ^ self.sign_dividend_ff
+		if op_to_perform == 1:
+			operand_b_adder = self.divisor_reg.get()
+		else:
+			operand_b_adder = ~self.divisor_reg.get() & mask
+
+		dividend_reg.set(dividend_reg.get() << skipped)
+		self.shifted_dividend = dividend_reg.get()
+		operand_a_adder = (dividend_reg.get()>>n) & mask
+		s_out, c_out = full_adder_n_bits(n, operand_a_adder, operand_b_adder, 1-op_to_perform)
+		dividend_reg.set((dividend_reg.get() & mask) | (s_out<<n))
+
+		self.quotient_reg[n-1] = 1 - op_to_perform
+		for i in range(1, skipped):
+			self.quotient_reg[n-1-i] = op_to_perform
+
+		self.op_to_perform = op_to_perform
+		self.carry = c_out
+		self.quotient_bit = op_to_perform if skipped > 1 else 1 - op_to_perform
+		self.cycle = 1 + self.n_chunks # normalization, then the add on the n_add bit adder
+		self.iteration = skipped
+
+
+# n bit adder replaced by a carry-save adder row: the upper half of the
+# dividend register is kept as a sum and a carry vector, and the sign needed
+# by the next iteration is estimated from the estimate_bits MSBs of the two
+# vectors. When the carry coming from the lower bits could flip the estimated
+# sign, the sign is resolved exactly with the n bit adder (counted in
+# resolutions). The remainder is resolved once, after the last iteration.
+class CarrySaveEngine(DividerEngine):
+	def __init__(self, n, dividend, divisor, estimate_bits=4):
+		super().__init__(n, dividend, divisor)
+		self.estimate_bits = min(estimate_bits, n)
+		self.sum_reg = HardwareRegister(n)
+		self.carry_reg = HardwareRegister(n)
+		self.sum_reg.set(self.dividend_reg.get() >> n)
+		self.resolutions = 0
+
+	# sign of sum + carry
+	def _sign(self):
+		n = self.n
+		k = self.estimate_bits
+		estimate, _ = full_adder_n_bits(k, self.sum_reg.get() >> (n-k), self.carry_reg.get() >> (n-k))
+		# a carry from the n-k lower bits adds 1 to the estimate, it only
+		# matters when that changes the MSB
+		if estimate != (1 << (k-1)) - 1 and estimate != (1 << k) - 1:
+			return estimate >> (k-1)
+		self.resolutions += 1
+		upper, _ = full_adder_n_bits(n, self.sum_reg.get(), self.carry_reg.get())
+		return upper >> (n-1)
+
+	def _step(self):
+		n = self.n
+		mask = self.mask
+		divisor_reg = self.divisor_reg
+		dividend_reg = self.dividend_reg
+
+		# get the signs of the divisor and dividend
+		sign_divisor = divisor_reg[n-1]
+		sign_dividend = self._sign()
+
+		# left shift the dividend register, both vectors of the upper half
+		self.sum_reg.set((self.sum_reg.get() << 1) | (dividend_reg.get() >> (n-1) & 1))
+		self.carry_reg.set(self.carry_reg.get() << 1)
+		dividend_reg.set(dividend_reg.get() << 1)
+		self.shifted_dividend = (dividend_reg.get() & mask) | (((self.sum_reg.get() + self.carry_reg.get()) & mask) << n)
+
+		# get the mathematical operation to do depending on the signs
+		op_to_perform = sign_divisor ^ sign_dividend # xor: addition if 1, substraction if 0
+
+		# get the adder operand depending on op_to_perform (MUX)
+		if op_to_perform == 1:
+			operand_b_adder = divisor_reg.get()
+		else:
+			operand_b_adder = ~divisor_reg.get() & mask
+
+		# the carry in of the substraction goes in the free LSB of the carry vector
+		s_out, c_out = carry_save_adder(n, self.sum_reg.get(), self.carry_reg.get(), operand_b_adder)
+		self.sum_reg.set(s_out)
+		self.carry_reg.set((c_out << 1) | (1-op_to_perform))
+
+		quotient_bit = 1-(sign_dividend ^ sign_divisor)
+		self.quotient_reg[n-1-self.iteration] = quotient_bit
+
+		self.op_to_perform = op_to_perform
+		self.carry = c_out >> (n-1)
+		self.quotient_bit = quotient_bit
+		self.cycle += 1
+		self.iteration += 1
+
+	def steps(self):
+		n = self.n
+		for state in super().steps():
+			# the dividend as the sum of the two vectors, for the consumers only
+			upper = (self.sum_reg.get() + self.carry_reg.get()) & self.mask
+			yield state._replace(dividend=(self.dividend_reg.get() & self.mask) | (upper << n))
+
+	def result(self):
+		if self._result is None and self.done:
+			# final carry propagation of the remainder
+			n = self.n
+			upper, _ = full_adder_n_bits(n, self.sum_reg.get(), self.carry_reg.get())
+			self.dividend_reg.set((self.dividend_reg.get() & self.mask) | (upper << n))
+		return super().result()
+
+
+# n_add bit adder (exploration/simulate_latency.py)
+class DigitSerialAdderEngine(NonRestoringEngine):
+	def __init__(self, n, dividend, divisor, n_add):
+		super().__init__(n, dividend, divisor, n_add=n_add)
+
+
+# 1 bit serial adder, n clock cycles per iteration
+# (schematic_division_n_bit_adder.py)
+class BitSerialAdderEngine(NonRestoringEngine):
+	def __init__(self, n, dividend, divisor):
+		super().__init__(n, dividend, divisor, n_add=1)
+
+
+engines = {
+	"parallel": ParallelAdderEngine,
+	"xor_cout": XorCoutEngine,
+	"bit_serial": BitSerialAdderEngine,
+	"carry_save": CarrySaveEngine,
+}
+
+# engines taking the adder size as an extra argument
+parametric_engines = {
+	"digit_serial": DigitSerialAdderEngine,
+	"early_termination": EarlyTerminationEngine,
+}
+
+
+def main():
+	n = int(sys.argv[1])
+	dividend = int(sys.argv[2])
+	divisor = int(sys.argv[3])
+
+	for name, engine_class in engines.items():
+		engine = engine_class(n, dividend, divisor)
+		states = list(engine.steps())
+		result = engine.result()
+		assert result == engine_class(n, dividend, divisor).fast_forward()
+		print("{}: {} cycles, quotient {} remainder {}".format(name, len(states), result.quotient, result.remainder))
+
+	if len(sys.argv) > 4:
+		n_add = int(sys.argv[4])
+		for name, engine_class in parametric_engines.items():
+			result = engine_class(n, dividend, divisor, n_add).fast_forward()
+			print("{} (n_add = {}): {} cycles, quotient {} remainder {}".format(name, n_add, result.cycles, result.quotient, result.remainder))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+# Precomputed quotient/remainder lookup tables for small n
+#
+# For n <= MAX_N the 2^(3n) (dividend, divisor) pairs are run once through
+# the batch engine and the quotient, remainder and correction of every pair
+# are stored as .npy files, indexed by the concatenation of the 2n-bit
+# dividend and the n-bit divisor. The files are opened with
+# np.load(mmap_mode='r') so a query is a fancy indexing of the mapped arrays
+# and only touches the pages it needs.
+#
+# Every table directory holds a meta.json with the table format version and
+# a hash of the engine source, a table built by another version of the
+# engine is rebuilt.
+#
+# usage: python division_tables.py n [variant] [--directory DIR]
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import batch_division
+from batch_division import VARIANTS, divide_batch, random_operands, to_lanes
+
+MAX_N = 10
+
+TABLE_VERSION = 1
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "division_tables")
+
+# number of pairs computed per block when building a table
+BUILD_BLOCK = 1 << 22
+
+
+# hash of the source of the batch engine, the tables depend on it
+def engine_hash():
+	with open(batch_division.__file__, "rb") as source:
+		return hashlib.sha256(source.read()).hexdigest()
+
+
+def table_path(n, variant, directory=TABLE_DIR):
+	return os.path.join(directory, variant, "n{}".format(n))
+
+
+# index of the (dividend, divisor) pairs in the tables
+def table_index(n, dividends, divisors):
+	dividend_lanes = to_lanes(dividends, 2*n)
+	divisor_lanes = to_lanes(divisors, n)
+	return ((dividend_lanes << np.uint64(n)) | divisor_lanes).astype(np.intp)
+
+
+def build_table(n, variant="parallel", directory=TABLE_DIR):
+	if not 1 <= n <= MAX_N:
+		raise ValueError("n must be in [1, {}] for a table.".format(MAX_N))
+	path = table_path(n, variant, directory)
+	os.makedirs(path, exist_ok=True)
+
+	size = 1 << (3*n)
+	# int8 holds the quotients and remainders up to n = 8
+	dtype = np.int8 if n <= 8 else np.int16
+	quotients = np.lib.format.open_memmap(os.path.join(path, "quotient.npy"), mode="w+", dtype=dtype, shape=(size,))
+	remainders = np.lib.format.open_memmap(os.path.join(path, "remainder.npy"), mode="w+", dtype=dtype, shape=(size,))
+	corrections = np.lib.format.open_memmap(os.path.join(path, "correction.npy"), mode="w+", dtype=np.uint8, shape=(size,))
+
+	divisor_mask = (1 << n) - 1
+	for start in range(0, size, BUILD_BLOCK):
+		index = np.arange(start, min(start + BUILD_BLOCK, size), dtype=np.uint64)
+		block = slice(start, start + index.size)
+		quotients[block], remainders[block], corrections[block] = divide_batch(n, index >> np.uint64(n), index & np.uint64(divisor_mask), variant, corrections=True)
+	for table in (quotients, remainders, corrections):
+		table.flush()
+	del quotients, remainders, corrections
+
+	# written last, a partially built table has no meta.json
+	meta = {"version": TABLE_VERSION, "engine": engine_hash(), "n": n, "variant": variant}
+	with open(os.path.join(path, "meta.json"), "w") as meta_file:
+		json.dump(meta, meta_file)
+
+
+def is_up_to_date(n, variant="parallel", directory=TABLE_DIR):
+	try:
+		with open(os.path.join(table_path(n, variant, directory), "meta.json")) as meta_file:
+			meta = json.load(meta_file)
+	except (OSError, ValueError):
+		return False
+	return meta == {"version": TABLE_VERSION, "engine": engine_hash(), "n": n, "variant": variant}
+
+
+class DivisionTable:
+	__slots__ = ("n", "variant", "quotients", "remainders", "corrections")
+
+	def __init__(self, n, variant, directory=TABLE_DIR):
+		path = table_path(n, variant, directory)
+		self.n = n
+		self.variant = variant
+		self.quotients = np.load(os.path.join(path, "quotient.npy"), mmap_mode="r")
+		self.remainders = np.load(os.path.join(path, "remainder.npy"), mmap_mode="r")
+		self.corrections = np.load(os.path.join(path, "correction.npy"), mmap_mode="r")
+
+	# same results as batch_division.divide_batch, without any simulation
+	def divide(self, dividends, divisors, corrections=False):
+		index = table_index(self.n, *np.broadcast_arrays(np.asarray(dividends), np.asarray(divisors)))
+		quotients = self.quotients[index].astype(np.int64)
+		remainders = self.remainders[index].astype(np.int64)
+		if corrections:
+			return (quotients, remainders, self.corrections[index])
+		return (quotients, remainders)
+
+
+# the table of (n, variant), built first when missing or stale
+def load_table(n, variant="parallel", directory=TABLE_DIR):
+	if variant not in VARIANTS:
+		raise ValueError("Unknown variant {}.".format(variant))
+	if not is_up_to_date(n, variant, directory):
+		build_table(n, variant, directory)
+	return DivisionTable(n, variant, directory)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Build (if needed) and check the division lookup table of n.")
+	parser.add_argument("n", type=int)
+	parser.add_argument("variant", nargs="?", choices=VARIANTS, default="parallel")
+	parser.add_argument("--directory", default=TABLE_DIR)
+	parser.add_argument("--count", type=int, default=1000000, help="random divisions checked against the batch engine")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	n = args.n
+
+	start = time.perf_counter()
+	up_to_date = is_up_to_date(n, args.variant, args.directory)
+	table = load_table(n, args.variant, args.directory)
+	print("n = {} {}: table {} in {:.2f} s".format(n, args.variant, "loaded" if up_to_date else "built", time.perf_counter() - start))
+
+	dividends, divisors = random_operands(n, args.count)
+
+	start = time.perf_counter()
+	results = table.divide(dividends, divisors, corrections=True)
+	table_time = (time.perf_counter() - start) / args.count
+
+	start = time.perf_counter()
+	expected = divide_batch(n, dividends, divisors, args.variant, corrections=True)
+	batch_time = (time.perf_counter() - start) / args.count
+
+	for result, expected_result in zip(results, expected):
+		assert np.array_equal(result, expected_result), "table mismatch with the batch engine"
+	print("  {} divisions checked against the batch engine".format(args.count))
+	print("  batch: {:.4f} us/division".format(batch_time * 1e6))
+	print("  table: {:.4f} us/division".format(table_time * 1e6))
+	print("  speedup: {:.1f}x".format(batch_time / table_time))
+
+
+if __name__ == "__main__":
+	main()
@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 import argparse
+import os
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import figures
+import results
+from evaluation_cache import EvaluationCache, definition_hash, model_hash
+
 # Figure width base on the column width of the Latex document.
 fig_width = 252
 fig_text_width = 516
@@ -106,6 +113,68 @@ models = {
 	}
 }
 
+# delay in ns of one gate of every kind of the models (of one bit for HA, FA
+# and MUX), REG and DFF being the clock to output delay plus the setup time.
+# The transistor count models are given the delays of a generic 130 nm
+# library, sky130_hd those of the sky130_fd_sc_hd cells (tt corner)
+delays = {
+	"pessimistic": {
+		"NOT": 0.06,
+		"OR": 0.18,
+		"NOR": 0.12,
+		"NAND": 0.09,
+		"XOR": 0.22,
+		"XNOR": 0.22,
+		"HA": 0.3,
+		"FA": 0.45,
+		"DFF": 0.52,
+		"REG": 0.52,
+		"MUX": 0.3
+	},
+	"optimistic": {
+		"NOT": 0.03,
+		"OR": 0.09,
+		"NOR": 0.06,
+		"NAND": 0.045,
+		"AND": 0.09,
+		"XOR": 0.11,
+		"XNOR": 0.11,
+		"HA": 0.15,
+		"FA": 0.22,
+		"DFF": 0.26,
+		"REG": 0.26,
+		"MUX": 0.15
+	},
+	"average": {
+		"NOT": 0.04,
+		"OR": 0.12,
+		"NOR": 0.08,
+		"NAND": 0.06,
+		"AND": 0.12,
+		"XOR": 0.15,
+		"XNOR": 0.15,
+		"HA": 0.2,
+		"FA": 0.3,
+		"DFF": 0.35,
+		"REG": 0.35,
+		"MUX": 0.2
+	},
+	"sky130_hd": {
+		"NOT": 0.05,
+		"OR": 0.22,
+		"NOR": 0.12,
+		"NAND": 0.08,
+		"AND": 0.15,
+		"XOR": 0.2,
+		"XNOR": 0.2,
+		"HA": 0.25,
+		"FA": 0.4,
+		"DFF": 0.45,
+		"REG": 0.45,
+		"MUX": 0.3
+	}
+}
+
 circuits = {
 	"div_non_restoring_32b":
 	{
@@ -114,15 +183,19 @@ circuits = {
 		{
 			"NAND": {"number": 32, "args": [0]},
 			"FA": {"number": 1, "args": [32]},
-		}
+		},
+		"critical_path": [{"REG": 1, "NAND": 1, "FA": 32}]
 	}
 }
 
 
+# "critical_path" lists the register to register paths of a circuit, as the
+# number of gates of every kind each path goes through, its clock period
+# being the delay of the slowest one (clock_period)
 parametric_circuits = {
 	"div_non_restoring_bit_serial_adder_2REG": lambda n_div, n_add:
 	{
-		"latency": n_div*(n_div//n_add),
+		"latency": n_div*(-(-n_div//n_add)),
 		"gates":
 		{
 			"NOT": {"number": n_div+1, "args": [0]},
@@ -130,11 +203,12 @@ parametric_circuits = {
 			"MUX": {"number": 1, "args": [n_div]},
 			"FA":  {"number": 1, "args": [n_add]},
 			"REG": {"number": 2, "args": [n_div]},
-		}
+		},
+		"critical_path": [{"REG": 1, "XOR": 1, "FA": n_add, "MUX": 1}]
 	},
 	"div_non_restoring_bit_serial_adder_3REG": lambda n_div, n_add:
 	{
-		"latency": n_div*(n_div//n_add),
+		"latency": n_div*(-(-n_div//n_add)),
 		"gates":
 		{
 			"NOT": {"number": n_div+1, "args": [0]},
@@ -142,7 +216,85 @@ parametric_circuits = {
 			"MUX": {"number": 1, "args": [n_div]},
 			"FA":  {"number": 1, "args": [n_add]},
 			"REG": {"number": 3, "args": [n_div]},
-		}
+		},
+		"critical_path": [{"REG": 1, "XOR": 1, "FA": n_add, "MUX": 1}]
+	},
+	# srt_division.py: one digit of {-1, 0, 1} per iteration, the partial
+	# remainder adder is chunked like the bit-serial adder. The digit is
+	# selected from the 3 MSBs of the partial remainder, Q and QM are
+	# assimilated on the fly (no correction adder)
+	"div_srt_radix2": lambda n_div, n_add:
+	{
+		"latency": n_div*(-(-n_div//n_add)),
+		"gates":
+		{
+			"NOT": {"number": n_div+1, "args": [0]},
+			"NAND": {"number": 4, "args": [0]},
+			"XOR": {"number": 1, "args": [0]},
+			"MUX": {"number": 3, "args": [n_div]},
+			"FA":  {"number": 1, "args": [n_add]},
+			"REG": {"number": 4, "args": [n_div]},
+		},
+		"critical_path": [{"REG": 1, "NAND": 2, "MUX": 2, "FA": n_add}]
+	},
+	# radix 4: digits of {-2, ..., 2}, n_div//2+1 iterations, 2D is a shift.
+	# The selection table (8 divisor intervals x 44 remainder intervals) is
+	# counted as NAND gates
+	"div_srt_radix4": lambda n_div, n_add:
+	{
+		"latency": (n_div//2+1)*(-(-n_div//n_add)),
+		"gates":
+		{
+			"NOT": {"number": n_div+1, "args": [0]},
+			"NAND": {"number": 64, "args": [0]},
+			"XOR": {"number": 1, "args": [0]},
+			"MUX": {"number": 6, "args": [n_div]},
+			"FA":  {"number": 1, "args": [n_add]},
+			"REG": {"number": 4, "args": [n_div]},
+		},
+		"critical_path": [{"REG": 1, "NAND": 4, "MUX": 2, "FA": n_add}]
+	},
+	# divider_core.CarrySaveEngine: the upper half of the dividend is a sum
+	# and a carry register updated by a CSA row (n_div FA) in one cycle, the
+	# sign is estimated by a 4 bit adder and the remainder is resolved at the
+	# end by the n_add bit adder. The latency leaves out the iterations
+	# needing an exact sign resolution (simulate_latency.py --carry-save)
+	# The clock fits both the iterations (4 bit sign estimate and a CSA FA)
+	# and the resolution cycles (n_add bit adder)
+	"div_non_restoring_carry_save": lambda n_div, n_add:
+	{
+		"latency": n_div + (-(-n_div//n_add)),
+		"gates":
+		{
+			"NOT": {"number": n_div+1, "args": [0]},
+			"NAND": {"number": 2, "args": [0]},
+			"XOR": {"number": 1, "args": [0]},
+			"MUX": {"number": 1, "args": [n_div]},
+			"FA":  {"number": 1, "args": [n_div + n_add + 4]},
+			"REG": {"number": 3, "args": [n_div]},
+		},
+		"critical_path": [{"REG": 1, "FA": 5, "XOR": 1, "MUX": 1}, {"REG": 1, "FA": n_add, "MUX": 1}]
+	},
+	# divider_core.EarlyTerminationEngine: the bit-serial divider with a
+	# leading sign counter of the dividend, a leading zero counter of the
+	# divisor and a barrel shifter of the dividend register (log2(2 n_div)
+	# stages of 2 n_div MUX), which skip the redundant iterations in one
+	# cycle. The latency is the worst case (no iteration skipped), the mean
+	# over an operand distribution comes from latency_distribution.py
+	# The skipping cycle is a path through the counters and the shifter
+	"div_non_restoring_early_termination": lambda n_div, n_add:
+	{
+		"latency": n_div*(-(-n_div//n_add)),
+		"gates":
+		{
+			"NOT": {"number": n_div+1, "args": [0]},
+			"NAND": {"number": 3*n_div, "args": [0]},
+			"XOR": {"number": 2*n_div+1, "args": [0]},
+			"MUX": {"number": 1, "args": [n_div + 2*n_div*(2*n_div-1).bit_length()]},
+			"FA":  {"number": 1, "args": [n_add]},
+			"REG": {"number": 2, "args": [n_div]},
+		},
+		"critical_path": [{"REG": 1, "XOR": 1, "FA": n_add, "MUX": 1}, {"REG": 1, "XOR": 1, "NAND": (2*n_div-1).bit_length(), "MUX": (2*n_div-1).bit_length()}]
 	}
 }
 
@@ -153,10 +305,30 @@ def transistor_count(circuit, cell_usage_model):
 
   return transistor_count
 
+# clock period in ns of a circuit with the gate delays of a model of cells
+def clock_period(circuit, cell_usage_model):
+	return max(sum(number * delays[cell_usage_model][gate] for gate, number in path.items()) for path in circuit["critical_path"])
+
+# latency in ns, the latency in cycles at the clock period of the circuit
+def latency_ns(circuit, cell_usage_model):
+	return circuit["latency"] * clock_period(circuit, cell_usage_model)
+
+
+# plotted points, (n_div, n_add, model) in plotting order, every design
+# compared with 16 instances of the n_div bit adder one
+BASE_NUMBER_OF_INSTANCE = 16
+POINTS = [(24, i, model) for i in range(1,25) for model in ("pessimistic", "average", "optimistic", "sky130_hd")] \
+	+ [(53, i, model) for i in range(1,54) for model in ("optimistic", "average", "pessimistic", "sky130_hd")]
+CIRCUIT = "div_non_restoring_bit_serial_adder_2REG"
+
+colors = {"pessimistic": "red", "average": "orange", "optimistic": "green", "sky130_hd": "blue"}
+markers = {24: "d", 53: "s"}
 
 def get_cli_args():
-	args = {}
-	return args
+	parser = argparse.ArgumentParser(description="Plot how many bit-serial dividers fit in the area of 16 parallel ones.")
+	parser.add_argument("--results-dir", default=os.path.join("results", "how_many_more"), help="columnar results of the compute stage")
+	parser.add_argument("--recompute", action="store_true", help="run the compute stage even if its results are up to date")
+	return parser.parse_args()
 
 # add to axis the scatter point (latency,area) of circuit with a model of cells
 def plot_latency_vs_area(circuit, cell_usage_model, axis, marker, color):
@@ -164,18 +336,52 @@ def plot_latency_vs_area(circuit, cell_usage_model, axis, marker, color):
 	area = transistor_count(circuit, cell_usage_model)
 	axis.scatter(area,latency,color=color,marker=marker, label=cell_usage_model)
 
-# add to axis the scatter point (improvementratio,bit adder) with a model of cells and a fixed budget
-# also fills latencies and areas arrays
-def plot_how_many_more(base_circuit, base_number_of_instance, circuit_to_compare_with, adder_size, cell_usage_model, latencies, areas, axis, marker, color):
-	latency = circuit_to_compare_with["latency"]
+# the inputs of the compute stage: the points and the definitions of their
+# circuit and models
+def inputs_fingerprint():
+	return results.fingerprint(POINTS, BASE_NUMBER_OF_INSTANCE, CIRCUIT, definition_hash(parametric_circuits[CIRCUIT]),
+		sorted((m, model_hash(models[m]), sorted(delays[m].items())) for m in {point[2] for point in POINTS}))
+
+# improvement ratio of circuit_to_compare_with, a (name, n_div, n_add)
+# point, with a model of cells and the fixed budget of base_number_of_instance
+# base_circuit, evaluated through the evaluation cache.
+# Returns (how many, budget area, area, latency, clock period in ns)
+def how_many_more(cache, base_circuit, base_number_of_instance, circuit_to_compare_with, cell_usage_model):
+	our_proposal_area, latency = cache.evaluate(*circuit_to_compare_with, cell_usage_model)
 
-	budget_area = transistor_count(base_circuit, cell_usage_model)*base_number_of_instance
-	our_proposal_area = transistor_count(circuit_to_compare_with, cell_usage_model)
+	budget_area = cache.area(*base_circuit, cell_usage_model)*base_number_of_instance
 	how_many_our_proposal = budget_area / our_proposal_area
-	axis.scatter(adder_size,how_many_our_proposal,color=color,marker=marker, label=cell_usage_model)
+	period = clock_period(parametric_circuits[circuit_to_compare_with[0]](*circuit_to_compare_with[1:]), cell_usage_model)
+	return (how_many_our_proposal, budget_area, our_proposal_area, latency, period)
+
+# compute stage, the improvement ratio, area, latency (in cycles and ns) of
+# POINTS
+def compute():
+	for c in circuits:
+		for m in models:
+			area = transistor_count(circuits[c], m)
+			print(c, m, area)
+
+	for c in parametric_circuits:
+		for m in models:
+			area = transistor_count(parametric_circuits[c](32,32), m)
+			print(c, m, area)
+
+	cache = EvaluationCache(parametric_circuits, models)
+	values = [how_many_more(cache, (CIRCUIT, n_div, n_div), BASE_NUMBER_OF_INSTANCE, (CIRCUIT, n_div, n_add), model) for n_div, n_add, model in POINTS]
+	cache.close()
+	print("evaluation cache:", cache)
 
-	latencies.append(latency)
-	areas.append(our_proposal_area)
+	n_div, n_add, model = zip(*POINTS)
+	how_many, budget_area, area, latency, period = zip(*values)
+	points = {"n_div": n_div, "n_add": n_add, "model": model, "how_many": how_many, "budget_area": budget_area, "area": area, "latency": latency,
+		"period": period, "latency_ns": [cycles * ns for cycles, ns in zip(latency, period)]}
+	return ({"points": points}, {"circuit": CIRCUIT, "base_number_of_instance": BASE_NUMBER_OF_INSTANCE})
+
+# add to axis the scatter point (improvementratio,bit adder) with a model of
+# cells, drawn by series.draw()
+def plot_how_many_more(series, adder_size, how_many_our_proposal, cell_usage_model, axis, marker, color):
+	series.add(axis, adder_size, how_many_our_proposal, color, marker, cell_usage_model)
 
 
 
@@ -183,6 +389,11 @@ def plot_how_many_more(base_circuit, base_number_of_instance, circuit_to_compare
 def main():
 	args = get_cli_args()
 
+	# compute stage, skipped if its results are up to date
+	stored, computed = results.load_or_compute(args.results_dir, inputs_fingerprint(), compute, args.recompute)
+	print("results {} {}".format("computed in" if computed else "read from", args.results_dir))
+	points = stored.tables["points"]
+
 	# Some configs on matplotlib.
 	tex_fonts = {
 	    # Use Latex to write all text.
@@ -203,10 +414,10 @@ def main():
 	}
 
 	plt.style.use('grayscale')
-	plt.rcParams.update(tex_fonts)
+	figures.apply_style(tex_fonts)
 
 	# setup some stuff about ploting
-	fig = plt.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
+	fig = figures.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
 	#fig.tight_layout(pad=0)
 	gs = GridSpec(2, 1, figure=fig)
 	# Creating the axis.
@@ -226,62 +437,15 @@ def main():
 	axis_fp32.grid(color='grey', linestyle='--', linewidth=0.25, axis='y')
 	axis_fp32.set_axisbelow(True)
 
-	for c in circuits:
-		for m in models:
-			area = transistor_count(circuits[c], m)
-			print(c, m, area)
-
-	for c in parametric_circuits:
-		for m in models:
-			area = transistor_count(parametric_circuits[c](32,32), m)
-			print(c, m, area)
-
-	current_marker="d"
-	latencies_fp32 = []
-	areas_fp32 = []
-	latencies_fp32_2 = []
-	areas_fp32_2 = []
-	latencies_fp32_3 = []
-	areas_fp32_3 = []
-	latencies_fp32_4 = []
-	areas_fp32_4 = []
-	for i in range(1,25):
-		current_color="red"
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,24), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,i), i, "pessimistic", latencies_fp32_4, areas_fp32_4, axis_fp32, current_marker, current_color)
-	#	plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"pessimistic",axis_fp32, current_marker, current_color)
-		current_color="orange"
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,24), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,i), i, "average", latencies_fp32_3, areas_fp32_3, axis_fp32, current_marker, current_color)
-	#	plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"average"    ,axis_fp32, current_marker, current_color)
-		current_color="green"
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,24), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,i), i, "optimistic", latencies_fp32_2, areas_fp32_2, axis_fp32, current_marker, current_color)
-	#	plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"optimistic" ,axis_fp32, current_marker, current_color)
-		current_color="blue"
-	#	plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"sky130_hd"  ,axis_fp32, current_marker, current_color)
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,24), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](24,i), i, "sky130_hd", latencies_fp32, areas_fp32, axis_fp32, current_marker, current_color)
-
-	latencies_fp64 = []
-	areas_fp64 = []
-	latencies_fp64_2 = []
-	areas_fp64_2 = []
-	latencies_fp64_3 = []
-	areas_fp64_3 = []
-	latencies_fp64_4 = []
-	areas_fp64_4 = []
-	current_marker="s"
-	#for i in range(53,0,-1):
-	for i in range(1,54):
-		current_color="green"
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,53), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i), i, "optimistic", latencies_fp64_4, areas_fp64_4, axis_fp64, current_marker, current_color)
-		#plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"pessimistic",axis_fp64, current_marker, current_color)
-		current_color="orange"
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,53), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i), i, "average", latencies_fp64_3, areas_fp64_3, axis_fp64, current_marker, current_color)
-		#plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"average"    ,axis_fp64, current_marker, current_color)
-		current_color="red"
-		#plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"optimistic" ,axis_fp64, current_marker, current_color)
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,53), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i), i, "pessimistic", latencies_fp64_2, areas_fp64_2, axis_fp64, current_marker, current_color)
-		current_color="blue"
-		#plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"sky130_hd"  ,axis_fp64, current_marker, current_color)
-		plot_how_many_more(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,53), 16, parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i), i, "sky130_hd", latencies_fp64, areas_fp64, axis_fp64, current_marker, current_color)
+	axes = {24: axis_fp32, 53: axis_fp64}
+	series = figures.ScatterSeries()
+	for n_div, n_add, model, how_many in zip(points["n_div"].tolist(), points["n_add"].tolist(), points["model"].tolist(), points["how_many"].tolist()):
+		plot_how_many_more(series, n_add, how_many, model, axes[n_div], markers[n_div], colors[model])
+	latencies_fp32 = points["latency"][points["n_div"] == 24]
+	areas_fp32 = points["area"][points["n_div"] == 24]
+	latencies_fp64 = points["latency"][points["n_div"] == 53]
+	areas_fp64 = points["area"][points["n_div"] == 53]
+	series.draw()
 
 	handles, labels = plt.gca().get_legend_handles_labels()
 	by_label = dict(zip(labels, handles))
@@ -324,7 +488,7 @@ def main():
 	fig.suptitle(r'Fixed area budget of 16 FPDiv units')
 	fig.supxlabel(r'Size of bit-serial datapath (bits)')
 	fig.supylabel(r'Instances of division units')
-	fig.savefig('how_many_more.svg', dpi='figure')
+	figures.save(fig, 'how_many_more.svg')
 	plt.close(fig='all')
 
 
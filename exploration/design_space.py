@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+# Vectorized design-space sweep of the circuits of compute_how_many_more_divs.py
+#
+# transistor_count walks the gate dict of one circuit and calls one lambda
+# per gate. Here the cell models are compiled once into a (model x gate
+# kind) cost matrix: every cell cost is affine in its argument (a constant
+# or a cost per bit), so a model is an intercept and a slope per gate kind.
+# The parametric circuits are evaluated on whole NumPy arrays of (n_div,
+# n_add) into per gate kind count and argument arrays, and the area of every
+# (circuit, model, n_div, n_add) point is one einsum.
+#
+#   areas, latencies = sweep(n_div, n_add)        # n_div, n_add broadcast
+#   areas[c, m, ...], latencies[c, ...]           # circuit c, model m
+#
+# A model lacking a gate kind used by a circuit gives an area of NaN (a
+# KeyError in transistor_count).
+#
+# With gate delays (delays of compute_how_many_more_divs.py, or those of a
+# Liberty library) the sweep also gives the clock period of every point: the
+# critical paths of a circuit are compiled like its gates, into gate counts
+# per path, and the period is the slowest path, so the latency in ns and the
+# throughput per area follow:
+#
+#   areas, latencies, periods = sweep(n_div, n_add, gate_delays=delays)
+#   latencies_ns = latencies[:, None] * periods   # periods[c, m, ...]
+#
+# The latency of the early termination divider depends on its operands. By
+# default it is its worst case, with an operand distribution of
+# latency_distribution.py it is its mean cycle count over that distribution
+# (average_latency, one draw of operands per distinct n_div):
+#
+#   areas, latencies = sweep(n_div, n_add, distribution="representable")
+#
+# usage: python exploration/design_space.py [--max-n-div 256] [--libraries 0]
+#            [--n-div 24 53] [--distribution representable]
+
+import argparse
+import time
+
+import numpy as np
+
+from compute_how_many_more_divs import clock_period, delays, models, parametric_circuits, transistor_count
+from latency_distribution import CIRCUIT as EARLY_TERMINATION_CIRCUIT, average_latency, distributions
+
+GATE_KINDS = sorted({kind for model in models.values() for kind in model})
+
+# arguments the cell lambdas are checked to be affine on
+AFFINE_CHECK = [0, 1, 2, 7, 64]
+
+# points compiled at once
+CHUNK = 1 << 14
+
+
+# (intercept, slope, available) matrices of shape (models, GATE_KINDS)
+def compile_models(model_names=None, cell_models=models):
+	model_names = list(model_names or cell_models)
+	shape = (len(model_names), len(GATE_KINDS))
+	intercept = np.zeros(shape)
+	slope = np.zeros(shape)
+	available = np.zeros(shape, dtype=bool)
+	for m, name in enumerate(model_names):
+		for k, kind in enumerate(GATE_KINDS):
+			cost = cell_models[name].get(kind)
+			if cost is None:
+				continue
+			intercept[m, k] = cost(0)
+			slope[m, k] = cost(1) - cost(0)
+			for arg in AFFINE_CHECK:
+				if not np.isclose(cost(arg), intercept[m, k] + slope[m, k] * arg):
+					raise ValueError("The cost of {} in model {} is not affine in its argument.".format(kind, name))
+			available[m, k] = True
+	return (intercept, slope, available)
+
+
+# (delay, available) matrices of shape (models, GATE_KINDS)
+def compile_delays(model_names=None, gate_delays=delays):
+	model_names = list(model_names or gate_delays)
+	delay = np.zeros((len(model_names), len(GATE_KINDS)))
+	available = np.zeros(delay.shape, dtype=bool)
+	for m, name in enumerate(model_names):
+		for k, kind in enumerate(GATE_KINDS):
+			if kind in gate_delays[name] and not np.isnan(gate_delays[name][kind]):
+				delay[m, k] = gate_delays[name][kind]
+				available[m, k] = True
+	return (delay, available)
+
+
+# (latency, number, args, paths) of the description of one circuit,
+# broadcast to shape, paths being the gate counts of its critical paths
+def _arrays(description, shape):
+	latency = np.broadcast_to(np.asarray(description["latency"], dtype=np.float64), shape)
+	number = np.zeros((len(GATE_KINDS),) + shape)
+	args = np.zeros((len(GATE_KINDS),) + shape)
+	for kind, gate in description["gates"].items():
+		k = GATE_KINDS.index(kind)
+		number[k] = gate["number"]
+		args[k] = gate["args"][0]
+	critical_path = description.get("critical_path", [])
+	paths = np.zeros((len(critical_path), len(GATE_KINDS)) + shape)
+	for p, path in enumerate(critical_path):
+		for kind, count in path.items():
+			paths[p, GATE_KINDS.index(kind)] = count
+	return (latency, number, args, paths)
+
+# (latency, number, args, paths) of a parametric circuit on arrays of n_div
+# and n_add: latency has the broadcast shape, number and args one more leading
+# axis of GATE_KINDS and paths two (critical paths, GATE_KINDS). Lambdas that only take an int n_div (or ints) are
+# evaluated once per distinct n_div (or (n_div, n_add))
+def compile_circuit(circuit, n_div, n_add):
+	n_div, n_add = np.broadcast_arrays(np.asarray(n_div, dtype=np.int64), np.asarray(n_add, dtype=np.int64))
+	shape = n_div.shape
+	try:
+		return _arrays(circuit(n_div, n_add), shape)
+	except (TypeError, AttributeError, ValueError):
+		pass
+
+	n_div = n_div.reshape(-1)
+	n_add = n_add.reshape(-1)
+	latency = np.empty(n_div.size)
+	number = np.zeros((len(GATE_KINDS), n_div.size))
+	args = np.zeros((len(GATE_KINDS), n_div.size))
+	# every description of a circuit has the same number of critical paths
+	paths = np.zeros((len(circuit(int(n_div[0]), int(n_add[0])).get("critical_path", [])), len(GATE_KINDS), n_div.size))
+	try:
+		for div in np.unique(n_div).tolist():
+			lanes = n_div == div
+			latency[lanes], number[:, lanes], args[:, lanes], paths[:, :, lanes] = _arrays(circuit(div, n_add[lanes]), (np.count_nonzero(lanes),))
+	except (TypeError, AttributeError, ValueError):
+		for p, (div, add) in enumerate(zip(n_div.tolist(), n_add.tolist())):
+			latency[p], number[:, p], args[:, p], paths[:, :, p] = _arrays(circuit(div, add), ())
+	return (latency.reshape(shape), number.reshape((-1,) + shape), args.reshape((-1,) + shape), paths.reshape(paths.shape[:2] + shape))
+
+
+# areas (circuits, models, ...) and latencies (circuits, ...) of every
+# point, by chunks of points. With gate_delays (keyed like cell_models) also
+# the clock periods (circuits, models, ...) in ns, NaN for a circuit without
+# critical path or a gate kind without delay. With distribution the latency
+# of the early termination divider is its mean over samples divisions
+def sweep(n_div, n_add, circuit_names=None, model_names=None, cell_models=models, gate_delays=None, distribution=None, samples=100000):
+	circuit_names = list(circuit_names or parametric_circuits)
+	model_names = list(model_names or cell_models)
+	intercept, slope, available = compile_models(model_names, cell_models)
+	unavailable = (~available).astype(np.float64)
+	if gate_delays is not None:
+		delay, delay_available = compile_delays(model_names, gate_delays)
+		delay_unavailable = (~delay_available).astype(np.float64)
+	n_div, n_add = np.broadcast_arrays(np.asarray(n_div, dtype=np.int64), np.asarray(n_add, dtype=np.int64))
+	shape = n_div.shape
+	n_div = n_div.reshape(-1)
+	n_add = n_add.reshape(-1)
+
+	areas = np.empty((len(circuit_names), len(intercept), n_div.size))
+	latencies = np.empty((len(circuit_names), n_div.size))
+	periods = np.full(areas.shape, np.nan)
+	for start in range(0, n_div.size, CHUNK):
+		chunk = slice(start, start + CHUNK)
+		compiled = [compile_circuit(parametric_circuits[name], n_div[chunk], n_add[chunk]) for name in circuit_names]
+		latencies[:, chunk] = [latency for latency, _, _, _ in compiled]
+		number = np.stack([number for _, number, _, _ in compiled])
+		args = np.stack([args for _, _, args, _ in compiled])
+		# area = sum over the gate kinds of number * (intercept + slope * arg)
+		area = np.einsum("ckp,mk->cmp", number, intercept) + np.einsum("ckp,mk->cmp", number * args, slope)
+		area[np.einsum("ckp,mk->cmp", (number != 0).astype(np.float64), unavailable) > 0] = np.nan
+		areas[:, :, chunk] = area
+		if gate_delays is None:
+			continue
+		# period = max over the paths of the sum of count * delay, circuit by
+		# circuit as their number of paths differ
+		for c, (_, _, _, paths) in enumerate(compiled):
+			if len(paths) == 0:
+				continue
+			path_delays = np.einsum("qkp,mk->qmp", paths, delay)
+			path_delays[np.einsum("qkp,mk->qmp", (paths != 0).astype(np.float64), delay_unavailable) > 0] = np.nan
+			periods[c, :, chunk] = path_delays.max(axis=0)
+	if distribution is not None and EARLY_TERMINATION_CIRCUIT in circuit_names:
+		c = circuit_names.index(EARLY_TERMINATION_CIRCUIT)
+		for div in np.unique(n_div).tolist():
+			lanes = n_div == div
+			latencies[c, lanes] = average_latency(div, n_add[lanes], distribution, samples)
+	areas = areas.reshape((len(circuit_names), len(intercept)) + shape)
+	latencies = latencies.reshape((len(circuit_names),) + shape)
+	if gate_delays is None:
+		return (areas, latencies)
+	return (areas, latencies, periods.reshape(areas.shape))
+
+
+# count cell libraries: the cost of every cell of the average model scaled
+# by a random factor in [0.5, 2], for timing large sweeps
+def random_models(count, seed=0):
+	rng = np.random.default_rng(seed)
+	libraries = {}
+	for i in range(count):
+		factors = rng.uniform(0.5, 2, size=len(models["average"]))
+		libraries["random_{}".format(i)] = {kind: (lambda cost, factor: lambda n: cost(n) * factor)(cost, factor) for (kind, cost), factor in zip(models["average"].items(), factors)}
+	return libraries
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Vectorized area and latency sweep of the parametric circuits.")
+	parser.add_argument("--max-n-div", type=int, default=256, help="every n_div up to this and every n_add <= n_div")
+	parser.add_argument("--libraries", type=int, default=0, help="also sweep this many random cell libraries")
+	parser.add_argument("--n-div", type=int, nargs="+", default=[24, 53], help="widths of the n_add maximizing the throughput per area")
+	parser.add_argument("--distribution", choices=sorted(distributions), help="operands of the mean latency of the early termination divider (default: worst case)")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	n_div, n_add = np.tril_indices(args.max_n_div)
+	n_div += 1
+	n_add += 1
+	circuit_names = list(parametric_circuits)
+	model_names = list(models)
+
+	start = time.perf_counter()
+	areas, latencies, periods = sweep(n_div, n_add, gate_delays=delays)
+	elapsed = time.perf_counter() - start
+	print("{} circuits x {} models x {} (n_div, n_add) points in {:.3f} s".format(len(circuit_names), len(model_names), len(n_div), elapsed))
+
+	# the same points through transistor_count, on a sample
+	rng = np.random.default_rng(0)
+	sample = rng.choice(len(n_div), size=min(2000, len(n_div)), replace=False)
+	start = time.perf_counter()
+	for c, circuit in enumerate(circuit_names):
+		for p in sample:
+			description = parametric_circuits[circuit](int(n_div[p]), int(n_add[p]))
+			assert latencies[c, p] == description["latency"]
+			for m, model in enumerate(model_names):
+				assert np.isclose(areas[c, m, p], transistor_count(description, model)), (circuit, model, n_div[p], n_add[p])
+				assert np.isclose(periods[c, m, p], clock_period(description, model)), (circuit, model, n_div[p], n_add[p])
+	elapsed_loop = (time.perf_counter() - start) / len(sample) * len(n_div)
+	print("  matches transistor_count and clock_period, which would take {:.1f} s".format(elapsed_loop))
+
+	# the n_add of the largest throughput per area, 1 / (latency * area), with
+	# the latency in cycles (a clock independent of n_add) and in ns
+	for width in args.n_div:
+		points = np.flatnonzero(n_div == width)
+		if args.distribution:
+			_, latencies[:, points] = sweep(width, n_add[points], distribution=args.distribution)
+		print("n_div = {}: n_add of the best throughput per area, in cycles / in ns (clock period){}".format(width,
+			", mean latency over {} operands".format(args.distribution) if args.distribution else ""))
+		for c, circuit in enumerate(circuit_names):
+			best = []
+			for m in range(len(model_names)):
+				per_cycle = 1 / (latencies[c, points] * areas[c, m, points])
+				per_ns = per_cycle / periods[c, m, points]
+				if np.isnan(per_ns).all():
+					best.append("-")
+					continue
+				k = np.nanargmax(per_ns)
+				best.append("{:2d} / {:2d} ({:.2f} ns)".format(n_add[points[np.nanargmax(per_cycle)]], n_add[points[k]], periods[c, m, points[k]]))
+			print("  {:40s} {}".format(circuit, "  ".join("{}: {}".format(model, b) for model, b in zip(model_names, best))))
+
+	if args.libraries:
+		libraries = random_models(args.libraries)
+		start = time.perf_counter()
+		areas, _ = sweep(n_div, n_add, model_names=list(libraries), cell_models=libraries)
+		print("{} random cell libraries: {} areas in {:.3f} s".format(args.libraries, areas.size, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+	main()
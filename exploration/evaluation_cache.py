@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+# Persistent memoization of the (area, latency) of circuit points
+#
+# A point is (circuit, n_div, n_add, cell model). Its key is the SHA-256 of
+# the definitions of the circuit lambda and of the cost lambdas of the model
+# (their bytecode, constants and closure values, not their line numbers) and
+# of the parameters, so editing a circuit or a model only invalidates its
+# own points. Lookups go through an in-process LRU dict, then an SQLite
+# table, and only the misses are evaluated with transistor_count.
+#
+#   cache = EvaluationCache(parametric_circuits, models)
+#   area, latency = cache.evaluate("div_non_restoring_bit_serial_adder_2REG", 53, 8, "average")
+#   ...
+#   cache.close()  # writes the new points
+#
+# usage: python exploration/evaluation_cache.py [--path FILE] [--max-n-div 64] [--clear]
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+import types
+from collections import OrderedDict
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_cache.sqlite")
+
+# points kept in memory
+CAPACITY = 1 << 16
+
+# keys looked up per SQLite query
+QUERY_SIZE = 500
+
+
+# hash of the definition of a function: its bytecode, names, constants
+# (nested code objects included) and the values it closes over
+def definition_hash(function, digest=None):
+	digest = digest or hashlib.sha256()
+	def feed(code):
+		digest.update(code.co_code)
+		digest.update(repr(code.co_names).encode())
+		for const in code.co_consts:
+			if isinstance(const, types.CodeType):
+				feed(const)
+			else:
+				digest.update(repr(const).encode())
+	feed(function.__code__)
+	for cell in function.__closure__ or ():
+		value = cell.cell_contents
+		if hasattr(value, "__code__"):
+			definition_hash(value, digest)
+		else:
+			digest.update(repr(value).encode())
+	return digest.hexdigest()
+
+
+def model_hash(model):
+	digest = hashlib.sha256()
+	for kind in sorted(model):
+		digest.update(kind.encode())
+		digest.update(definition_hash(model[kind]).encode())
+	return digest.hexdigest()
+
+
+# area of a circuit description with a model dict, as transistor_count
+def circuit_area(circuit, model):
+	return sum(gate["number"] * model[kind](*gate["args"]) for kind, gate in circuit["gates"].items())
+
+
+class EvaluationCache:
+	def __init__(self, circuits, cell_models, path=CACHE_PATH, capacity=CAPACITY):
+		self.circuits = circuits
+		self.cell_models = cell_models
+		self.capacity = capacity
+		self.memory = OrderedDict()
+		self.pending = []
+		self.circuit_hashes = {}
+		self.model_hashes = {}
+		self.hits_memory = 0
+		self.hits_disk = 0
+		self.misses = 0
+		self.connection = None
+		if path is not None:
+			self.connection = sqlite3.connect(path)
+			self.connection.execute("CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, area REAL, latency REAL)")
+
+	def key(self, circuit, n_div, n_add, model):
+		if circuit not in self.circuit_hashes:
+			self.circuit_hashes[circuit] = definition_hash(self.circuits[circuit])
+		if model not in self.model_hashes:
+			self.model_hashes[model] = model_hash(self.cell_models[model])
+		point = "{}:{}:{}:{}".format(self.circuit_hashes[circuit], self.model_hashes[model], n_div, n_add)
+		return hashlib.sha256(point.encode()).hexdigest()
+
+	def _remember(self, key, value):
+		self.memory[key] = value
+		if len(self.memory) > self.capacity:
+			self.memory.popitem(last=False)
+
+	# (area, latency) of one point
+	def evaluate(self, circuit, n_div, n_add, model):
+		return self.evaluate_many([(circuit, n_div, n_add, model)])[0]
+
+	def area(self, circuit, n_div, n_add, model):
+		return self.evaluate(circuit, n_div, n_add, model)[0]
+
+	# (area, latency) of a list of (circuit, n_div, n_add, model) points,
+	# the disk is queried once per QUERY_SIZE memory misses
+	def evaluate_many(self, points):
+		keys = [self.key(*point) for point in points]
+		results = [None] * len(points)
+		missing = []
+		for k, key in enumerate(keys):
+			value = self.memory.get(key)
+			if value is None:
+				missing.append(k)
+			else:
+				self.memory.move_to_end(key)
+				self.hits_memory += 1
+				results[k] = value
+
+		stored = {}
+		if self.connection is not None:
+			missing_keys = list({keys[k] for k in missing})
+			for start in range(0, len(missing_keys), QUERY_SIZE):
+				batch = missing_keys[start:start + QUERY_SIZE]
+				query = "SELECT key, area, latency FROM evaluations WHERE key IN ({})".format(",".join("?" * len(batch)))
+				stored.update((key, (area, latency)) for key, area, latency in self.connection.execute(query, batch))
+
+		for k in missing:
+			key = keys[k]
+			value = self.memory.get(key) # evaluated earlier in this call
+			if value is not None:
+				self.hits_memory += 1
+			elif key in stored:
+				value = stored[key]
+				self.hits_disk += 1
+			else:
+				circuit, n_div, n_add, model = points[k]
+				description = self.circuits[circuit](n_div, n_add)
+				value = (circuit_area(description, self.cell_models[model]), description["latency"])
+				self.pending.append((key,) + value)
+				self.misses += 1
+			self._remember(key, value)
+			results[k] = value
+		return results
+
+	# write the points evaluated since the last flush
+	def flush(self):
+		if self.connection is not None and self.pending:
+			with self.connection:
+				self.connection.executemany("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?)", self.pending)
+		self.pending = []
+
+	def close(self):
+		self.flush()
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		self.close()
+
+	def statistics(self):
+		lookups = self.hits_memory + self.hits_disk + self.misses
+		return {
+			"lookups": lookups,
+			"memory_hits": self.hits_memory,
+			"disk_hits": self.hits_disk,
+			"misses": self.misses,
+			"hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+		}
+
+	def __str__(self):
+		statistics = self.statistics()
+		return "{lookups} lookups, {memory_hits} memory hits, {disk_hits} disk hits, {misses} misses ({hit_rate:.1%} hit rate)".format(**statistics)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Evaluate a sweep twice through the evaluation cache and report its statistics.")
+	parser.add_argument("--path", default=CACHE_PATH)
+	parser.add_argument("--max-n-div", type=int, default=64)
+	parser.add_argument("--clear", action="store_true", help="remove the cache file first")
+	return parser.parse_args()
+
+
+def main():
+	from compute_how_many_more_divs import models, parametric_circuits, transistor_count
+
+	args = get_cli_args()
+	if args.clear and os.path.exists(args.path):
+		os.remove(args.path)
+	points = [(circuit, n_div, n_add, model) for circuit in parametric_circuits for model in models
+		for n_div in range(1, args.max_n_div + 1) for n_add in range(1, n_div + 1)]
+
+	for run in ("first", "second"):
+		start = time.perf_counter()
+		with EvaluationCache(parametric_circuits, models, args.path) as cache:
+			results = cache.evaluate_many(points)
+		print("{} run: {} points in {:.3f} s, {}".format(run, len(points), time.perf_counter() - start, cache))
+
+	for (circuit, n_div, n_add, model), (area, latency) in list(zip(points, results))[::997]:
+		description = parametric_circuits[circuit](n_div, n_add)
+		assert area == transistor_count(description, model) and latency == description["latency"]
+
+
+if __name__ == '__main__':
+	main()
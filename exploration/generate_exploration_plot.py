@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 import argparse
+import os
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import figures
+import results
+from evaluation_cache import EvaluationCache, definition_hash, model_hash
+
 # Figure width base on the column width of the Latex document.
 fig_width = 252
 fig_text_width = 516
@@ -122,7 +129,7 @@ circuits = {
 parametric_circuits = {
 	"div_non_restoring_bit_serial_adder_2REG": lambda n_div, n_add:
 	{
-		"latency": n_div*(n_div//n_add),
+		"latency": n_div*(-(-n_div//n_add)),
 		"gates":
 		{
 			"NOT": {"number": n_div+1, "args": [0]},
@@ -134,7 +141,7 @@ parametric_circuits = {
 	},
 	"div_non_restoring_bit_serial_adder_3REG": lambda n_div, n_add:
 	{
-		"latency": n_div*(n_div//n_add),
+		"latency": n_div*(-(-n_div//n_add)),
 		"gates":
 		{
 			"NOT": {"number": n_div+1, "args": [0]},
@@ -154,19 +161,61 @@ def transistor_count(circuit, cell_usage_model):
   return transistor_count
 
 
+# plotted points, (circuit, n_div, n_add, model) in plotting order
+POINTS = [("div_non_restoring_bit_serial_adder_2REG", n_div, i, model)
+	for n_div, n_adds in ((32, range(1,25)), (53, range(1,54))) for i in n_adds
+	for model in ("pessimistic", "average", "optimistic", "sky130_hd")]
+
+colors = {"pessimistic": "red", "average": "orange", "optimistic": "green", "sky130_hd": "blue"}
+markers = {32: "d", 53: "s"}
+
 def get_cli_args():
-	args = {}
-	return args
+	parser = argparse.ArgumentParser(description="Plot the area vs. latency of the bit-serial divider.")
+	parser.add_argument("--results-dir", default=os.path.join("results", "area_vs_latency"), help="columnar results of the compute stage")
+	parser.add_argument("--recompute", action="store_true", help="run the compute stage even if its results are up to date")
+	return parser.parse_args()
+
+# the inputs of the compute stage: the points and the definitions of their
+# circuits and models
+def inputs_fingerprint():
+	return results.fingerprint(POINTS,
+		sorted((c, definition_hash(parametric_circuits[c])) for c in {point[0] for point in POINTS}),
+		sorted((m, model_hash(models[m])) for m in {point[3] for point in POINTS}))
+
+# compute stage, the (area, latency) of POINTS through the evaluation cache
+def compute():
+	for c in circuits:
+		for m in models:
+			area = transistor_count(circuits[c], m)
+			print(c, m, area)
+
+	for c in parametric_circuits:
+		for m in models:
+			area = transistor_count(parametric_circuits[c](32,32), m)
+			print(c, m, area)
 
-# add to axis the scatter point (latency,area) of circuit with a model of cells
-def plot_latency_vs_area(circuit, cell_usage_model, axis, marker, color):
-	latency = circuit["latency"]
-	area = transistor_count(circuit, cell_usage_model)
-	axis.scatter(area,latency,color=color,marker=marker, label=cell_usage_model)
+	cache = EvaluationCache(parametric_circuits, models)
+	areas, latencies = zip(*cache.evaluate_many(POINTS))
+	cache.close()
+	print("evaluation cache:", cache)
+
+	circuit, n_div, n_add, model = zip(*POINTS)
+	points = {"circuit": circuit, "n_div": n_div, "n_add": n_add, "model": model, "area": areas, "latency": latencies}
+	return ({"points": points}, {})
+
+# add to axis the scatter point (latency,area) of a point with a model of
+# cells, drawn by series.draw()
+def plot_latency_vs_area(series, area, latency, cell_usage_model, axis, marker, color):
+	series.add(axis, area, latency, color, marker, cell_usage_model)
 
 def main():
 	args = get_cli_args()
 
+	# compute stage, skipped if its results are up to date
+	stored, computed = results.load_or_compute(args.results_dir, inputs_fingerprint(), compute, args.recompute)
+	print("results {} {}".format("computed in" if computed else "read from", args.results_dir))
+	points = stored.tables["points"]
+
 	# Some configs on matplotlib.
 	tex_fonts = {
 	    # Use Latex to write all text.
@@ -187,10 +236,10 @@ def main():
 	}
 
 	plt.style.use('grayscale')
-	plt.rcParams.update(tex_fonts)
+	figures.apply_style(tex_fonts)
 
 	# setup some stuff about ploting
-	fig = plt.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
+	fig = figures.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
 	fig.tight_layout(pad=0)
 	gs = GridSpec(2, 1, figure=fig)
 	# Creating the axis.
@@ -208,37 +257,11 @@ def main():
 	axis_fp32.grid(color='grey', linestyle='--', linewidth=0.25, axis='y')
 	axis_fp32.set_axisbelow(True)
 
-	for c in circuits:
-		for m in models:
-			area = transistor_count(circuits[c], m)
-			print(c, m, area)
-
-	for c in parametric_circuits:
-		for m in models:
-			area = transistor_count(parametric_circuits[c](32,32), m)
-			print(c, m, area)
-
-	current_marker="d"
-	for i in range(1,25):
-		current_color="red"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"pessimistic",axis_fp32, current_marker, current_color)
-		current_color="orange"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"average"    ,axis_fp32, current_marker, current_color)
-		current_color="green"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"optimistic" ,axis_fp32, current_marker, current_color)
-		current_color="blue"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](32,i),"sky130_hd"  ,axis_fp32, current_marker, current_color)
-
-	current_marker="s"
-	for i in range(1,54):
-		current_color="red"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"pessimistic",axis_fp64, current_marker, current_color)
-		current_color="orange"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"average"    ,axis_fp64, current_marker, current_color)
-		current_color="green"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"optimistic" ,axis_fp64, current_marker, current_color)
-		current_color="blue"
-		plot_latency_vs_area(parametric_circuits["div_non_restoring_bit_serial_adder_2REG"](53,i),"sky130_hd"  ,axis_fp64, current_marker, current_color)
+	axes = {32: axis_fp32, 53: axis_fp64}
+	series = figures.ScatterSeries()
+	for n_div, model, area, latency in zip(points["n_div"].tolist(), points["model"].tolist(), points["area"].tolist(), points["latency"].tolist()):
+		plot_latency_vs_area(series, area, latency, model, axes[n_div], markers[n_div], colors[model])
+	series.draw()
 
 	# close and save plotting
 	axis_fp64.set_title(r'FP64')
@@ -249,7 +272,7 @@ def main():
 	fig.suptitle(r'Area vs. Latency of 1 FPDiv unit')
 	fig.supxlabel(r'Area (Number of Transistors)')
 	fig.supylabel(r'Latency (Number of clock cycles)')
-	fig.savefig('area_vs_latency.svg', dpi='figure')
+	figures.save(fig, 'area_vs_latency.svg')
 	plt.close(fig='all')
 
 
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Latency distribution of the early termination divider
+#
+# divider_core.EarlyTerminationEngine skips the leading iterations that a
+# leading sign count of the dividend shows to be redundant, so its latency
+# depends on the operands. The number of skipped iterations is computed here
+# for whole arrays of operands (the same bound as
+# divider_core.redundant_iterations), giving the cycle count of every
+# division for every adder size; a sample is checked against the engine.
+#
+# The operands come from a distribution:
+#   uniform        dividends over 2n bits, most quotients overflow
+#   representable  quotients uniform over n bits, remainders below |divisor|
+#   log_uniform    representable, quotient magnitudes log-uniform (small
+#                  quotients are common in real workloads)
+#   trace          a .npz file with "dividends" and "divisors" arrays
+#
+# The mean latency is printed next to the worst case of the model in
+# compute_how_many_more_divs.py, along with the area of the circuit, and
+# --plot draws both against the area.
+#
+# usage: python exploration/latency_distribution.py [--n-div 24] [--n-add 1 4 ...]
+#            [--distribution representable] [--count 1e6] [--plot latency.svg]
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from divider_core import EarlyTerminationEngine, NonRestoringEngine
+from compute_how_many_more_divs import parametric_circuits, transistor_count, models
+
+CIRCUIT = "div_non_restoring_early_termination"
+PERCENTILES = [50, 90, 99]
+
+# divisions run through the engine to check the vectorized cycle counts
+CHECKED = 200
+
+
+# operands wider than 63 bits do not fit int64 lanes and are Python ints in
+# object arrays
+def random_signed(rng, bits, count):
+	if bits <= 63:
+		return rng.integers(-(1 << (bits - 1)), 1 << (bits - 1), size=count, dtype=np.int64)
+	values = np.zeros(count, dtype=object)
+	for _ in range(-(-bits // 32)):
+		values = (values << 32) | rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(object)
+	return (values & ((1 << bits) - 1)) - (1 << (bits - 1))
+
+def random_divisors(rng, n, count):
+	divisors = random_signed(rng, n, count)
+	return np.where(divisors == 0, 1, divisors)
+
+# dividend = quotient * divisor + remainder, the remainder having the sign
+# of the dividend
+def from_quotients(rng, n, quotients, divisors):
+	remainders = (rng.random(len(divisors)) * np.abs(divisors)).astype(np.int64)
+	if 2*n > 63:
+		quotients = quotients.astype(object)
+		remainders = remainders.astype(object)
+	dividends = quotients * divisors
+	return (dividends + np.where(dividends < 0, -remainders, remainders), divisors)
+
+def uniform_operands(rng, n, count):
+	return (random_signed(rng, 2*n, count), random_divisors(rng, n, count))
+
+def representable_operands(rng, n, count):
+	divisors = random_divisors(rng, n, count)
+	quotients = random_signed(rng, n, count)
+	return from_quotients(rng, n, quotients, divisors)
+
+def log_uniform_operands(rng, n, count):
+	divisors = random_divisors(rng, n, count)
+	magnitudes = np.exp2(rng.uniform(0, n - 1, size=count)).astype(np.int64)
+	quotients = np.where(rng.random(count) < 0.5, -magnitudes, magnitudes)
+	return from_quotients(rng, n, quotients, divisors)
+
+def trace_operands(path):
+	trace = np.load(path, allow_pickle=True)
+	return (trace["dividends"], trace["divisors"])
+
+distributions = {
+	"uniform": uniform_operands,
+	"representable": representable_operands,
+	"log_uniform": log_uniform_operands,
+}
+
+
+# bit length of every lane of a non-negative array
+def bit_length(values):
+	if values.dtype == object:
+		return np.frompyfunc(int.bit_length, 1, 1)(values).astype(np.int64)
+	values = values.astype(np.uint64)
+	lengths = np.zeros(values.shape, dtype=np.int64)
+	for shift in (32, 16, 8, 4, 2, 1):
+		high = (values >> np.uint64(shift)) != 0
+		lengths += high * shift
+		values = np.where(high, values >> np.uint64(shift), values)
+	return lengths + values.astype(np.int64)
+
+
+# divider_core.redundant_iterations of every lane
+def skipped_iterations(n, dividends, divisors):
+	dividend_length = bit_length(np.where(dividends >= 0, dividends, ~dividends))
+	skipped = np.minimum(n, bit_length(np.abs(divisors)) + n - dividend_length)
+	return np.where((skipped >= 2) & (divisors != 0), skipped, 0)
+
+# cycle count of every division with an n_add bit adder
+def cycles(n, n_add, skipped):
+	n_chunks = -(-n // n_add)
+	return np.where(skipped > 0, 1 + n_chunks * (n - skipped + 1), n * n_chunks)
+
+
+# mean cycle count over count divisions of a distribution, for the plots and
+# design_space.sweep. n_add may be an array: the mean of cycles() is
+# P(skipped > 0) + n_chunks * mean(n - skipped + 1 or n), so the operands are
+# drawn once for all the adder sizes
+def average_latency(n_div, n_add, distribution="representable", count=100000, seed=0):
+	rng = np.random.default_rng(seed)
+	dividends, divisors = distributions[distribution](rng, n_div, count)
+	skipped = skipped_iterations(n_div, dividends, divisors)
+	n_chunks = -(-n_div // np.asarray(n_add))
+	mean = np.mean(skipped > 0) + n_chunks * np.mean(np.where(skipped > 0, n_div - skipped + 1, n_div))
+	return float(mean) if np.ndim(mean) == 0 else mean
+
+
+# compare the vectorized cycle counts and the results of a sample of lanes
+# with the engines
+def check(n, n_add, dividends, divisors, latencies):
+	sample = random.Random(0).sample(range(len(dividends)), min(CHECKED, len(dividends)))
+	for k in sample:
+		dividend, divisor = int(dividends[k]), int(divisors[k])
+		result = EarlyTerminationEngine(n, dividend, divisor, n_add).fast_forward()
+		expected = NonRestoringEngine(n, dividend, divisor, n_add).fast_forward()
+		assert result[:2] == expected[:2], "n = {}, n_add = {}: {} / {} differs from the full divider".format(n, n_add, dividend, divisor)
+		assert result.cycles == latencies[k], "n = {}, n_add = {}: {} / {} takes {} cycles, not {}".format(n, n_add, dividend, divisor, result.cycles, latencies[k])
+
+
+def histogram(latencies, width=50):
+	values, counts = np.unique(latencies, return_counts=True)
+	for value, count in zip(values, counts):
+		print("  {:6d}  {:8.3%}  {}".format(value, count / len(latencies), "#" * int(round(width * count / counts.max()))))
+
+
+def plot(path, rows, n_div, distribution, model):
+	import matplotlib
+	matplotlib.use("Agg")
+	import matplotlib.pyplot as plt
+
+	fig, axis = plt.subplots(figsize=(6, 4))
+	areas = [row["area"] for row in rows]
+	axis.scatter(areas, [row["worst"] for row in rows], marker="s", label="worst case")
+	axis.scatter(areas, [row["mean"] for row in rows], marker="d", label="mean ({})".format(distribution))
+	axis.set_yscale("log")
+	axis.set_xlabel("Area (transistors, {} model)".format(model))
+	axis.set_ylabel("Latency (clock cycles)")
+	axis.set_title("Early termination divider, n_div = {}".format(n_div))
+	axis.grid(color="grey", linestyle="--", linewidth=0.25, axis="y")
+	axis.legend()
+	fig.savefig(path)
+	plt.close(fig)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Latency distribution of the early termination divider over an operand distribution.")
+	parser.add_argument("--n-div", type=int, default=24)
+	parser.add_argument("--n-add", type=int, nargs="+", help="adder sizes (default: 1, 2, 4, ... up to n_div)")
+	parser.add_argument("--distribution", choices=sorted(distributions) + ["trace"], default="representable")
+	parser.add_argument("--trace-file", help=".npz operands for --distribution trace")
+	parser.add_argument("--count", type=float, default=1e6)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--model", choices=sorted(models), default="average", help="cell area model")
+	parser.add_argument("--histogram", type=int, metavar="N_ADD", help="print the histogram of the cycle counts for this adder size")
+	parser.add_argument("--plot", help="save the worst and mean latencies against the area to this file")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	n_div = args.n_div
+	n_adds = args.n_add or sorted({min(1 << k, n_div) for k in range(n_div.bit_length() + 1)})
+
+	if args.distribution == "trace":
+		dividends, divisors = trace_operands(args.trace_file)
+	else:
+		dividends, divisors = distributions[args.distribution](np.random.default_rng(args.seed), n_div, int(args.count))
+	skipped = skipped_iterations(n_div, dividends, divisors)
+
+	print("n_div = {}, {} {} divisions, {:.2f} iterations skipped on average, {:.1%} of the divisions skip none".format(
+		n_div, len(dividends), args.distribution, skipped.mean(), np.mean(skipped == 0)))
+	print("  n_add     area  worst case     mean  {}".format("  ".join("p{:<5d}".format(p) for p in PERCENTILES)))
+	rows = []
+	for n_add in n_adds:
+		latencies = cycles(n_div, n_add, skipped)
+		check(n_div, n_add, dividends, divisors, latencies)
+		circuit = parametric_circuits[CIRCUIT](n_div, n_add)
+		row = {"n_add": n_add, "area": transistor_count(circuit, args.model), "worst": circuit["latency"], "mean": latencies.mean()}
+		rows.append(row)
+		print("  {:5d}  {:7.0f}  {:10d}  {:7.1f}  {}".format(n_add, row["area"], row["worst"], row["mean"],
+			"  ".join("{:6.0f}".format(p) for p in np.percentile(latencies, PERCENTILES))))
+
+	if args.histogram:
+		print("cycles with n_add = {}".format(args.histogram))
+		histogram(cycles(n_div, args.histogram, skipped))
+	if args.plot:
+		plot(args.plot, rows, n_div, args.distribution, args.model)
+
+
+if __name__ == '__main__':
+	main()
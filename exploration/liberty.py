@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+# Liberty (.lib) cell libraries as cell models of the exploration
+#
+# A Liberty file is parsed into its groups (library, cell, pin, timing, ...)
+# and, for every cell, the area and a delay: the largest over the timing arcs
+# of the middle entry of the cell_rise/cell_fall tables, in ns. Cells with no
+# timing arc have a delay of NaN.
+#
+# The parsed cells are cached in a .npz file named by the SHA-256 of the
+# Liberty file, so a library is parsed once and later loads only read three
+# arrays. A cache written by another PARSER_VERSION is ignored.
+#
+# cell_model() maps the cells onto the gate kinds of models in
+# compute_how_many_more_divs.py (the smallest cell matching the name patterns
+# of a kind), with the same convention as the "sky130_hd" model: NOT, NAND,
+# DFF... cost their area, HA, FA, MUX and REG cost their area per bit (REG
+# being DFF per bit). The areas are in the unit of the library (um^2 for
+# sky130_fd_sc_hd), not in transistors.
+#
+#   model, gate_delays = cell_model(load_library("sky130_fd_sc_hd__tt_025C_1v80.lib"))
+#   models["sky130_lib"] = model
+#   delays["sky130_lib"] = gate_delays   # clock periods, see clock_period
+#
+# usage: python exploration/liberty.py library.lib [--cache-dir DIR] [--no-cache]
+
+import argparse
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+
+from compute_how_many_more_divs import clock_period, delays, models, parametric_circuits, transistor_count
+
+PARSER_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "liberty_cache")
+
+# cell names of every gate kind, matched on the name without the library
+# prefix (sky130_fd_sc_hd__inv_1 -> inv_1), sky130 style and the common
+# INVX1 style
+GATE_PATTERNS = {
+	"NOT": r"(clk)?inv_\d+|INVX?\d+",
+	"NAND": r"nand2_\d+|NAND2X?\d+",
+	"NOR": r"nor2_\d+|NOR2X?\d+",
+	"AND": r"and2_\d+|AND2X?\d+",
+	"OR": r"or2_\d+|OR2X?\d+",
+	"XOR": r"xor2_\d+|XOR2X?\d+",
+	"XNOR": r"xnor2_\d+|XNOR2X?\d+",
+	"HA": r"ha_\d+|HA(DD)?X?\d+",
+	"FA": r"fa_\d+|FA(DD)?X?\d+",
+	"MUX": r"mux2i?_\d+|MUX2X?\d+|MX2X?\d+",
+	"DFF": r"dfxtp_\d+|DFFX?\d+",
+}
+
+# kinds costing their cell per bit of their argument, REG is a DFF per bit
+PER_BIT = {"HA", "FA", "MUX"}
+
+TOKENS = re.compile(r'/\*.*?\*/|//[^\n]*|\\\n|\s+|"(?:[^"\\]|\\.)*"|[{}();:,]|[^\s{}();:,"]+', re.S)
+
+TIME_UNITS = {"ps": 1e-3, "ns": 1.0, "us": 1e3}
+
+
+class Group:
+	__slots__ = ("name", "args", "attributes", "groups")
+
+	def __init__(self, name, args):
+		self.name = name
+		self.args = args
+		self.attributes = {} # simple attributes as strings, complex ones as lists
+		self.groups = []
+
+
+# the top level groups of a Liberty source
+def parse(source):
+	tokens = [token for token in TOKENS.findall(source) if not (token[0].isspace() or token.startswith(("/*", "//", "\\")))]
+	root = Group("", [])
+	stack = [root]
+	i = 0
+	count = len(tokens)
+	while i < count:
+		token = tokens[i]
+		if token == "}":
+			stack.pop()
+			i += 1
+			continue
+		if token == ";":
+			i += 1
+			continue
+		name = token
+		if i + 1 < count and tokens[i+1] == ":":
+			# simple attribute, up to the ";" (sometimes missing before "}")
+			j = i + 2
+			while j < count and tokens[j] not in (";", "}"):
+				j += 1
+			stack[-1].attributes[name] = " ".join(tokens[i+2:j]).strip('"')
+			i = j + 1 if j < count and tokens[j] == ";" else j
+		elif i + 1 < count and tokens[i+1] == "(":
+			j = i + 2
+			args = []
+			while tokens[j] != ")":
+				if tokens[j] != ",":
+					args.append(tokens[j].strip('"'))
+				j += 1
+			if j + 1 < count and tokens[j+1] == "{":
+				group = Group(name, args)
+				stack[-1].groups.append(group)
+				stack.append(group)
+				i = j + 2
+			else:
+				stack[-1].attributes.setdefault(name, []).extend(args)
+				i = j + 1
+		else:
+			raise ValueError("Unexpected token {!r} in the Liberty source.".format(token))
+	return root.groups
+
+
+# middle entry of a values("...", "...") table
+def table_delay(group):
+	values = [float(value) for row in group.attributes.get("values", []) for value in row.replace(",", " ").split()]
+	return values[len(values) // 2] if values else np.nan
+
+
+def cell_delay(cell):
+	delays = [table_delay(table) for pin in cell.groups if pin.name == "pin"
+		for timing in pin.groups if timing.name == "timing"
+		for table in timing.groups if table.name in ("cell_rise", "cell_fall")]
+	delays = [delay for delay in delays if not np.isnan(delay)]
+	return max(delays) if delays else np.nan
+
+
+# (names, areas, delays in ns) of the cells of a Liberty source
+def parse_cells(source):
+	names = []
+	areas = []
+	delays = []
+	for library in parse(source):
+		unit = re.fullmatch(r"(\d*\.?\d*)\s*([a-z]+)", library.attributes.get("time_unit", "1ns").strip())
+		time_scale = float(unit.group(1) or 1) * TIME_UNITS[unit.group(2)]
+		for cell in library.groups:
+			if cell.name != "cell" or "area" not in cell.attributes:
+				continue
+			names.append(cell.args[0])
+			areas.append(float(cell.attributes["area"]))
+			delays.append(cell_delay(cell) * time_scale)
+	return (np.array(names), np.array(areas), np.array(delays))
+
+
+def file_hash(path):
+	with open(path, "rb") as library:
+		return hashlib.sha256(library.read()).hexdigest()
+
+
+# cells of a Liberty file as a {name: (area, delay)} dict, parsed or read
+# from the cache
+def load_library(path, cache_dir=CACHE_DIR, use_cache=True):
+	cache_path = os.path.join(cache_dir, "{}.npz".format(file_hash(path)))
+	if use_cache and os.path.exists(cache_path):
+		cache = np.load(cache_path)
+		if int(cache["version"]) == PARSER_VERSION:
+			return dict(zip(cache["names"].tolist(), zip(cache["areas"].tolist(), cache["delays"].tolist())))
+
+	with open(path) as library:
+		names, areas, delays = parse_cells(library.read())
+	if use_cache:
+		os.makedirs(cache_dir, exist_ok=True)
+		np.savez(cache_path, version=PARSER_VERSION, names=names, areas=areas, delays=delays)
+	return dict(zip(names.tolist(), zip(areas.tolist(), delays.tolist())))
+
+
+# (model, delays) of a library: a cost lambda and the delay of the cell of
+# every gate kind found in it
+def cell_model(cells):
+	model = {}
+	delays = {}
+	for kind, pattern in GATE_PATTERNS.items():
+		pattern = re.compile(pattern)
+		matching = [(area, delay) for name, (area, delay) in cells.items() if pattern.fullmatch(name.rsplit("__", 1)[-1])]
+		if not matching:
+			continue
+		area, delay = min(matching)
+		model[kind] = (lambda area: lambda n: area * n)(area) if kind in PER_BIT else (lambda area: lambda n: area)(area)
+		delays[kind] = delay
+	if "DFF" in delays:
+		model["REG"] = (lambda area: lambda n: area * n)(model["DFF"](0))
+		delays["REG"] = delays["DFF"]
+	return (model, delays)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Load a Liberty cell library as a cell model of the exploration.")
+	parser.add_argument("library", help="Liberty (.lib) file")
+	parser.add_argument("--cache-dir", default=CACHE_DIR)
+	parser.add_argument("--no-cache", action="store_true", help="always parse the file")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+
+	start = time.perf_counter()
+	cells = load_library(args.library, args.cache_dir, not args.no_cache)
+	print("{} cells loaded in {:.1f} ms".format(len(cells), (time.perf_counter() - start) * 1e3))
+
+	model, gate_delays = cell_model(cells)
+	for kind in GATE_PATTERNS:
+		if kind in model:
+			print("  {:5s} area {:8.3f}  delay {:.3f} ns".format(kind, model[kind](1), gate_delays[kind]))
+		else:
+			print("  {:5s} no matching cell".format(kind))
+
+	name = os.path.splitext(os.path.basename(args.library))[0]
+	models[name] = model
+	delays[name] = gate_delays
+	for circuit in parametric_circuits:
+		description = parametric_circuits[circuit](24, 24)
+		if all(kind in model for kind in description["gates"]):
+			print("{} (24, 24): area {:.1f}".format(circuit, transistor_count(description, name)), end="")
+			if all(kind in gate_delays and not np.isnan(gate_delays[kind]) for path in description["critical_path"] for kind in path):
+				print(", clock period {:.3f} ns".format(clock_period(description, name)), end="")
+			print()
+
+
+if __name__ == '__main__':
+	main()
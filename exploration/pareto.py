@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+# Incremental Pareto fronts of the design-space sweep
+#
+# The points of design_space.sweep (area, latency and optionally the
+# throughput per area) stream in by chunks and only the non-dominated ones
+# are kept, with their payload (circuit, n_div, n_add). The throughput per
+# area is 1 / (area * mean latency), the mean latency of the early
+# termination divider coming from latency_distribution.py and the others
+# having a fixed latency:
+#
+#   2 objectives: a staircase, the front sorted by the first objective (the
+#     second one then decreases). A point is dominated iff its predecessor
+#     is better on the second objective, which is a bisection, and the
+#     points it dominates are the run following it. The staircase is a
+#     blocked sorted list (blocks of BLOCK to 2 BLOCK points, bisected by
+#     their first point), so an insertion moves O(BLOCK) points instead of
+#     the whole front and a point removed is paid for once. A chunk is first
+#     reduced to its own staircase by a sort, only that goes through the
+#     insertions.
+#   3 objectives: a chunk is first reduced to its own front by a sweep on
+#     the first objective with a staircase of the other two (Kung et al.,
+#     O(n log n)), then merged with the archive by vectorized dominance tests
+#     between the two fronts, which stay small.
+#
+# Objectives are minimized, the ones flagged in maximize are negated. Equal
+# points are kept once (the first one).
+#
+# With --wall-clock the latencies are in ns, the cycles at the clock period
+# of the critical path of every design (delays of compute_how_many_more_divs.py),
+# so a wider adder also costs a slower clock.
+#
+# usage: python exploration/pareto.py [--n-div 24 53] [--throughput]
+#            [--wall-clock] [--output-dir exploration/results/pareto]
+
+import argparse
+import bisect
+import csv
+import os
+from collections import Counter
+
+import numpy as np
+
+from compute_how_many_more_divs import delays, models, parametric_circuits
+from design_space import sweep
+from latency_distribution import CIRCUIT as EARLY_TERMINATION_CIRCUIT, average_latency, distributions
+
+# default directory of the fronts, in the ignored results/ of exploration
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "pareto")
+
+# divisions drawn for the mean latency of the early termination divider
+SAMPLES = 20000
+
+# points of the 3-D dominance tests done at once
+CHUNK = 1 << 12
+
+# half the largest block of a staircase
+BLOCK = 256
+
+
+# 2-D front, minimizing both coordinates, as blocks of (xs, ys, payloads)
+# lists and the first x of every block
+class Staircase:
+	def __init__(self, block=BLOCK):
+		self.block = block
+		self.blocks = []
+		self.firsts = []
+
+	def __len__(self):
+		return sum(len(xs) for xs, _, _ in self.blocks)
+
+	# (block, index) of the last point of x <= the given one, block -1 if none
+	def _predecessor(self, x):
+		b = bisect.bisect_right(self.firsts, x) - 1
+		if b < 0:
+			return (b, 0)
+		return (b, bisect.bisect_right(self.blocks[b][0], x) - 1)
+
+	# whether a point with these coordinates would be dominated (or equal)
+	def dominated(self, x, y):
+		b, i = self._predecessor(x)
+		return b >= 0 and self.blocks[b][1][i] <= y
+
+	# insert a point, returns False if it is dominated
+	def add(self, x, y, payload=None):
+		b, i = self._predecessor(x)
+		if b >= 0:
+			if self.blocks[b][1][i] <= y:
+				return False
+			# a previous point of the same x is dominated
+			i += self.blocks[b][0][i] != x
+		elif self.blocks:
+			b = 0
+		else:
+			self.blocks.append(([], [], []))
+			self.firsts.append(x)
+			b = 0
+		xs, ys, payloads = self.blocks[b]
+
+		# the following points with a larger y are dominated: the end of
+		# this block, the whole blocks ending above y and a run starting the
+		# next one
+		j = i
+		while j < len(ys) and ys[j] >= y:
+			j += 1
+		if j == len(ys):
+			end = b + 1
+			while end < len(self.blocks) and self.blocks[end][1][-1] >= y:
+				end += 1
+			del self.blocks[b+1:end], self.firsts[b+1:end]
+			if b + 1 < len(self.blocks):
+				next_xs, next_ys, next_payloads = self.blocks[b+1]
+				k = 0
+				while next_ys[k] >= y:
+					k += 1
+				del next_xs[:k], next_ys[:k], next_payloads[:k]
+				self.firsts[b+1] = next_xs[0]
+		xs[i:j] = [x]
+		ys[i:j] = [y]
+		payloads[i:j] = [payload]
+		self.firsts[b] = xs[0]
+
+		if len(xs) > 2 * self.block:
+			half = len(xs) // 2
+			self.blocks.insert(b + 1, (xs[half:], ys[half:], payloads[half:]))
+			self.firsts.insert(b + 1, xs[half])
+			del xs[half:], ys[half:], payloads[half:]
+		return True
+
+	def points(self):
+		xs = [x for block in self.blocks for x in block[0]]
+		ys = [y for block in self.blocks for y in block[1]]
+		return (np.array(xs), np.array(ys), [payload for block in self.blocks for payload in block[2]])
+
+
+# indices of the rows of points (n, 2) on their own staircase, the first of
+# equal rows
+def front_2d(points):
+	order = np.lexsort(points.T[::-1])
+	ys = points[order, 1]
+	# strictly below every y of a smaller (or equal and earlier) x
+	best = np.minimum.accumulate(ys)
+	kept = np.ones(len(order), dtype=bool)
+	kept[1:] = ys[1:] < best[:-1]
+	return order[kept]
+
+
+# indices of the non-dominated rows of points (n, 3), Kung's sweep
+def front_3d(points):
+	order = np.lexsort(points.T[::-1])
+	staircase = Staircase()
+	kept = []
+	for k in order.tolist():
+		_, y, z = points[k].tolist()
+		if staircase.add(y, z):
+			kept.append(k)
+	return np.array(kept, dtype=np.int64)
+
+
+# mask of the rows of a dominated by (or equal to) a row of b
+def dominated_by(a, b):
+	dominated = np.zeros(len(a), dtype=bool)
+	for start in range(0, len(b), CHUNK):
+		block = b[start:start + CHUNK]
+		dominated |= np.all(block[None, :, :] <= a[:, None, :], axis=2).any(axis=1)
+	return dominated
+
+
+# front over 2 or 3 objectives, fed point by point or by arrays
+class ParetoFront:
+	def __init__(self, n_objectives, maximize=None):
+		if n_objectives not in (2, 3):
+			raise ValueError("Only 2 and 3 objectives are supported.")
+		self.n_objectives = n_objectives
+		self.signs = np.where(maximize or [False] * n_objectives, -1.0, 1.0)
+		self.staircase = Staircase()
+		self.archive = np.empty((0, n_objectives))
+		self.payloads = []
+
+	def __len__(self):
+		return len(self.staircase) if self.n_objectives == 2 else len(self.archive)
+
+	def add(self, objectives, payload=None):
+		self.extend(np.asarray([objectives], dtype=np.float64), [payload])
+
+	# stream in an (n, n_objectives) array and its n payloads, NaN rows are
+	# skipped
+	def extend(self, objectives, payloads):
+		objectives = np.asarray(objectives, dtype=np.float64) * self.signs
+		valid = ~np.isnan(objectives).any(axis=1)
+		if self.n_objectives == 2:
+			indices = np.flatnonzero(valid)
+			for k in np.sort(indices[front_2d(objectives[indices])]).tolist():
+				self.staircase.add(objectives[k, 0], objectives[k, 1], payloads[k])
+			return
+
+		indices = np.flatnonzero(valid)
+		indices = indices[front_3d(objectives[indices])]
+		chunk_front = objectives[indices]
+		# the chunk loses to the archive on ties, the archive keeps the first
+		new = ~dominated_by(chunk_front, self.archive)
+		chunk_front = chunk_front[new]
+		indices = indices[new]
+		keep = ~dominated_by(self.archive, chunk_front)
+		self.archive = np.concatenate((self.archive[keep], chunk_front))
+		self.payloads = [payload for payload, kept in zip(self.payloads, keep) if kept] + [payloads[k] for k in indices.tolist()]
+
+	# (objectives array, payloads) sorted by the first objective
+	def points(self):
+		if self.n_objectives == 2:
+			xs, ys, payloads = self.staircase.points()
+			objectives = np.stack((xs, ys), axis=1).reshape(-1, 2) * self.signs
+			return (objectives, payloads)
+		order = np.lexsort(self.archive.T[::-1])
+		return (self.archive[order] * self.signs, [self.payloads[k] for k in order.tolist()])
+
+
+# quadratic reference for the self check
+def brute_force_front(objectives):
+	kept = []
+	for k, point in enumerate(objectives):
+		others = np.delete(objectives, k, axis=0)
+		strictly = np.all(others <= point, axis=1) & np.any(others < point, axis=1)
+		equal_before = np.all(objectives[:k] == point, axis=1)
+		if not strictly.any() and not equal_before.any():
+			kept.append(k)
+	return kept
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Pareto fronts of the parametric circuits over area, latency and throughput per area.")
+	parser.add_argument("--n-div", type=int, nargs="+", default=[24, 53], help="divider widths, every n_add <= n_div is swept")
+	parser.add_argument("--circuits", nargs="+", choices=sorted(parametric_circuits), help="default: all")
+	parser.add_argument("--throughput", action="store_true", help="add the throughput per area, 1 / (mean latency * area), as a third objective")
+	parser.add_argument("--wall-clock", action="store_true", help="latencies in ns at the clock period of every design")
+	parser.add_argument("--distribution", choices=sorted(distributions), default="representable", help="operands of the mean latency")
+	parser.add_argument("--output-dir", default=OUTPUT_DIR, help="one CSV file per cell model")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	circuit_names = args.circuits or list(parametric_circuits)
+	model_names = list(models)
+
+	# the fronts against the quadratic definition on random points
+	rng = np.random.default_rng(0)
+	for n_objectives in (2, 3):
+		points = rng.integers(0, 20, size=(3000, n_objectives)).astype(np.float64)
+		front = ParetoFront(n_objectives)
+		for start in range(0, len(points), 500):
+			front.extend(points[start:start + 500], list(range(start, start + 500)))
+		assert sorted(front.points()[1]) == brute_force_front(points)
+	# a staircase of many small blocks, on points mostly on the front
+	points = rng.integers(0, 400, size=(2000, 1)).astype(np.float64)
+	points = np.concatenate((points, 400 - points + rng.integers(0, 3, size=points.shape)), axis=1)
+	staircase = Staircase(block=2)
+	for k, (x, y) in enumerate(points.tolist()):
+		staircase.add(x, y, k)
+	assert sorted(staircase.points()[2]) == brute_force_front(points)
+
+	# one front per cell model and divider width
+	fronts = {}
+	n_points = 0
+	for n_div in args.n_div:
+		n_add = np.arange(1, n_div + 1)
+		if args.wall_clock:
+			areas, latencies, periods = sweep(n_div, n_add, circuit_names, model_names, gate_delays=delays)
+		else:
+			areas, latencies = sweep(n_div, n_add, circuit_names, model_names)
+			periods = np.ones(areas.shape)
+		if args.throughput:
+			mean_latencies = latencies.copy()
+			if EARLY_TERMINATION_CIRCUIT in circuit_names:
+				mean_latencies[circuit_names.index(EARLY_TERMINATION_CIRCUIT)] = average_latency(n_div, n_add, args.distribution, SAMPLES)
+		for m, model in enumerate(model_names):
+			front = fronts[(model, n_div)] = ParetoFront(3 if args.throughput else 2, [False, False, True] if args.throughput else None)
+			for c, circuit in enumerate(circuit_names):
+				objectives = [areas[c, m], latencies[c] * periods[c, m]]
+				if args.throughput:
+					objectives.append(1 / (areas[c, m] * mean_latencies[c] * periods[c, m]))
+				front.extend(np.stack(objectives, axis=1), [(circuit, n_div, add) for add in n_add.tolist()])
+				n_points += len(n_add)
+
+	os.makedirs(args.output_dir, exist_ok=True)
+	columns = ["area", "latency_ns" if args.wall_clock else "latency"] + (["throughput_per_area"] if args.throughput else [])
+	print("{} points, fronts written to {}/".format(n_points, args.output_dir))
+	for model in model_names:
+		path = os.path.join(args.output_dir, "{}.csv".format(model))
+		with open(path, "w", newline="") as output:
+			writer = csv.writer(output)
+			writer.writerow(["circuit", "n_div", "n_add"] + columns)
+			for n_div in args.n_div:
+				objectives, payloads = fronts[(model, n_div)].points()
+				for (circuit, _, n_add), values in zip(payloads, objectives.tolist()):
+					writer.writerow([circuit, n_div, n_add] + values)
+				print("  {:12s} n_div = {:3d}: {:3d} non-dominated designs, {}".format(model, n_div, len(payloads),
+					", ".join("{} x {}".format(count, circuit) for circuit, count in sorted(Counter(payload[0] for payload in payloads).items()))))
+
+
+if __name__ == '__main__':
+	main()
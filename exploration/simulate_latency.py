@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+# Sweep of the cycle-accurate digit-serial divider against the latency model
+# of compute_how_many_more_divs.py
+#
+# For every (n_div, n_add) of the plots, random divisions are run through
+# divider_core.DigitSerialAdderEngine and the simulated number of clock cycles
+# is compared with the "latency" of the parametric circuit. The results are
+# also checked against the parallel adder engine.
+#
+# With --carry-save, the carry-save engine is run instead for several sizes
+# of the sign estimate, and the number of iterations needing an exact sign
+# resolution is reported along with the latency of
+# div_non_restoring_carry_save.
+#
+# usage: python exploration/simulate_latency.py [n_div ...] [--samples S] [--carry-save]
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from divider_core import CarrySaveEngine, DigitSerialAdderEngine, ParallelAdderEngine
+from compute_how_many_more_divs import parametric_circuits
+
+CIRCUIT = "div_non_restoring_bit_serial_adder_2REG"
+CARRY_SAVE_CIRCUIT = "div_non_restoring_carry_save"
+
+ESTIMATE_BITS = [2, 3, 4, 6, 8]
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Compare the simulated latency of the digit-serial divider with the latency model.")
+	parser.add_argument("n_div", type=int, nargs="*", default=[24, 53], help="divider widths (default: 24 53, the widths of the plots)")
+	parser.add_argument("--samples", type=int, default=4, help="random divisions per (n_div, n_add)")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--carry-save", action="store_true", help="sweep the sign estimate size of the carry-save engine")
+	return parser.parse_args()
+
+
+# (iteration cycles, correction cycles) of one division, the correction
+# reusing the n_add bit adder
+def simulate(n_div, n_add, dividend, divisor):
+	result = DigitSerialAdderEngine(n_div, dividend, divisor, n_add).fast_forward()
+	expected = ParallelAdderEngine(n_div, dividend, divisor).fast_forward()
+	assert result[:2] == expected[:2], "n_div = {}, n_add = {}: {} / {} differs from the parallel adder".format(n_div, n_add, dividend, divisor)
+	correction_cycles = -(-n_div // n_add) if result.correction else 0
+	return (result.cycles, correction_cycles)
+
+
+def random_operands(rng, n_div):
+	dividend = rng.randrange(-(1 << (2*n_div-1)), 1 << (2*n_div-1))
+	divisor = rng.choice([-1, 1]) * rng.randrange(1, 1 << (n_div-1))
+	return (dividend, divisor)
+
+
+# mean and largest number of exact sign resolutions per division
+def carry_save_resolutions(n_div, estimate_bits, operands):
+	resolutions = []
+	for dividend, divisor in operands:
+		engine = CarrySaveEngine(n_div, dividend, divisor, estimate_bits)
+		result = engine.fast_forward()
+		expected = ParallelAdderEngine(n_div, dividend, divisor).fast_forward()
+		assert result[:2] == expected[:2], "n_div = {}: {} / {} differs from the parallel adder".format(n_div, dividend, divisor)
+		resolutions.append(engine.resolutions)
+	return (sum(resolutions) / len(resolutions), max(resolutions))
+
+
+def carry_save_sweep(args, rng):
+	for n_div in args.n_div:
+		operands = [random_operands(rng, n_div) for _ in range(args.samples)]
+		print("n_div = {}, {} iterations".format(n_div, n_div))
+		print("  estimate bits  mean resolutions  max resolutions")
+		for estimate_bits in ESTIMATE_BITS:
+			mean, worst = carry_save_resolutions(n_div, estimate_bits, operands)
+			print("  {:13d}  {:16.2f}  {:15d}".format(estimate_bits, mean, worst))
+
+		# latency with the model estimate size, each resolution is a pass of
+		# the n_add bit adder
+		mean, _ = carry_save_resolutions(n_div, 4, operands)
+		print("  n_add  model  with resolutions")
+		for n_add in (1, n_div // 4, n_div // 2, n_div):
+			if n_add < 1:
+				continue
+			model = parametric_circuits[CARRY_SAVE_CIRCUIT](n_div, n_add)["latency"]
+			print("  {:5d}  {:5d}  {:16.1f}".format(n_add, model, model + mean * -(-n_div // n_add)))
+
+
+def main():
+	args = get_cli_args()
+	rng = random.Random(args.seed)
+
+	if args.carry_save:
+		carry_save_sweep(args, rng)
+		return
+
+	n_mismatches = 0
+	for n_div in args.n_div:
+		print("n_div = {}".format(n_div))
+		print("  n_add  model  simulated  with correction")
+		for n_add in range(1, n_div+1):
+			model = parametric_circuits[CIRCUIT](n_div, n_add)["latency"]
+
+			simulated = set()
+			worst = 0
+			for _ in range(args.samples):
+				dividend, divisor = random_operands(rng, n_div)
+				cycles, correction_cycles = simulate(n_div, n_add, dividend, divisor)
+				simulated.add(cycles)
+				worst = max(worst, cycles + correction_cycles)
+			# the iterations never depend on the operands
+			assert len(simulated) == 1
+			cycles = simulated.pop()
+
+			flag = ""
+			if cycles != model:
+				n_mismatches += 1
+				flag = "  <- model off by {}".format(cycles - model)
+			print("  {:5d}  {:5d}  {:9d}  {:15d}{}".format(n_add, model, cycles, worst, flag))
+
+	print("{} (n_div, n_add) pairs where the model differs from the simulation".format(n_mismatches))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Cycle-level throughput of a fixed-area budget of divider instances
+#
+# compute_how_many_more_divs.py counts how many bit-serial units fit in the
+# area of 16 full-width ones. This runs a stream of division requests
+# (Poisson, bursty or read from a trace file) on both configurations: the
+# requests are served in arrival order by the first free unit, each unit
+# taking the "latency" of its parametric circuit, and the free times of the
+# units are kept in an event heap.
+#
+# usage: python exploration/throughput.py [--n-div 24] [--n-add 1 4 8 ...]
+#            [--arrival poisson|bursty|trace] [--load 0.8] [--requests 1e6]
+
+import argparse
+import heapq
+import time
+
+import numpy as np
+
+from compute_how_many_more_divs import parametric_circuits, transistor_count, models
+
+CIRCUIT = "div_non_restoring_bit_serial_adder_2REG"
+BASE_UNITS = 16
+PERCENTILES = [50, 95, 99]
+
+
+# arrival cycles of count requests, rate in requests per cycle
+def poisson_arrivals(count, rate, rng):
+	return np.cumsum(rng.exponential(1 / rate, size=count))
+
+# bursts of geometric size (mean burst_size) arriving at burst_rate, separated
+# by idle gaps so that the mean rate stays rate
+def bursty_arrivals(count, rate, rng, burst_size=32, burst_factor=8):
+	burst_rate = rate * burst_factor
+	gaps = rng.exponential(1 / burst_rate, size=count)
+	# the first request of a burst also waits for the idle gap
+	starts = rng.random(count) < 1 / burst_size
+	idle = burst_size / rate - burst_size / burst_rate
+	gaps[starts] += rng.exponential(idle, size=np.count_nonzero(starts))
+	return np.cumsum(gaps)
+
+# one arrival cycle per line (text) or a 1-D .npy array
+def trace_arrivals(path):
+	if path.endswith(".npy"):
+		arrivals = np.load(path)
+	else:
+		arrivals = np.loadtxt(path, ndmin=1)
+	return np.sort(arrivals.astype(np.float64))
+
+
+# serve the requests on n_units units of latency cycles, returns the start
+# cycle of every request
+def schedule(arrivals, n_units, latency):
+	free = [0.0] * n_units # free time of every unit, a heap
+	starts = np.empty_like(arrivals)
+	heapreplace = heapq.heapreplace
+	for k, arrival in enumerate(arrivals.tolist()):
+		start = free[0]
+		if start < arrival:
+			start = arrival
+		starts[k] = start
+		heapreplace(free, start + latency)
+	return starts
+
+
+# sustained throughput, waiting time percentiles and utilization of a run
+def statistics(arrivals, starts, n_units, latency):
+	completions = starts + latency
+	makespan = completions.max() - arrivals[0]
+	waits = starts - arrivals
+	return {
+		"throughput": len(arrivals) / makespan,
+		"wait": np.percentile(waits, PERCENTILES),
+		"latency": np.percentile(waits + latency, PERCENTILES),
+		"utilization": len(arrivals) * latency / (n_units * makespan),
+	}
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Simulate the throughput of an area budget of divider units under a request stream.")
+	parser.add_argument("--n-div", type=int, default=24)
+	parser.add_argument("--n-add", type=int, nargs="+", help="adder sizes of the bit-serial units (default: 1, 2, 4, ... up to n_div)")
+	parser.add_argument("--model", choices=sorted(models), default="average", help="cell area model")
+	parser.add_argument("--arrival", choices=["poisson", "bursty", "trace"], default="poisson")
+	parser.add_argument("--trace-file", help="arrival cycles for --arrival trace")
+	parser.add_argument("--load", type=float, default=0.8, help="request rate as a fraction of the capacity of the {} full-width units".format(BASE_UNITS))
+	parser.add_argument("--requests", type=float, default=1e6)
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+	if args.arrival == "trace" and not args.trace_file:
+		parser.error("--arrival trace requires --trace-file")
+	if args.load <= 0:
+		parser.error("--load must be positive")
+	if args.arrival != "trace" and args.requests < 2:
+		parser.error("--requests must be at least 2")
+	# the arrival rate is measured over the span of the trace
+	args.trace = trace_arrivals(args.trace_file) if args.arrival == "trace" else None
+	if args.trace is not None and (len(args.trace) < 2 or args.trace[-1] == args.trace[0]):
+		parser.error("--trace-file needs at least 2 arrivals at different cycles")
+	if args.n_div < 1:
+		parser.error("--n-div must be at least 1")
+	if args.n_add and not all(1 <= n_add <= args.n_div for n_add in args.n_add):
+		parser.error("--n-add values must be in [1, n_div] ([1, {}])".format(args.n_div))
+	return args
+
+
+def main():
+	args = get_cli_args()
+	n_div = args.n_div
+	n_adds = args.n_add or sorted({min(1 << k, n_div) for k in range(n_div.bit_length() + 1)})
+
+	base = parametric_circuits[CIRCUIT](n_div, n_div)
+	budget = transistor_count(base, args.model) * BASE_UNITS
+	rate = args.load * BASE_UNITS / base["latency"]
+
+	rng = np.random.default_rng(args.seed)
+	if args.arrival == "poisson":
+		arrivals = poisson_arrivals(int(args.requests), rate, rng)
+	elif args.arrival == "bursty":
+		arrivals = bursty_arrivals(int(args.requests), rate, rng)
+	else:
+		arrivals = args.trace
+	print("{} {} requests at {:.4f} requests/cycle, area budget of {} x {} bit units ({} model)".format(len(arrivals), args.arrival, len(arrivals) / (arrivals[-1] - arrivals[0]), BASE_UNITS, n_div, args.model))
+	print("  n_add  units  latency  throughput  utilization            wait p50/p95/p99        latency p50/p95/p99  sim time")
+
+	for n_add in n_adds:
+		circuit = parametric_circuits[CIRCUIT](n_div, n_add)
+		latency = circuit["latency"]
+		n_units = BASE_UNITS if n_add == n_div else int(budget // transistor_count(circuit, args.model))
+
+		start = time.perf_counter()
+		starts = schedule(arrivals, n_units, latency)
+		elapsed = time.perf_counter() - start
+		stats = statistics(arrivals, starts, n_units, latency)
+		print("  {:5d}  {:5d}  {:7d}  {:10.4f}  {:11.1%}  {:>26s}  {:>26s}  {:6.2f} s".format(
+			n_add, n_units, latency, stats["throughput"], stats["utilization"],
+			"/".join("{:.0f}".format(w) for w in stats["wait"]),
+			"/".join("{:.0f}".format(l) for l in stats["latency"]), elapsed))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# Rendering modes shared by the figure scripts
+#
+# paper: the style of the scripts (LaTeX text), their dpi and vector
+#        output, the files are written where the scripts write them
+# draft: mathtext instead of LaTeX, the Agg backend, DRAFT_DPI and PNG
+#        output in DRAFT_DIR, for fast iteration
+#
+# The mode comes from the DIVISION_FIGURES_MODE environment variable
+# (render_figures.py sets it for its workers), so every script can also run
+# alone in draft mode:
+#
+#   DIVISION_FIGURES_MODE=draft python schematic_division.py 4 45 7
+
+import os
+
+import matplotlib
+
+MODES = ("paper", "draft")
+MODE = os.environ.get("DIVISION_FIGURES_MODE", "paper")
+if MODE not in MODES:
+	raise ValueError("DIVISION_FIGURES_MODE must be one of {}.".format(", ".join(MODES)))
+
+DRAFT_DPI = 100
+DRAFT_DIR = os.environ.get("DIVISION_FIGURES_DRAFT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "figures_draft"))
+
+if MODE == "draft":
+	matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+
+# rcParams of a script, LaTeX switched off in draft mode
+def apply_style(rc):
+	plt.rcParams.update(rc)
+	if MODE == "draft":
+		plt.rcParams["text.usetex"] = False
+
+
+def figure(**kwargs):
+	if MODE == "draft":
+		kwargs["dpi"] = DRAFT_DPI
+	return plt.figure(**kwargs)
+
+
+# save under filename (paper) or as a PNG of the same name in DRAFT_DIR
+# (draft), returns the path written
+def save(fig, filename):
+	if MODE == "draft":
+		os.makedirs(DRAFT_DIR, exist_ok=True)
+		path = os.path.join(DRAFT_DIR, os.path.splitext(os.path.basename(filename))[0] + ".png")
+		fig.savefig(path, dpi=DRAFT_DPI)
+		return path
+	fig.savefig(filename, dpi='figure')
+	return filename
+
+
+# points of every (axis, label, color, marker) series, each series drawn
+# with a single scatter call instead of one call per point
+class ScatterSeries:
+	def __init__(self):
+		self.series = {}
+
+	def add(self, axis, x, y, color, marker, label):
+		xs, ys = self.series.setdefault((axis, label, color, marker), ([], []))
+		xs.append(x)
+		ys.append(y)
+
+	def draw(self):
+		for (axis, label, color, marker), (xs, ys) in self.series.items():
+			axis.scatter(xs, ys, color=color, marker=marker, label=label)
+		self.series = {}
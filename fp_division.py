@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# IEEE 754 FP32/FP64 division front-end on top of the integer divider
+#
+# Whole float32/float64 arrays are unpacked into sign, exponent and
+# mantissa lanes (subnormals normalized), the mantissas are divided by the
+# non-restoring divider, and the quotient is rounded to nearest even from
+# its guard bit and a sticky bit (the lower bits and the remainder), with
+# gradual underflow, overflow to infinity and the special operands handled
+# as lane masks. Results are bit-exact with NumPy division, every NaN being
+# the default quiet NaN.
+#
+# FP32 mantissa quotients (24 + 2 bits) run through the batch engine of
+# batch_division.py with n = 27 (a signed 26-bit quotient and a 51-bit
+# dividend). FP64 ones (53 + 2 bits) do not fit its uint64 lanes and use the
+# same non-restoring recurrence written on the partial remainder only
+# (fraction form), in int64 lanes.
+#
+# usage: python fp_division.py [float32|float64] [number_of_divisions]
+
+import sys
+import time
+
+import numpy as np
+
+from batch_division import MAX_N, divide_batch
+
+
+class FloatFormat:
+	def __init__(self, dtype, uint, mantissa_bits, exponent_bits):
+		self.dtype = dtype
+		self.uint = uint
+		self.width = 1 + exponent_bits + mantissa_bits
+		self.mantissa_bits = mantissa_bits       # stored bits, without the hidden 1
+		self.precision = mantissa_bits + 1
+		self.exponent_max = (1 << exponent_bits) - 1
+		self.bias = (1 << (exponent_bits - 1)) - 1
+		self.quiet_nan = ((self.exponent_max << mantissa_bits) | (1 << (mantissa_bits - 1)))
+
+FORMATS = {
+	"float32": FloatFormat(np.float32, np.uint32, 23, 8),
+	"float64": FloatFormat(np.float64, np.uint64, 52, 11),
+}
+
+
+# sign, unbiased exponent and normalized mantissa (hidden bit at
+# mantissa_bits) of every lane, plus the masks of the zeros, infinities and
+# NaNs
+def unpack(values, fmt):
+	bits = values.view(fmt.uint).astype(np.int64 if fmt.width == 32 else np.uint64)
+	m = fmt.mantissa_bits
+	sign = (bits >> (fmt.width - 1)).astype(np.int64)
+	exponent_field = ((bits >> m) & fmt.exponent_max).astype(np.int64)
+	fraction = (bits & ((1 << m) - 1)).astype(np.int64)
+
+	is_special = exponent_field == fmt.exponent_max
+	is_nan = is_special & (fraction != 0)
+	is_inf = is_special & (fraction == 0)
+	is_zero = (exponent_field == 0) & (fraction == 0)
+
+	# subnormals: shift the MSB of the fraction up to the hidden bit
+	subnormal = (exponent_field == 0) & (fraction != 0)
+	bit_length = np.frexp(fraction.astype(np.float64))[1] # exact, fractions have <= 52 bits
+	shift = np.where(subnormal, m + 1 - bit_length, 0)
+	mantissa = np.where(subnormal, fraction << shift, fraction | (1 << m))
+	exponent = np.where(subnormal, 1 - fmt.bias - shift, exponent_field - fmt.bias)
+	return (sign, exponent, mantissa, is_zero, is_inf, is_nan)
+
+
+# floor(dividends * 2^extra_bits / divisors) and whether the remainder is
+# non zero, for mantissas in [2^(p-1), 2^p). The quotient is below
+# 2^(extra_bits+1) and the divisor below 2^p, both signed n-bit values of the
+# batch engine for n = max(p, extra_bits + 1) + 1
+def mantissa_quotient(dividends, divisors, precision, extra_bits):
+	n = max(precision, extra_bits + 1) + 1
+	if n <= MAX_N:
+		quotients, remainders = divide_batch(n, dividends << extra_bits, divisors)
+		return (quotients, remainders != 0)
+	return divide_fraction_lanes(dividends, divisors, extra_bits)
+
+
+# non-restoring division of int64 lanes in fraction form, dividends <
+# 2 * divisors: the quotient bits come from the sign of the partial remainder
+# and the remainder is restored once at the end
+def divide_fraction_lanes(dividends, divisors, extra_bits):
+	partial_remainder = dividends - divisors
+	quotients = (partial_remainder >= 0).astype(np.int64)
+	for i in range(extra_bits):
+		negative = partial_remainder < 0
+		partial_remainder <<= 1
+		partial_remainder += np.where(negative, divisors, -divisors)
+		quotients <<= 1
+		quotients |= partial_remainder >= 0
+	return (quotients, partial_remainder != 0) # a negative final remainder is never 0
+
+
+def divide_float(a, b):
+	a, b = np.broadcast_arrays(np.asarray(a), np.asarray(b))
+	if a.dtype != b.dtype or a.dtype.name not in FORMATS:
+		raise ValueError("Operands must both be float32 or float64 arrays.")
+	fmt = FORMATS[a.dtype.name]
+	p = fmt.precision
+	m = fmt.mantissa_bits
+	shape = a.shape
+	a = np.ascontiguousarray(a).reshape(-1)
+	b = np.ascontiguousarray(b).reshape(-1)
+
+	sign_a, exponent_a, mantissa_a, zero_a, inf_a, nan_a = unpack(a, fmt)
+	sign_b, exponent_b, mantissa_b, zero_b, inf_b, nan_b = unpack(b, fmt)
+	sign = sign_a ^ sign_b
+
+	# special lanes get operands of 1 so the datapath stays defined
+	special = zero_a | inf_a | nan_a | zero_b | inf_b | nan_b
+	mantissa_a = np.where(special, 1 << m, mantissa_a)
+	mantissa_b = np.where(special, 1 << m, mantissa_b)
+
+	# quotient of p+1 or p+2 bits, the value being quotient * 2^(exponent - p - 1)
+	quotient, sticky = mantissa_quotient(mantissa_a, mantissa_b, p, p + 1)
+	top = (quotient >> (p + 1)) & 1 # 1 when the mantissa quotient is >= 1
+	exponent = exponent_a - exponent_b - 1 + top
+	drop = 1 + top
+
+	# gradual underflow: drop more bits down to the smallest exponent
+	exponent_min = 1 - fmt.bias
+	drop += np.maximum(exponent_min - exponent, 0)
+	exponent = np.maximum(exponent, exponent_min)
+	drop = np.minimum(drop, p + 3) # everything below is sticky
+
+	# round to nearest even from the guard bit and the sticky bits
+	kept = quotient >> drop
+	dropped = quotient & ((np.int64(1) << drop) - 1)
+	half = np.int64(1) << (drop - 1)
+	round_up = (dropped > half) | ((dropped == half) & (sticky | ((kept & 1) == 1)))
+	kept += round_up
+	carry = kept >> p # rounding overflowed the mantissa
+	kept >>= carry
+	exponent += carry
+
+	# subnormal results have no hidden bit and an exponent field of 0
+	exponent_field = np.where(kept >> m, exponent + fmt.bias, 0)
+	overflow = exponent_field >= fmt.exponent_max
+	fraction = kept & ((1 << m) - 1)
+
+	result = np.where(overflow, fmt.exponent_max << m, (exponent_field << m) | fraction)
+	result = np.where(zero_a | inf_b, 0, result)
+	result = np.where(inf_a | zero_b, fmt.exponent_max << m, result)
+	result = result.astype(np.uint64) | (sign.astype(np.uint64) << np.uint64(fmt.width - 1))
+	is_nan = nan_a | nan_b | (zero_a & zero_b) | (inf_a & inf_b)
+	result = np.where(is_nan, np.uint64(fmt.quiet_nan), result)
+	return result.astype(fmt.uint).view(fmt.dtype).reshape(shape)
+
+
+# random operands over the whole encoding space: uniform bit patterns, so
+# every exponent, subnormals and specials show up
+def random_floats(fmt, count, rng):
+	bits = rng.integers(0, 1 << fmt.width, size=count, dtype=np.uint64)
+	return bits.astype(fmt.uint).view(fmt.dtype)
+
+
+# lanes where the results differ, NaNs comparing equal to any NaN
+def mismatches(results, expected):
+	same = (results.view(FORMATS[results.dtype.name].uint) == expected.view(FORMATS[results.dtype.name].uint)) | (np.isnan(results) & np.isnan(expected))
+	return np.flatnonzero(~same)
+
+
+def main():
+	fmt = FORMATS[sys.argv[1] if len(sys.argv) > 1 else "float32"]
+	count = int(float(sys.argv[2])) if len(sys.argv) > 2 else 1000000
+	rng = np.random.default_rng(0)
+
+	# uniform bit patterns, then operands of close exponents so that
+	# normal results and rounding are exercised too
+	a = random_floats(fmt, count, rng)
+	b = random_floats(fmt, count, rng)
+	close = np.arange(count) % 2 == 0
+	with np.errstate(all="ignore"):
+		b[close] = (a[close] * rng.uniform(0.5, 2, size=np.count_nonzero(close))).astype(fmt.dtype)
+
+	start = time.perf_counter()
+	results = divide_float(a, b)
+	elapsed = time.perf_counter() - start
+	with np.errstate(all="ignore"):
+		expected = a / b
+
+	wrong = mismatches(results, expected)
+	print("{}: {} divisions, {} mismatches with NumPy".format(fmt.dtype.__name__, count, len(wrong)))
+	for k in wrong[:10]:
+		print("  {!r} / {!r}: {!r} expected {!r}".format(a[k], b[k], results[k], expected[k]))
+	print("  {:.3g} divisions/s ({:.3f} us/division)".format(count / elapsed, elapsed / count * 1e6))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+# Differential fuzzer of the divider variants
+#
+# Every shard draws a seeded batch of operands, biased toward the corner
+# cases of the datapath (0, +-1, the most negative and largest values, signs
+# flipping at the top bits, divisor = dividend and exact multiples of the
+# divisor), runs it through every variant in a process pool and reports the
+# lanes where a variant disagrees with the first one. Each disagreement is
+# minimized to the smallest n and operands showing it, and the shard seeds
+# are saved so that a failure can be replayed. Like verify.py, only the pairs
+# the hardware can represent (non zero divisor, quotient in the n-bit signed
+# range) are compared, the others being drawn but skipped:
+#
+#   python fuzz.py --replay SEED N
+#
+# The variants of KNOWN_DIFFERENCES compute another quotient on purpose:
+# their disagreements are counted and minimized once, as a known class, and
+# do not fail the run. Any other disagreement is appended to --output and
+# makes the exit status non-zero, like a mismatch of verify.py.
+#
+# usage: python fuzz.py [--n N ...] [--cases C] [--workers W] [--seed S]
+#                       [--variants V ...] [--output results/fuzz_failures.jsonl]
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from batch_division import divide_batch
+from bit_sliced_division import divide_bit_sliced
+from netlist import simulate
+
+# generated files go to the ignored results/ directory of the repository
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# cases per shard
+SHARD_SIZE = 1 << 16
+
+# largest n minimized exhaustively, 2^(3n) pairs
+EXHAUSTIVE_N = 6
+
+variants = {
+	"parallel": lambda n, dividends, divisors: divide_batch(n, dividends, divisors),
+	"xor_cout": lambda n, dividends, divisors: divide_batch(n, dividends, divisors, "xor_cout"),
+	"bit_serial": lambda n, dividends, divisors: divide_bit_sliced(n, dividends, divisors)[:2],
+	"netlist": lambda n, dividends, divisors: simulate(n, max(1, n // 3), dividends, divisors)[:2],
+}
+
+# variants expected to disagree with the others
+KNOWN_DIFFERENCES = {
+	"xor_cout": "quotient rule of schematic_division_xor_cout.py",
+}
+
+
+# count signed operands of n and 2n bits, a quarter uniform and the rest
+# drawn from the corner cases
+def generate_operands(n, count, seed):
+	rng = np.random.default_rng(seed)
+	dividend_min = -(1 << (2*n - 1))
+	divisor_min = -(1 << (n - 1))
+
+	dividends = rng.integers(dividend_min, -dividend_min, size=count, dtype=np.int64)
+	divisors = rng.integers(divisor_min, -divisor_min, size=count, dtype=np.int64)
+
+	special_divisors = np.array([0, 1, -1, divisor_min, -divisor_min - 1, divisor_min + 1], dtype=np.int64)
+	special_dividends = np.array([0, 1, -1, dividend_min, -dividend_min - 1, dividend_min + 1], dtype=np.int64)
+	kind = rng.integers(0, 8, size=count)
+
+	# corner case divisors
+	pick = kind == 1
+	divisors[pick] = rng.choice(special_divisors, size=np.count_nonzero(pick))
+	# corner case dividends
+	pick = kind == 2
+	dividends[pick] = rng.choice(special_dividends, size=np.count_nonzero(pick))
+	# both
+	pick = kind == 3
+	divisors[pick] = rng.choice(special_divisors, size=np.count_nonzero(pick))
+	dividends[pick] = rng.choice(special_dividends, size=np.count_nonzero(pick))
+	# divisor = dividend
+	pick = kind == 4
+	dividends[pick] = divisors[pick]
+	# exact multiples of the divisor, the quotient in the n-bit range
+	pick = kind == 5
+	dividends[pick] = divisors[pick] * rng.integers(divisor_min, -divisor_min, size=np.count_nonzero(pick), dtype=np.int64)
+	# dividends around a sign flip of the upper half: small magnitudes
+	# around 0 and around the n-bit boundary
+	pick = kind == 6
+	offsets = rng.integers(-(1 << n), 1 << n, size=np.count_nonzero(pick), dtype=np.int64)
+	dividends[pick] = np.where(rng.integers(0, 2, size=offsets.size) == 1, offsets, offsets + (1 << (2*n - 2)) * rng.choice([-1, 1], size=offsets.size))
+	# kind 0 and 7 stay uniform
+	return (dividends, divisors)
+
+
+# mask of the pairs of verify.py: a non zero divisor and a truncated quotient
+# in [-2^(n-1), 2^(n-1)), computed on magnitudes in uint64 so that the 64 bit
+# dividends of n = 32 do not overflow
+def representable(n, dividends, divisors):
+	def magnitude(values):
+		sign = values >> 63
+		return ((values ^ sign) - sign).view(np.uint64)
+	negative = (dividends < 0) != (divisors < 0)
+	limit = magnitude(divisors) * np.where(negative, np.uint64((1 << (n - 1)) + 1), np.uint64(1 << (n - 1)))
+	return (divisors != 0) & (magnitude(dividends) < limit)
+
+
+def is_known(pair):
+	return any(name in KNOWN_DIFFERENCES for name in pair)
+
+# the variant the known differences are measured against
+def known_reference(names):
+	return next((name for name in names if name not in KNOWN_DIFFERENCES), names[0])
+
+
+# outputs of every variant and mask of the valid lanes (representable) where
+# every pair of variants disagrees
+def pair_mismatches(n, dividends, divisors, names):
+	results = {name: variants[name](n, dividends, divisors) for name in names}
+	valid = representable(n, dividends, divisors)
+	masks = {(a, b): valid & ((results[a][0] != results[b][0]) | (results[a][1] != results[b][1])) for a, b in itertools.combinations(names, 2)}
+	return (results, masks)
+
+
+# (rows, known) of the valid lanes where variants disagree: rows are the
+# (index, dividend, divisor, {variant: (quotient, remainder)}) of the
+# unexpected disagreements, known the number of lanes where every known
+# variant disagrees with known_reference
+def disagreements(n, dividends, divisors, names):
+	results, masks = pair_mismatches(n, dividends, divisors, names)
+	mismatch = np.zeros(dividends.shape, dtype=bool)
+	for pair, mask in masks.items():
+		if not is_known(pair):
+			mismatch |= mask
+	rows = []
+	for index in np.flatnonzero(mismatch):
+		outputs = {name: (int(results[name][0][index]), int(results[name][1][index])) for name in names}
+		rows.append((int(index), int(dividends[index]), int(divisors[index]), outputs))
+	reference = known_reference(names)
+	known = {}
+	for name in names:
+		if name in KNOWN_DIFFERENCES and name != reference:
+			lanes = int(np.count_nonzero(masks.get((reference, name), masks.get((name, reference)))))
+			if lanes:
+				known[name] = lanes
+	return (rows, known)
+
+
+# run one shard, returns (seed, n, number of valid cases, disagreements,
+# known disagreements)
+def fuzz_shard(shard):
+	seed, n, names = shard
+	dividends, divisors = generate_operands(n, SHARD_SIZE, seed)
+	n_valid = int(np.count_nonzero(representable(n, dividends, divisors)))
+	return (seed, n, n_valid) + disagreements(n, dividends, divisors, names)
+
+
+# pairs of variants disagreeing on one lane
+def disagreeing_pairs(outputs):
+	return [(a, b) for a, b in itertools.combinations(outputs, 2) if outputs[a] != outputs[b]]
+
+
+# smallest n (and then smallest valid operands) where variants a and b disagree,
+# exhaustive up to EXHAUSTIVE_N and fuzzed above, returns None if nothing
+# is found below n_max
+def minimize(a, b, n_max, seed=0):
+	for n in range(1, n_max + 1):
+		if n <= EXHAUSTIVE_N:
+			dividends = np.repeat(np.arange(-(1 << (2*n - 1)), 1 << (2*n - 1), dtype=np.int64), 1 << n)
+			divisors = np.tile(np.arange(-(1 << (n - 1)), 1 << (n - 1), dtype=np.int64), 1 << (2*n))
+		else:
+			dividends, divisors = generate_operands(n, SHARD_SIZE, seed)
+		results, masks = pair_mismatches(n, dividends, divisors, [a, b])
+		lanes = np.flatnonzero(masks[(a, b)])
+		if lanes.size:
+			index = min(lanes.tolist(), key=lambda lane: (abs(int(divisors[lane])), abs(int(dividends[lane])), int(dividends[lane]), int(divisors[lane])))
+			outputs = {name: (int(results[name][0][index]), int(results[name][1][index])) for name in (a, b)}
+			return {"n": n, "dividend": int(dividends[index]), "divisor": int(divisors[index]), "outputs": outputs}
+	return None
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Differential fuzzing of the divider variants.")
+	parser.add_argument("--n", type=int, nargs="+", default=[4, 8, 12, 16, 24, 32], help="divider widths, shards go round robin")
+	parser.add_argument("--cases", type=float, default=4e6, help="number of fuzzed divisions")
+	parser.add_argument("--workers", type=int, default=os.cpu_count())
+	parser.add_argument("--seed", type=int, default=0, help="seed of the first shard, shard k uses seed + k")
+	parser.add_argument("--variants", nargs="+", choices=sorted(variants), default=list(variants), help="default: all, the known differences included")
+	parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "fuzz_failures.jsonl"), help="JSON lines file the failing seeds are appended to")
+	parser.add_argument("--replay", type=int, nargs=2, metavar=("SEED", "N"), help="rerun the shard of SEED for N and print its disagreements")
+	return parser.parse_args()
+
+
+def replay(args):
+	seed, n = args.replay
+	_, _, count, rows, known = fuzz_shard((seed, n, args.variants))
+	print("seed {}, n = {}: {} disagreements in {} valid cases".format(seed, n, len(rows), count))
+	for index, dividend, divisor, outputs in rows[:20]:
+		print("  case {}: {} / {}: {}".format(index, dividend, divisor, outputs))
+	for name, lanes in sorted(known.items()):
+		print("  known: {} vs {} on {} cases".format(name, known_reference(args.variants), lanes))
+	if rows:
+		sys.exit(1)
+
+
+def main():
+	args = get_cli_args()
+	if args.replay:
+		replay(args)
+		return
+
+	n_shards = -(-int(args.cases) // SHARD_SIZE)
+	shards = [(args.seed + k, args.n[k % len(args.n)], args.variants) for k in range(n_shards)]
+	print("{} cases in {} shards on {} workers, variants {}".format(n_shards * SHARD_SIZE, n_shards, args.workers, ", ".join(args.variants)))
+
+	n_cases = 0
+	n_failing = 0
+	minimized = {}
+	known = {}
+	start = time.perf_counter()
+	os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+	with open(args.output, "a") as output, multiprocessing.Pool(args.workers) as pool:
+		for seed, n, count, rows, shard_known in pool.imap_unordered(fuzz_shard, shards):
+			n_cases += count
+			for name, lanes in shard_known.items():
+				known[name] = known.get(name, 0) + lanes
+			if rows:
+				n_failing += len(rows)
+				pairs = sorted({pair for row in rows for pair in disagreeing_pairs(row[3]) if not is_known(pair)})
+				index, dividend, divisor, outputs = rows[0]
+				failure = {"seed": seed, "n": n, "variants": args.variants, "disagreements": len(rows), "pairs": pairs, "first": {"case": index, "dividend": dividend, "divisor": divisor, "outputs": outputs}}
+				output.write(json.dumps(failure) + "\n")
+				output.flush()
+				for pair in pairs:
+					if pair not in minimized or n < minimized[pair]["searched_n"]:
+						minimized[pair] = dict(minimize(*pair, n) or {}, searched_n=n)
+		elapsed = time.perf_counter() - start
+
+	print("{} valid cases in {:.1f} s, {:.3g} cases/min".format(n_cases, elapsed, n_cases / elapsed * 60))
+	print("{} disagreeing cases{}".format(n_failing, ", failing seeds appended to {}".format(args.output) if n_failing else ""))
+	for (a, b), failure in sorted(minimized.items()):
+		if "n" in failure:
+			print("  {} vs {}: smallest n = {}, {} / {} -> {}".format(a, b, failure["n"], failure["dividend"], failure["divisor"], failure["outputs"]))
+	# the known classes, minimized once over the widths fuzzed
+	reference = known_reference(args.variants)
+	for name, lanes in sorted(known.items()):
+		failure = minimize(reference, name, max(args.n)) or {}
+		print("  known, {}: {} vs {} on {} cases, smallest n = {}, {} / {} -> {}".format(KNOWN_DIFFERENCES[name], name, reference, lanes,
+			failure.get("n"), failure.get("dividend"), failure.get("divisor"), failure.get("outputs")))
+	if n_failing:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
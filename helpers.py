@@ -1,51 +1,118 @@
 class HardwareRegister:
+	# the register content is kept as a single masked int, bit i of the int
+	# being bit i of the register (LSB first, as in get_as_list)
+	__slots__ = ("n_bits", "mask", "value")
+
 	def __init__(self, n_bits):
 		self.n_bits = n_bits
-		self.register = [0] * n_bits
+		self.mask = (1 << n_bits) - 1
+		self.value = 0
 
 	def set(self, value):
-		for i in range(self.n_bits):
-			self.register[i] = (value >> i) & 1
+		self.value = value & self.mask
 
 	def get(self):
-		return sum([(bit << i) for i, bit in enumerate(self.register)])
+		return self.value
 
 	def get_as_list(self):
-		return self.register
+		value = self.value
+		return [(value >> i) & 1 for i in range(self.n_bits)]
 
+	# left_shift/right_shift keep the semantics of the list-backed register,
+	# where the list is LSB first: left_shift drops the LSBs, right_shift
+	# drops the MSBs
 	def left_shift(self, n):
-		for _ in range(n):
-			self.register.pop(0)
-			self.register.append(0)
+		self.value >>= n
 
 	def right_shift(self, n):
-		for _ in range(n):
-			self.register.pop()
-			self.register.insert(0, 0)
+		self.value = (self.value << n) & self.mask
 
 	def as_signed(self):
-		return (self.get() + 2 ** (self.n_bits - 1)) % 2 ** self.n_bits - 2 ** (self.n_bits - 1)
+		value = self.value
+		if value >> (self.n_bits - 1):
+			return value - (1 << self.n_bits)
+		return value
 
 	def as_unsigned(self):
-		return self.get()
+		return self.value
 
 	def __getitem__(self, index):
 		if isinstance(index, slice):
-			start = index.start
-			stop = index.stop
-			step = index.step
-			return self.register[start:stop:step]
+			value = self.value
+			return [(value >> i) & 1 for i in range(*index.indices(self.n_bits))]
 		else:
 			if index < 0 or index >= self.n_bits:
 				raise IndexError("Index out of range.")
-			return (self.register[index]) & 1
+			return (self.value >> index) & 1
 
 	def __setitem__(self, index, value):
 		if index < 0 or index >= self.n_bits:
 			raise IndexError("Index out of range.")
 		if value not in [0, 1]:
 			raise ValueError("Value must be either 0 or 1.")
-		self.register[index] = value
+		if value:
+			self.value |= (1 << index)
+		else:
+			self.value &= ~(1 << index)
+
+
+# two's complement interpretation of an n_bits wide value
+def to_signed(value, n_bits):
+	value &= (1 << n_bits) - 1
+	if value >> (n_bits - 1):
+		return value - (1 << n_bits)
+	return value
+
+
+def xor(bit_a, bit_b):
+	A1 = bit_a and (not bit_b)
+	A2 = (not bit_a) and bit_b
+	return int(A1 or A2)
+
+def half_adder(bit_a, bit_b):
+	return (xor(bit_a, bit_b), bit_a and bit_b)
+
+def full_adder(bit_a, bit_b, carry=0):
+	sum1, carry1 = half_adder(bit_a, bit_b)
+	sum2, carry2 = half_adder(sum1, carry)
+	return (sum2, carry1 or carry2)
+
+def full_adder_n_bits_list(n, bits_a, bits_b, carry=0):
+	sum_bits = []
+	for i in range(n):
+		sum_bit, carry = full_adder(bits_a[i], bits_b[i], carry)
+		sum_bits.append(sum_bit)
+	return (sum_bits, carry)
+
+def full_adder_n_bits(n, bits_a, bits_b, carry=0):
+	sum_bits = 0
+	for i in range(n):
+		bit_a = (bits_a >> i) & 1
+		bit_b = (bits_b >> i) & 1
+		sum_bit, carry = full_adder(bit_a, bit_b, carry)
+		sum_bits |= (sum_bit << i)
+	return (sum_bits, carry)
+
+# one row of n full adders without carry propagation (3:2 compressor), the
+# carry of bit i is bit i of carry_bits and weighs 2^(i+1)
+def carry_save_adder(n, bits_a, bits_b, bits_c):
+	sum_bits = 0
+	carry_bits = 0
+	for i in range(n):
+		sum_bit, carry = full_adder((bits_a >> i) & 1, (bits_b >> i) & 1, (bits_c >> i) & 1)
+		sum_bits |= (sum_bit << i)
+		carry_bits |= (carry << i)
+	return (sum_bits, carry_bits)
+
+
+def binary_string_adder(bits_a, bits_b):
+	carry = 0
+	result = ''
+	for i in range(len(bits_a)-1 , -1, -1):
+		summ, carry = full_adder(int(bits_a[i]), int(bits_b[i]), carry)
+		result += str(summ)
+	result += str(carry)
+	return result[::-1]
 
 
 def main():
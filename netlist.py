@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+# Gate-level netlist IR of the divider datapath
+#
+# A Netlist is a list of nodes (INPUT, CONST, XOR, AND, OR, NOT, MUX, DFF).
+# Gates only reference nodes created before them, so the combinational part
+# is acyclic by construction; feedback goes through DFFs whose D input is
+# connected afterwards. compile_netlist levelizes the netlist and generates a
+# single straight-line Python function computing one clock cycle:
+#
+#   next_state, outputs = step(state, inputs, one=1)
+#
+# Gates are emitted as bitwise operators only, so the function runs on 0/1
+# ints, on NumPy arrays of 0/1, or on bit planes (one = all ones words).
+#
+# usage: python netlist.py n n_add [number_of_lanes]
+
+import functools
+import sys
+import time
+
+import numpy as np
+
+from batch_division import correct_lanes, divide_batch, random_operands
+from bit_sliced_division import to_bit_planes, from_bit_planes
+
+INPUT = "INPUT"
+CONST = "CONST"
+XOR = "XOR"
+AND = "AND"
+OR = "OR"
+NOT = "NOT"
+MUX = "MUX"
+DFF = "DFF"
+
+
+class Netlist:
+	__slots__ = ("kinds", "fanins", "names", "dff_d", "inputs", "outputs")
+
+	def __init__(self):
+		self.kinds = []
+		self.fanins = []
+		self.names = {}
+		self.dff_d = {}
+		self.inputs = []
+		self.outputs = {}
+		# node 0 and node 1 are the constants 0 and 1
+		self.kinds.extend((CONST, CONST))
+		self.fanins.extend(((), ()))
+
+	def _node(self, kind, fanin):
+		for node in fanin:
+			if not 0 <= node < len(self.kinds):
+				raise ValueError("Unknown node {}.".format(node))
+		self.kinds.append(kind)
+		self.fanins.append(fanin)
+		return len(self.kinds) - 1
+
+	def input(self, name):
+		node = self._node(INPUT, ())
+		self.names[node] = name
+		self.inputs.append(node)
+		return node
+
+	def dff(self, name):
+		node = self._node(DFF, ())
+		self.names[node] = name
+		return node
+
+	def connect(self, dff, d):
+		if self.kinds[dff] != DFF:
+			raise ValueError("Node {} is not a DFF.".format(dff))
+		self.dff_d[dff] = d
+
+	def output(self, name, node):
+		self.outputs[name] = node
+
+	# gates, with constant folding
+	def not_(self, a):
+		if self.kinds[a] == CONST:
+			return 1 - a
+		return self._node(NOT, (a,))
+
+	def xor(self, a, b):
+		if self.kinds[a] == CONST:
+			return self.not_(b) if a else b
+		if self.kinds[b] == CONST:
+			return self.not_(a) if b else a
+		return self._node(XOR, (a, b))
+
+	def and_(self, a, b):
+		if self.kinds[a] == CONST:
+			return b if a else 0
+		if self.kinds[b] == CONST:
+			return a if b else 0
+		return self._node(AND, (a, b))
+
+	def or_(self, a, b):
+		if self.kinds[a] == CONST:
+			return 1 if a else b
+		if self.kinds[b] == CONST:
+			return 1 if b else a
+		return self._node(OR, (a, b))
+
+	# sel ? b : a
+	def mux(self, sel, a, b):
+		if self.kinds[sel] == CONST:
+			return b if sel else a
+		if a == b:
+			return a
+		return self._node(MUX, (sel, a, b))
+
+	def half_adder(self, a, b):
+		return (self.xor(a, b), self.and_(a, b))
+
+	def full_adder(self, a, b, carry):
+		sum1, carry1 = self.half_adder(a, b)
+		sum2, carry2 = self.half_adder(sum1, carry)
+		return (sum2, self.or_(carry1, carry2))
+
+	@property
+	def dffs(self):
+		return [node for node, kind in enumerate(self.kinds) if kind == DFF]
+
+	# logic level of every node, 0 for inputs, constants and DFF outputs
+	def levelize(self):
+		levels = [0] * len(self.kinds)
+		for node, kind in enumerate(self.kinds):
+			if kind not in (INPUT, CONST, DFF):
+				levels[node] = 1 + max(levels[fanin] for fanin in self.fanins[node])
+		return levels
+
+	def gate_count(self):
+		counts = {}
+		for kind in self.kinds:
+			counts[kind] = counts.get(kind, 0) + 1
+		return counts
+
+
+_operators = {
+	XOR: "{0} ^ {1}",
+	AND: "{0} & {1}",
+	OR: "{0} | {1}",
+	NOT: "{0} ^ one",
+	MUX: "{1} ^ (({1} ^ {2}) & {0})",
+}
+
+# generate the straight-line step function of a netlist
+def compile_netlist(netlist, name="step"):
+	dffs = netlist.dffs
+	for dff in dffs:
+		if dff not in netlist.dff_d:
+			raise ValueError("DFF {} has no D input.".format(netlist.names[dff]))
+
+	# only the logic cone of the DFF inputs and outputs is emitted
+	live = set(netlist.dff_d.values()) | set(netlist.outputs.values())
+	for node in range(len(netlist.kinds) - 1, -1, -1):
+		if node in live:
+			live.update(netlist.fanins[node])
+
+	levels = netlist.levelize()
+	gates = sorted((node for node in live if netlist.kinds[node] not in (INPUT, CONST, DFF)), key=lambda node: (levels[node], node))
+
+	def wire(node):
+		if netlist.kinds[node] == CONST:
+			return "one" if node else "0"
+		return "w{}".format(node)
+
+	lines = ["def {}(state, inputs, one=1):".format(name)]
+	if dffs:
+		lines.append("\t{}, = state".format(", ".join(wire(dff) for dff in dffs)))
+	if netlist.inputs:
+		lines.append("\t{}, = inputs".format(", ".join(wire(node) for node in netlist.inputs)))
+	for node in gates:
+		operands = [wire(fanin) for fanin in netlist.fanins[node]]
+		lines.append("\t{} = {}".format(wire(node), _operators[netlist.kinds[node]].format(*operands)))
+	next_state = "".join(wire(netlist.dff_d[dff]) + ", " for dff in dffs)
+	outputs = "".join(wire(node) + ", " for node in netlist.outputs.values())
+	lines.append("\treturn ({}), ({})".format(next_state, outputs))
+	source = "\n".join(lines) + "\n"
+
+	namespace = {}
+	exec(compile(source, "<netlist {}>".format(name), "exec"), namespace)
+	return namespace[name]
+
+
+# datapath of the non-restoring divider with an n_add bits adder
+#
+# state: dividend D (2n), divisor V (n), quotient Q (n), carry C, op OP
+# inputs: start (first cycle of an iteration: sample the signs, shift the
+# dividend and the quotient, carry in = 1-op) and the one-hot chunk select
+# sel_k of the ceil(n/n_add) chunks of the divisor
+def build_divider(n, n_add):
+	netlist = Netlist()
+	n_chunks = -(-n // n_add)
+
+	dividend = [netlist.dff("D{}".format(j)) for j in range(2*n)]
+	divisor = [netlist.dff("V{}".format(j)) for j in range(n)]
+	quotient = [netlist.dff("Q{}".format(j)) for j in range(n)]
+	carry = netlist.dff("C")
+	op = netlist.dff("OP")
+
+	start = netlist.input("start")
+	select = [netlist.input("sel{}".format(k)) for k in range(n_chunks)]
+
+	# signs and operation (xor: addition if 1, substraction if 0)
+	op_new = netlist.xor(dividend[2*n-1], divisor[n-1])
+	op_to_perform = netlist.mux(start, op, op_new)
+	not_op = netlist.not_(op_to_perform)
+	carry_in_adder = netlist.mux(start, carry, not_op)
+
+	# left shift of the dividend and quotient registers on start
+	shifted = [netlist.mux(start, dividend[j], dividend[j-1] if j else 0) for j in range(2*n)]
+	netlist.connect(quotient[0], netlist.mux(start, quotient[0], netlist.not_(op_new)))
+	for j in range(1, n):
+		netlist.connect(quotient[j], netlist.mux(start, quotient[j], quotient[j-1]))
+
+	# n_add bits adder on the selected chunk
+	sums = []
+	for t in range(n_add):
+		operand_a_adder = 0
+		divisor_bit = 0
+		for k in range(n_chunks):
+			j = k*n_add + t
+			if j < n:
+				operand_a_adder = netlist.or_(operand_a_adder, netlist.and_(select[k], shifted[n+j]))
+				divisor_bit = netlist.or_(divisor_bit, netlist.and_(select[k], divisor[j]))
+		# divisor bit or its complement (MUX on op_to_perform)
+		operand_b_adder = netlist.xor(divisor_bit, not_op)
+		s_out, carry_in_adder = netlist.full_adder(operand_a_adder, operand_b_adder, carry_in_adder)
+		sums.append(s_out)
+
+	# write back of the sum into the selected chunk of the dividend upper half
+	for j in range(2*n):
+		d = shifted[j]
+		if j >= n:
+			k, t = divmod(j - n, n_add)
+			d = netlist.mux(select[k], d, sums[t])
+		netlist.connect(dividend[j], d)
+	for j in range(n):
+		netlist.connect(divisor[j], divisor[j])
+	netlist.connect(carry, carry_in_adder)
+	netlist.connect(op, op_to_perform)
+
+	return netlist
+
+
+@functools.lru_cache(maxsize=None)
+def compile_divider(n, n_add):
+	return compile_netlist(build_divider(n, n_add), "divider_{}_{}".format(n, n_add))
+
+
+# control inputs of every clock cycle of one iteration
+def control_sequence(n, n_add, zero=0, one=1):
+	n_chunks = -(-n // n_add)
+	return [tuple([one if k == 0 else zero] + [one if c == k else zero for c in range(n_chunks)]) for k in range(n_chunks)]
+
+
+# run the compiled datapath on bit planes of a batch of divisions, returns
+# the signed quotients and remainders and the number of clock cycles
+def simulate(n, n_add, dividends, divisors):
+	step = compile_divider(n, n_add)
+	dividends, divisors = np.broadcast_arrays(np.asarray(dividends), np.asarray(divisors))
+	n_lanes = dividends.size
+
+	dividend_planes = to_bit_planes(dividends, 2*n)
+	divisor_planes = to_bit_planes(divisors, n)
+	zero = np.zeros_like(divisor_planes[0])
+	ones = ~zero
+	state = tuple(dividend_planes) + tuple(divisor_planes) + (zero,) * (n + 2)
+	sequence = control_sequence(n, n_add, zero, ones)
+
+	cycles = 0
+	for i in range(n):
+		for inputs in sequence:
+			state, _ = step(state, inputs, ones)
+			cycles += 1
+
+	dividend_reg = from_bit_planes(state[:2*n], n_lanes)
+	divisor_reg = from_bit_planes(state[2*n:3*n], n_lanes)
+	quotient_reg = from_bit_planes(state[3*n:4*n], n_lanes)
+	sign_dividend_ff = from_bit_planes(dividend_planes[2*n-1:], n_lanes)
+	quotients, remainders, _ = correct_lanes(n, quotient_reg, dividend_reg, divisor_reg, sign_dividend_ff)
+	return (quotients.reshape(dividends.shape), remainders.reshape(dividends.shape), cycles)
+
+
+def main():
+	n = int(sys.argv[1])
+	n_add = int(sys.argv[2])
+	count = int(sys.argv[3]) if len(sys.argv) > 3 else 4096
+
+	start = time.perf_counter()
+	netlist = build_divider(n, n_add)
+	compile_divider(n, n_add)
+	build_time = time.perf_counter() - start
+	levels = netlist.levelize()
+	print("n = {}, n_add = {}: {} nodes, depth {}, built and compiled in {:.3f} s".format(n, n_add, len(netlist.kinds), max(levels), build_time))
+	print("  gates: {}".format(netlist.gate_count()))
+
+	dividends, divisors = random_operands(n, count)
+	start = time.perf_counter()
+	quotients, remainders, cycles = simulate(n, n_add, dividends, divisors)
+	elapsed = time.perf_counter() - start
+
+	expected_quotients, expected_remainders = divide_batch(n, dividends, divisors)
+	assert np.array_equal(quotients, expected_quotients), "quotient mismatch with the batch engine"
+	assert np.array_equal(remainders, expected_remainders), "remainder mismatch with the batch engine"
+	print("  {} lanes in {} cycles, {:.3f} us/division, bit-exact with the batch engine".format(count, cycles, elapsed / count * 1e6))
+
+	# scalar evaluation of the first lane, one function call per clock cycle
+	step = compile_divider(n, n_add)
+	dividend = int(dividends[0]) & ((1 << (2*n)) - 1)
+	divisor = int(divisors[0]) & ((1 << n) - 1)
+	state = tuple((dividend >> j) & 1 for j in range(2*n)) + tuple((divisor >> j) & 1 for j in range(n)) + (0,) * (n + 2)
+	for i in range(n):
+		for inputs in control_sequence(n, n_add):
+			state, _ = step(state, inputs)
+	registers = [np.array([sum(bit << j for j, bit in enumerate(bits))], dtype=np.uint64) for bits in (state[3*n:4*n], state[:2*n], state[2*n:3*n])]
+	quotient, remainder, _ = correct_lanes(n, *registers, np.array([dividend >> (2*n - 1)], dtype=np.uint64))
+	assert (quotient[0], remainder[0]) == (quotients[0], remainders[0]), "scalar evaluation mismatch"
+	print("  scalar: {} / {} -> quotient {} remainder {}".format(dividends[0], divisors[0], quotient[0], remainder[0]))
+
+if __name__ == "__main__":
+	main()
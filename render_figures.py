@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Render the figures of the paper in parallel
+#
+# Every figure script of FIGURES runs as __main__ in its own worker process
+# (a fresh matplotlib per figure), from its own directory and with its
+# command line. The rendering mode is passed through DIVISION_FIGURES_MODE
+# (see figures.py): "paper" renders with LaTeX at the dpi of the scripts,
+# "draft" with mathtext, Agg and a low dpi into figures_draft/.
+#
+# The workers share the LaTeX cache of matplotlib (tex.cache in its cache
+# directory), so the labels already typeset by an earlier run are not
+# typeset again. --tex-cache points all the workers to another, persistent,
+# cache directory.
+#
+# usage: python render_figures.py [figure ...] [--draft] [--workers W] [--tex-cache DIR]
+
+import argparse
+import multiprocessing
+import os
+import runpy
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# name: (script, command line)
+FIGURES = {
+	"division": ("schematic_division.py", ["4", "45", "7"]),
+	"division_bit_serial": ("schematic_division_n_bit_adder.py", ["4", "45", "7"]),
+	"division_xor_cout": ("schematic_division_xor_cout.py", ["4", "45", "7"]),
+	"how_many_more": (os.path.join("exploration", "compute_how_many_more_divs.py"), []),
+	"area_vs_latency": (os.path.join("exploration", "generate_exploration_plot.py"), []),
+}
+
+
+# run one figure script, returns (name, seconds, error or None)
+def render(job):
+	name, mode, draft_dir, tex_cache = job
+	script, argv = FIGURES[name]
+	path = os.path.join(ROOT, script)
+	os.environ["DIVISION_FIGURES_MODE"] = mode
+	os.environ["DIVISION_FIGURES_DRAFT_DIR"] = draft_dir
+	if tex_cache:
+		os.environ["MPLCONFIGDIR"] = tex_cache
+
+	start = time.perf_counter()
+	os.chdir(os.path.dirname(path))
+	sys.argv = [path] + argv
+	sys.path.insert(0, os.path.dirname(path))
+	# the scripts print their results, keep the output of the pipeline
+	stdout = sys.stdout
+	try:
+		with open(os.devnull, "w") as devnull:
+			sys.stdout = devnull
+			runpy.run_path(path, run_name="__main__")
+		error = None
+	except Exception as exception:
+		error = "{}: {}".format(type(exception).__name__, exception)
+	finally:
+		sys.stdout = stdout
+	return (name, time.perf_counter() - start, error)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Render the figures in parallel worker processes.")
+	parser.add_argument("figures", nargs="*", choices=[[]] + sorted(FIGURES), help="default: all")
+	parser.add_argument("--draft", action="store_true", help="mathtext, Agg, low dpi PNGs in --draft-dir")
+	parser.add_argument("--draft-dir", default=os.path.join(ROOT, "figures_draft"))
+	parser.add_argument("--workers", type=int, default=os.cpu_count())
+	parser.add_argument("--tex-cache", help="matplotlib cache directory of the workers (LaTeX cache)")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	names = args.figures or list(FIGURES)
+	mode = "draft" if args.draft else "paper"
+	tex_cache = os.path.abspath(args.tex_cache) if args.tex_cache else None
+	jobs = [(name, mode, os.path.abspath(args.draft_dir), tex_cache) for name in names]
+
+	start = time.perf_counter()
+	failed = 0
+	# one process per figure, so that the matplotlib state of a script does
+	# not leak into the next one
+	with multiprocessing.Pool(min(args.workers, len(jobs)), maxtasksperchild=1) as pool:
+		for name, elapsed, error in pool.imap_unordered(render, jobs):
+			print("  {:20s} {:6.2f} s  {}".format(name, elapsed, error or "ok"))
+			failed += error is not None
+	print("{} figures ({} mode) in {:.2f} s, {} failed".format(len(jobs), mode, time.perf_counter() - start, failed))
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# Columnar result files, between the compute and the plot stages of the
+# figure scripts
+#
+# A result set is a directory of tables, every column of a table being a
+# .npy file (memory-mapped when read back) and every table also written as
+# a CSV file, plus a manifest.json holding the fingerprint of the inputs,
+# the columns of every table and the scalar metadata:
+#
+#   results/area_vs_latency/
+#     manifest.json
+#     points.csv
+#     points.area.npy
+#     points.latency.npy
+#     ...
+#
+# The fingerprint hashes whatever the computation depends on (parameters,
+# definitions of the circuits and models, source files). A plot stage calls
+# load_or_compute(), which only runs the compute stage when no result set
+# with the same fingerprint is on disk, so tweaking a figure does not rerun
+# its computation. The manifest is written last, a result set interrupted
+# while being written is computed again.
+#
+# .npy files are used rather than a single .npz because the members of a
+# zip archive cannot be memory-mapped.
+#
+# usage: python results.py DIRECTORY  (prints a result set)
+
+import csv
+import hashlib
+import json
+import os
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+
+class Results(NamedTuple):
+	tables: dict    # {table: {column: array}}
+	metadata: dict
+	fingerprint: str
+
+
+def file_hash(path):
+	with open(path, "rb") as source:
+		return hashlib.sha256(source.read()).hexdigest()
+
+
+# hash of the parts of the inputs of a computation, by their repr (file
+# contents go through file_hash)
+def fingerprint(*parts):
+	digest = hashlib.sha256("results {}".format(FORMAT_VERSION).encode())
+	for part in parts:
+		digest.update(repr(part).encode())
+		digest.update(b"\0")
+	return digest.hexdigest()
+
+
+def column_path(directory, table, column):
+	return os.path.join(directory, "{}.{}.npy".format(table, column))
+
+
+# write tables ({table: {column: sequence}}) and metadata (JSON values)
+def save(directory, tables, fingerprint, metadata=None):
+	os.makedirs(directory, exist_ok=True)
+	manifest_path = os.path.join(directory, MANIFEST)
+	if os.path.exists(manifest_path):
+		os.remove(manifest_path)
+
+	manifest = {"version": FORMAT_VERSION, "fingerprint": fingerprint, "metadata": metadata or {}, "tables": {}}
+	for table, columns in tables.items():
+		arrays = {column: np.asarray(values) for column, values in columns.items()}
+		lengths = {len(array) for array in arrays.values()}
+		if len(lengths) > 1:
+			raise ValueError("The columns of table {} have different lengths.".format(table))
+		for column, array in arrays.items():
+			if array.dtype.kind == "O":
+				raise ValueError("Column {}.{} is an object array, which cannot be memory-mapped.".format(table, column))
+			np.save(column_path(directory, table, column), array, allow_pickle=False)
+
+		with open(os.path.join(directory, "{}.csv".format(table)), "w", newline="") as output:
+			writer = csv.writer(output)
+			writer.writerow(list(arrays))
+			writer.writerows(zip(*(array.tolist() for array in arrays.values())))
+
+		manifest["tables"][table] = {column: {"dtype": array.dtype.str, "length": len(array)} for column, array in arrays.items()}
+
+	with open(manifest_path + ".tmp", "w") as output:
+		json.dump(manifest, output, indent=1)
+	os.replace(manifest_path + ".tmp", manifest_path)
+
+
+# the result set of a directory, memory-mapped, None if there is none or if
+# its fingerprint differs from the given one
+def load(directory, fingerprint=None):
+	try:
+		with open(os.path.join(directory, MANIFEST)) as manifest_file:
+			manifest = json.load(manifest_file)
+	except (OSError, ValueError):
+		return None
+	if manifest.get("version") != FORMAT_VERSION or (fingerprint is not None and manifest["fingerprint"] != fingerprint):
+		return None
+
+	tables = {}
+	for table, columns in manifest["tables"].items():
+		tables[table] = {}
+		for column, description in columns.items():
+			path = column_path(directory, table, column)
+			if not os.path.exists(path):
+				return None
+			# empty arrays cannot be memory-mapped
+			array = np.load(path, mmap_mode="r" if description["length"] else None, allow_pickle=False)
+			if array.dtype.str != description["dtype"] or len(array) != description["length"]:
+				return None
+			tables[table][column] = array
+	return Results(tables, manifest["metadata"], manifest["fingerprint"])
+
+
+# the result set of fingerprint in directory, computed (and saved) only if
+# it is not on disk or if recompute is set. compute() returns (tables,
+# metadata). Returns (results, whether it was computed)
+def load_or_compute(directory, fingerprint, compute, recompute=False):
+	results = None if recompute else load(directory, fingerprint)
+	if results is not None:
+		return (results, False)
+	tables, metadata = compute()
+	save(directory, tables, fingerprint, metadata)
+	return (load(directory, fingerprint), True)
+
+
+def main():
+	results = load(sys.argv[1])
+	if results is None:
+		sys.exit("No result set in {}.".format(sys.argv[1]))
+	print("fingerprint {}".format(results.fingerprint))
+	for key, value in results.metadata.items():
+		print("  {}: {}".format(key, value))
+	for table, columns in results.tables.items():
+		print("table {}".format(table))
+		for column, array in columns.items():
+			print("  {:20s} {:8s} {:8d} rows".format(column, array.dtype.str, len(array)))
+
+
+if __name__ == "__main__":
+	main()
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 
 from helpers import *
+from tracing import Tracer, OFF, SUMMARY, ITERATION
+from divider_core import ParallelAdderEngine, state_signals, result_signals
 import matplotlib.pyplot as plt
+import numpy as np
+import figures
+from results import fingerprint, file_hash, load_or_compute
 from matplotlib.gridspec import GridSpec
+import os
 import sys
 
 # Figure width base on the column width of the Latex document.
@@ -41,53 +47,70 @@ def set_size(width, fraction=1, subplots=(1, 1)):
     return fig_dim
 
 
-def xor(bit_a, bit_b):
-	A1 = bit_a and (not bit_b)
-	A2 = (not bit_a) and bit_b
-	return int(A1 or A2)
+# inputs of the compute stage besides its parameters
+ENGINE_SOURCES = ("divider_core.py", "helpers.py")
 
-def half_adder(bit_a, bit_b):
-	return (xor(bit_a, bit_b), bit_a and bit_b)
+# result sets go to the ignored results/ directory next to the script
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
 
-def full_adder(bit_a, bit_b, carry=0):
-	sum1, carry1 = half_adder(bit_a, bit_b)
-	sum2, carry2 = half_adder(sum1, carry)
-	return (sum2, carry1 or carry2)
+# compute stage: the dividend before and after every left shift of the
+# division, and its result
+def compute(n, dividend, divisor, tracer, trace_path):
+	# division engine, see divider_core.py
+	engine = ParallelAdderEngine(n, dividend, divisor)
 
-def full_adder_n_bits_list(n, bits_a, bits_b, carry=0):
-	sum_bits = []
-	for i in range(n):
-		sum_bit, carry = full_adder(bits_a[i], bits_b[i], carry)
-		sum_bits.append(sum_bit)
-	return (sum_bits, carry)
+	trace_iterations = tracer.level >= ITERATION
+	if trace_iterations:
+		iterations = tracer.table("iteration", state_signals(n))
 
-def full_adder_n_bits(n, bits_a, bits_b, carry=0):
-	sum_bits = 0
-	for i in range(n):
-		bit_a = (bits_a >> i) & 1
-		bit_b = (bits_b >> i) & 1
-		sum_bit, carry = full_adder(bit_a, bit_b, carry)
-		sum_bits |= (sum_bit << i)
-	return (sum_bits, carry)
+	# plot values
+	dividends = []
+
+	# main loop, one state per clock cycle
+	dividend = engine.dividend_reg.get()
+	for state in engine.steps():
+		# dividend before and after the left shift
+		dividends.append(to_signed(dividend, 2*n))
+		dividends.append(to_signed(state.shifted_dividend, 2*n))
+		dividend = state.dividend
+
+		if trace_iterations:
+			iterations.append(*state)
+
+	# quotient correction
+	result = engine.result()
 
+	if tracer.level >= SUMMARY:
+		summary = tracer.table("summary", result_signals(n))
+		summary.append(*result)
+		tracer.dump(trace_path)
 
-def binary_string_adder(bits_a, bits_b):
-	carry = 0
-	result = ''
-	for i in range(len(bits_a)-1 , -1, -1):
-		summ, carry = full_adder(int(bits_a[i]), int(bits_b[i]), carry)
-		result += str(summ)
-	result += str(carry)
-	return result[::-1]
+	# 2n-bit values wider than int64 are stored as decimal strings
+	dividends = np.array(dividends, dtype=np.int64 if 2*n <= 64 else str)
+	return ({"dividends": {"step": np.arange(len(dividends)), "dividend": dividends}},
+		{"quotient": int(result.quotient), "remainder": int(result.remainder)})
 
 
 def main():
 
 	# n-bit divisor / module parameter
 	n = int(sys.argv[1])
+	divisor = int(sys.argv[3])
+
+	# tracing: python schematic_division.py n dividend divisor [level [file]]
+	# level: off, summary, iteration, cycle (or 0-3)
+	tracer = Tracer(sys.argv[4] if len(sys.argv) > 4 else OFF)
+	trace_path = sys.argv[5] if len(sys.argv) > 5 else os.path.join(RESULTS_DIR, "division_trace.npz")
+
+	# compute stage, skipped if its results are up to date (tracing always
+	# runs the division)
+	sources = [file_hash(os.path.join(os.path.dirname(os.path.abspath(__file__)), source)) for source in ENGINE_SOURCES]
+	stored, _ = load_or_compute(os.path.join(RESULTS_DIR, "division"), fingerprint(n, int(sys.argv[2]), divisor, sources),
+		lambda: compute(n, int(sys.argv[2]), divisor, tracer, trace_path), tracer.level > OFF)
+	dividends = [int(value) for value in stored.tables["dividends"]["dividend"].tolist()]
 
 	# setup some stuff about ploting
-	fig = plt.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
+	fig = figures.figure(constrained_layout=True, figsize=set_size(fig_text_width), dpi=500)
 	fig.tight_layout(pad=0)
 	gs = GridSpec(1, 1, figure=fig)
 	# Creating the axis.
@@ -98,93 +121,6 @@ def main():
 	axis.grid(color='grey', linestyle='--', linewidth=0.25, axis='y')
 	axis.set_axisbelow(True)
 
-
-
-	# signal declaration
-	divisor_reg  = HardwareRegister(n)
-	dividend_reg = HardwareRegister(2*n)
-	sign_divisor_ff = HardwareRegister(1)
-	sign_dividend_ff = HardwareRegister(1)
-
-	# output register
-	quotient_reg = HardwareRegister(n)
-	remainder_reg = HardwareRegister(n)
-	quotient_reg.set(0)
-	remainder_reg.set(0)
-
-	# init state
-	divisor_reg.set(int(sys.argv[3]))
-	dividend_reg.set(int(sys.argv[2]))
-	sign_divisor_ff.set(divisor_reg[n-1])
-	sign_dividend_ff.set(dividend_reg[2*n-1])
-
-
-	# plot values
-	dividends = []
-
-	# main loop
-	for i in range(n): # n clock cycles
-
-		print("clock cycle: ", i)
-
-		# get the signs of the divisor and dividend
-		sign_divisor = divisor_reg[n-1]
-		sign_dividend = dividend_reg[2*n-1]
-
-		print("   dividend: " + str(dividend_reg.get_as_list()))
-		print("   dividend as bin: {0:08b}".format(dividend_reg.get()))
-		print(dividend_reg.as_signed())
-		print(dividend_reg.get())
-
-		if (sign_dividend==0):
-			print(((dividend_reg.get()>>n) & ((2**n)-1)))
-		else:
-			print(-((dividend_reg.get()>>n) & ((2**n)-1)))
-
-		dividends.append(dividend_reg.as_signed())
-		# left shift the dividend register
-		#print(dividend_reg.as_signed()*2)
-		dividend_reg.set(dividend_reg.get() << 1)
-		dividends.append(dividend_reg.as_signed())
-
-		# print signs
-		print("   sign_divisor: " + str(sign_divisor))
-		print("   sign_dividend: " + str(sign_dividend))
-
-		# get the mathematical operation to do depending on the signs
-		op_to_perform = sign_divisor ^ sign_dividend # xor: addition if 1, substraction if 0
-		print("   op to perform: ", op_to_perform)
-
-		# get the 1 complement of the divisor
-		divisor_1_complement = ~divisor_reg.get() & ((2**n)-1)
-		print("   divisor_1_complement: ", bin(divisor_1_complement))
-
-		# get the adder operand depending on op_to_perform (MUX)
-		if op_to_perform == 1:
-			print("   addition")
-			operand_b_adder = divisor_reg.get()
-		else:
-			operand_b_adder = divisor_1_complement
-			print("   substraction")
-
-		# n bit adder. todo verify if n+1 with signs is needed
-		carry_in_adder = 1-op_to_perform
-		print("   carry_in_adder: ", carry_in_adder)
-		operand_a_adder = (dividend_reg.get()>>n) & ((2**n)-1) # get the n msb of the 2xdividend
-		print("   operand_a_adder: ", bin(operand_a_adder))
-		print("   operand_b_adder: ", bin(operand_b_adder))
-		s_out, c_out = full_adder_n_bits(n, operand_a_adder, operand_b_adder, carry_in_adder)
-		print("  s_out: ", bin(s_out))
-		print("  c_out: ", bin(c_out))
-
-		# c_out xored with divisor sign is inputed to quotient register at index i
-		# this could be implemented with always input at LSB and shift left
-		#quotient_reg[i] = c_out ^ sign_divisor
-		quotient_reg[n-1-i] = 1-(sign_dividend ^ sign_divisor)
-
-		# s_out is used to update the dividend register upper part without affecting the lower part
-		dividend_reg.set((dividend_reg.get() & ((2**n)-1)) | (s_out<<n))
-
 	# plot black lines connecting the point
 	#line, = axis.plot( dividends, color='black', linewidth=0.5, marker='o', markersize=8, markerfacecolor='black', markeredgecolor='black', markeredgewidth=0.5)
 	line, = axis.plot( dividends, color='black', marker="x")
@@ -210,59 +146,18 @@ def main():
 			operation = "+" if dividends[i] >= dividends[i-1] else "-"
 
 			# For the +/- operation, use the calculated midpoint in the y-axis
-			value_to_display = rf"${operation}2^{n}\cdot {abs(int(sys.argv[3]))}$"
+			value_to_display = rf"${operation}2^{n}\cdot {abs(divisor)}$"
 			offset_y = 10 if operation == "+" else -10
 			axis.annotate(value_to_display, (mid_x, mid_y), textcoords="offset points", xytext=(0, offset_y), ha='center')
 
-	# print the partial results, before quotient correction
-	print("\n------")
-	print("partial results before correction")
-	print("  quotient: " + str(quotient_reg.get_as_list()))
-	print("  quotient: " + str(quotient_reg.get()))
-	print("  quotient: " + str(bin(quotient_reg.get())))
-	print("  quotient as signed: " + str(quotient_reg.as_signed()))
-	print("  remainder: " + str(dividend_reg.get_as_list())) # the remainder is the dividend at the end of the division
-	print("  remainder as signed: " + str(dividend_reg.as_signed()>>n)) # the remainder is the dividend at the end of the division
-
-
-	# quotient correction
-	print("\n------")
-	print("quotient correction")
-	remainder_reg.set(dividend_reg.get()>>n)
-	quotient_reg[n-1] = 1 - quotient_reg[n-1]
-	print("quotient", bin(quotient_reg.get()))
-	q_o = (quotient_reg.get()<<1)+1 # shift left and insert 1 at LSB
-	print("quotient", bin(q_o))
-	quotient_reg.set(q_o)
-
-
-	if dividend_reg[2*n-1] != sign_dividend_ff.get():
-		if dividend_reg[2*n-1] == sign_divisor_ff.get():
-			print("  quotient++")
-			q_o = (q_o + 1) & ((2**n)-1) # add 1 and mask to get n bits
-			quotient_reg.set(q_o)
-			remainder_reg.set(remainder_reg.get() - divisor_reg.get())
-		else:
-			print("  quotient--")
-			q_o = (q_o - 1) & ((2**n)-1) # add 1 and mask to get n bits
-			quotient_reg.set(q_o)
-			remainder_reg.set(remainder_reg.get() + divisor_reg.get())
-
-
-		#else:
-		# 	print("  quotient-- AND remainder = remainder + divisor")
-		# 	q_o = (q_o - 1) & 0b1111 # add 1 and mask to get n bits
-		# 	quotient_reg.set(q_o)
-		# 	remainder_reg.set((dividend_reg.get()>>n) + divisor_reg.get())
-
 	# final results
 	print("\n------")
 	print("final results")
-	print("  quotient as signed: " + str(quotient_reg.as_signed()))
-	print("  remainder: " + str(remainder_reg.as_signed()))
+	print("  quotient as signed: " + str(stored.metadata["quotient"]))
+	print("  remainder: " + str(stored.metadata["remainder"]))
 
 	# plot the results
-	fig.savefig('division.svg', dpi='figure')
+	figures.save(fig, 'division.svg')
 	plt.close(fig='all')
 
 if __name__ == "__main__":
@@ -287,5 +182,5 @@ if __name__ == "__main__":
 	    'axes.grid': True,
 	    'axes.grid.which': 'both'
 	}
-	plt.rcParams.update(tex_fonts)
+	figures.apply_style(tex_fonts)
 	main()
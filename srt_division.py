@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+# SRT division engines, radix 2 and radix 4
+#
+# The divisor magnitude is normalized (shifted left until its MSB is bit
+# n-1) and every iteration retires one quotient digit from the redundant set
+# {-a, ..., a} (a = 1 for radix 2, a = 2 for radix 4). The digit is picked
+# by a small selection table indexed by a few MSBs of the shifted partial
+# remainder and of the normalized divisor, so the full width add is no
+# longer needed to choose the next operation. The digits are assimilated on
+# the fly into Q and QM = Q - 1 and the last negative partial remainder
+# selects QM, which replaces the correction adder of the non-restoring
+# divider.
+#
+# Unlike the non-restoring scripts, the results are the truncating division
+# (quotient rounded toward zero, remainder with the sign of the dividend)
+# for every divisor != 0 whose quotient fits n signed bits.
+#
+# usage: python srt_division.py n [dividend divisor]
+
+import sys
+from fractions import Fraction
+
+from divider_core import DividerEngine, CycleState, DivisionResult
+from helpers import HardwareRegister, to_signed
+
+# bits of the normalized divisor (leading 1 included) and fractional bits of
+# the shifted partial remainder looked at by the selection tables
+DIVISOR_BITS = {2: 1, 4: 4}
+REMAINDER_BITS = {2: 1, 4: 3}
+
+
+# quotient digit selection table of radix with the digit set {-a, ..., a},
+# table[d][t] is the digit for the normalized divisor interval
+# [d/2^divisor_bits, (d+1)/2^divisor_bits) and the shifted partial remainder
+# interval [t/2^remainder_bits, (t+1)/2^remainder_bits), t starting at
+# offset
+def selection_table(radix, a, divisor_bits, remainder_bits):
+	rho = Fraction(a, radix - 1) # redundancy factor, |w| <= rho * d
+	unit = Fraction(1, 1 << remainder_bits)
+	d_unit = Fraction(1, 1 << divisor_bits)
+	y_max = radix * rho # |shifted partial remainder| <= radix * rho * d < radix * rho
+	offset = -int(y_max / unit) - 1
+
+	table = []
+	for d in range(1 << (divisor_bits - 1), 1 << divisor_bits):
+		d_low = d * d_unit
+		d_high = d_low + d_unit
+		row = []
+		for t in range(offset, -offset):
+			y_low = t * unit
+			y_high = y_low + unit
+			reachable = y_low < y_max * d_high and y_high > -y_max * d_high
+			digit = None
+			for k in sorted(range(-a, a + 1), key=abs):
+				# y - k*d must stay in [-rho*d, rho*d] over the whole cell, the
+				# reachable region already bounds y for the extreme digits
+				upper = k == a or y_high <= (k + rho) * (d_low if k + rho > 0 else d_high)
+				lower = k == -a or y_low >= (k - rho) * (d_high if k - rho > 0 else d_low)
+				if upper and lower:
+					digit = k
+					break
+			if digit is None:
+				if reachable:
+					raise ValueError("No quotient digit for radix {}, divisor {}, remainder {}.".format(radix, d_low, y_low))
+				digit = a if t > 0 else -a
+			row.append(digit)
+		table.append(row)
+	return (table, offset)
+
+
+class SrtEngine(DividerEngine):
+	radix = 2
+
+	def __init__(self, n, dividend, divisor):
+		super().__init__(n, dividend, divisor)
+		radix = self.radix
+		self.log_radix = radix.bit_length() - 1
+		self.table, self.table_offset = SELECTION_TABLES[radix]
+		self.divisor_bits = DIVISOR_BITS[radix]
+		self.remainder_bits = REMAINDER_BITS[radix]
+
+		# sign and magnitude of the operands
+		dividend = self.dividend_reg.as_signed()
+		divisor = self.divisor_reg.as_signed()
+		self.sign_quotient = int((dividend < 0) != (divisor < 0))
+		self.sign_remainder = int(dividend < 0)
+
+		# normalization: the MSB of the divisor magnitude goes to bit n-1
+		divisor = abs(divisor)
+		self.shift = n - divisor.bit_length()
+		self.normalized_divisor = divisor << self.shift
+
+		# one extra digit for radix 4 keeps the first partial remainder in
+		# the convergence range for every n
+		self.n_digits = n if radix == 2 else n // 2 + 1
+		self.partial_remainder_reg = HardwareRegister(3*n + 4)
+		self.partial_remainder_reg.set(abs(dividend) << self.shift)
+		self.q_reg = HardwareRegister(n + 2)
+		self.qm_reg = HardwareRegister(n + 2)
+		self.qm_reg.set(-1)
+
+	@property
+	def done(self):
+		return self.iteration == self.n_digits
+
+	def _select(self, partial_remainder, weight):
+		# truncated shifted partial remainder, partial_remainder / weight
+		# with remainder_bits fractional bits
+		position = self.n + weight - self.remainder_bits
+		if position >= 0:
+			t = partial_remainder >> position
+		else:
+			t = partial_remainder << -position
+		t = min(max(t, self.table_offset), -self.table_offset - 1)
+		d = (self.normalized_divisor << self.divisor_bits) >> self.n
+		d = max(d, 1 << (self.divisor_bits - 1)) # divisor of 0
+		return self.table[d - (1 << (self.divisor_bits - 1))][t - self.table_offset]
+
+	def _step(self):
+		radix = self.radix
+		log_radix = self.log_radix
+		# weight of the digit of this iteration
+		weight = log_radix * (self.n_digits - 1 - self.iteration)
+
+		partial_remainder = self.partial_remainder_reg.as_signed()
+		self.shifted_dividend = self.partial_remainder_reg.get()
+		digit = self._select(partial_remainder, weight)
+
+		# R - digit * D * radix^j, the multiples of D being shifts (MUX)
+		partial_remainder -= (digit * self.normalized_divisor) << weight
+		self.partial_remainder_reg.set(partial_remainder)
+
+		# on-the-fly conversion of the digits into Q and QM = Q - 1
+		q = self.q_reg.get()
+		qm = self.qm_reg.get()
+		if digit > 0:
+			self.q_reg.set((q << log_radix) + digit)
+			self.qm_reg.set((q << log_radix) + digit - 1)
+		elif digit == 0:
+			self.q_reg.set(q << log_radix)
+			self.qm_reg.set((qm << log_radix) + radix - 1)
+		else:
+			self.q_reg.set((qm << log_radix) + radix + digit)
+			self.qm_reg.set((qm << log_radix) + radix - 1 + digit)
+
+		self.op_to_perform = int(digit < 0) # addition if 1, substraction (or nothing) if 0
+		self.quotient_bit = digit
+		self.cycle += 1
+		self.iteration += 1
+
+	def steps(self):
+		while not self.done:
+			cycle = self.cycle
+			iteration = self.iteration
+			self._step()
+			yield CycleState(cycle, iteration, self.shifted_dividend, self.partial_remainder_reg.get(), self.op_to_perform, 0, self.quotient_bit)
+
+	def fast_forward(self):
+		step = self._step
+		while not self.done:
+			step()
+		return self.result()
+
+	def result(self):
+		if self._result is not None:
+			return self._result
+		if not self.done:
+			raise RuntimeError("The division is not finished.")
+
+		n = self.n
+		partial_quotient = self.q_reg.get()
+		partial_remainder = self.partial_remainder_reg.as_signed()
+
+		# a negative last partial remainder selects QM and adds the divisor back
+		correction = 0
+		quotient = self.q_reg.get()
+		remainder = partial_remainder
+		if remainder < 0:
+			correction = 2
+			quotient = self.qm_reg.get()
+			remainder += self.normalized_divisor
+		remainder >>= self.shift
+
+		if self.sign_quotient:
+			quotient = -quotient
+		if self.sign_remainder:
+			remainder = -remainder
+		self.quotient_reg.set(quotient)
+		self.remainder_reg.set(remainder)
+
+		self._result = DivisionResult(self.quotient_reg.as_signed(), self.remainder_reg.as_signed(), self.cycle, correction, partial_quotient, to_signed(partial_remainder >> self.shift, n))
+		return self._result
+
+
+class SrtRadix2Engine(SrtEngine):
+	radix = 2
+
+
+class SrtRadix4Engine(SrtEngine):
+	radix = 4
+
+
+SELECTION_TABLES = {
+	2: selection_table(2, 1, DIVISOR_BITS[2], REMAINDER_BITS[2]),
+	4: selection_table(4, 2, DIVISOR_BITS[4], REMAINDER_BITS[4]),
+}
+
+engines = {
+	"srt2": SrtRadix2Engine,
+	"srt4": SrtRadix4Engine,
+}
+
+
+# exhaustive check against the truncating division for every representable
+# (dividend, divisor) pair, returns the number of mismatches
+def check_exhaustive(n, engine_class):
+	mismatches = 0
+	for divisor in range(-(1 << (n-1)), 1 << (n-1)):
+		if divisor == 0:
+			continue
+		for dividend in range(-(1 << (2*n-1)), 1 << (2*n-1)):
+			quotient = abs(dividend) // abs(divisor)
+			if (dividend < 0) != (divisor < 0):
+				quotient = -quotient
+			if not -(1 << (n-1)) <= quotient < (1 << (n-1)):
+				continue
+			result = engine_class(n, dividend, divisor).fast_forward()
+			if (result.quotient, result.remainder) != (quotient, dividend - quotient * divisor):
+				mismatches += 1
+	return mismatches
+
+
+def main():
+	n = int(sys.argv[1])
+
+	if len(sys.argv) > 3:
+		dividend = int(sys.argv[2])
+		divisor = int(sys.argv[3])
+		for name, engine_class in engines.items():
+			engine = engine_class(n, dividend, divisor)
+			digits = [state.quotient_bit for state in engine.steps()]
+			result = engine.result()
+			print("{}: {} cycles, digits {}, quotient {} remainder {}".format(name, result.cycles, digits, result.quotient, result.remainder))
+		return
+
+	for radix, (table, offset) in SELECTION_TABLES.items():
+		print("radix {} selection table ({} x {}):".format(radix, len(table), len(table[0])))
+		print("\n".join("  " + " ".join("{:2d}".format(digit) for digit in row) for row in table))
+	for name, engine_class in engines.items():
+		print("{}: {} cycles, {} mismatches against the truncating division".format(name, engine_class(n, 0, 1).fast_forward().cycles, check_exhaustive(n, engine_class)))
+
+
+if __name__ == "__main__":
+	main()
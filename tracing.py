@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Structured tracing of the division scripts
+#
+# The scripts record signals into columnar in-memory tables (one NumPy
+# array per signal) instead of printing them, and the tables are dumped to a
+# binary .npz file. Callers hoist the level test out of their loops:
+#
+#   tracer = Tracer(level)
+#   trace_cycles = tracer.level >= CYCLE
+#   ...
+#   if trace_cycles:
+#       cycles.append(...)
+#
+# so a disabled trace costs one test of a local boolean per loop body.
+#
+# usage: python tracing.py trace.npz   (prints the content of a dump)
+
+import json
+import os
+import sys
+
+import numpy as np
+
+OFF = 0
+SUMMARY = 1
+ITERATION = 2
+CYCLE = 3
+
+LEVELS = {"off": OFF, "summary": SUMMARY, "iteration": ITERATION, "cycle": CYCLE}
+
+WORD_BITS = 64
+
+
+# one columnar table, every signal has a bit width and is stored as uint64
+# words (several words per row for signals wider than 64 bits)
+class TraceTable:
+	__slots__ = ("names", "widths", "columns", "length")
+
+	def __init__(self, signals, capacity=1024):
+		self.names = [name for name, _ in signals]
+		self.widths = [width for _, width in signals]
+		self.columns = [np.zeros((capacity, -(-width // WORD_BITS)), dtype=np.uint64) for width in self.widths]
+		self.length = 0
+
+	def _grow(self):
+		self.columns = [np.concatenate((column, np.zeros_like(column))) for column in self.columns]
+
+	# one row, values in the order of the signals
+	def append(self, *values):
+		row = self.length
+		if row == len(self.columns[0]):
+			self._grow()
+		for column, value in zip(self.columns, values):
+			if column.shape[1] == 1:
+				column[row, 0] = value & 0xFFFFFFFFFFFFFFFF
+			else:
+				for word in range(column.shape[1]):
+					column[row, word] = (value >> (word * WORD_BITS)) & 0xFFFFFFFFFFFFFFFF
+		self.length = row + 1
+
+	def arrays(self):
+		return {name: column[:self.length] for name, column in zip(self.names, self.columns)}
+
+
+class Tracer:
+	__slots__ = ("level", "tables")
+
+	# level: OFF..CYCLE, or its name or number as a string (command lines)
+	def __init__(self, level=OFF):
+		if isinstance(level, str):
+			if level.isdigit():
+				level = int(level)
+			elif level in LEVELS:
+				level = LEVELS[level]
+			else:
+				raise ValueError("Unknown trace level {!r}, expected one of {} or 0-{}.".format(level, ", ".join(LEVELS), CYCLE))
+		if not OFF <= level <= CYCLE:
+			raise ValueError("Trace level {} is not in 0-{}.".format(level, CYCLE))
+		self.level = level
+		self.tables = {}
+
+	def table(self, name, signals):
+		table = TraceTable(signals)
+		self.tables[name] = table
+		return table
+
+	def dump(self, path):
+		arrays = {}
+		meta = {"level": self.level, "tables": {}}
+		for table_name, table in self.tables.items():
+			meta["tables"][table_name] = dict(zip(table.names, table.widths))
+			for signal, column in table.arrays().items():
+				arrays["{}.{}".format(table_name, signal)] = column
+		arrays["meta"] = np.array(json.dumps(meta))
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		np.savez(path, **arrays)
+
+
+# read a dump back as {table: {signal: array}}, signals up to 64 bits are
+# uint64 arrays, wider ones object arrays of Python ints
+def load_trace(path):
+	with np.load(path) as dump:
+		meta = json.loads(str(dump["meta"]))
+		tables = {}
+		for table_name, signals in meta["tables"].items():
+			tables[table_name] = {}
+			for signal, width in signals.items():
+				column = dump["{}.{}".format(table_name, signal)]
+				if column.shape[1] == 1:
+					tables[table_name][signal] = column[:, 0]
+				else:
+					values = np.zeros(len(column), dtype=object)
+					for word in range(column.shape[1]):
+						values += np.array([int(v) << (word * WORD_BITS) for v in column[:, word]], dtype=object)
+					tables[table_name][signal] = values
+	return tables
+
+
+def main():
+	for table_name, signals in load_trace(sys.argv[1]).items():
+		print(table_name)
+		names = list(signals)
+		print("  " + " ".join(names))
+		for row in zip(*signals.values()):
+			print("  " + " ".join(str(value) for value in row))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Exhaustive verification of the divider against truncating division
+#
+# Every signed (2n-bit dividend, n-bit divisor) pair is enumerated, sharded
+# across a process pool and run through a batch engine. The results are
+# compared with a reference truncating division (quotient rounded toward
+# zero, remainder with the sign of the dividend) and every mismatch is
+# streamed to a CSV file.
+#
+# Pairs the hardware cannot represent (divisor of 0, quotient outside of the
+# n-bit signed range) are skipped unless --all is given.
+#
+# usage: python verify.py n [--workers W] [--output results/mismatches.csv]
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from batch_division import divide_batch
+from bit_sliced_division import divide_bit_sliced
+
+# largest dividend block handled by one shard
+SHARD_SIZE = 1 << 22
+
+# n is limited so that the reference division never overflows int64
+MAX_N = 31
+
+engines = {
+	"batch": divide_batch,
+	"bit-sliced": lambda n, dividends, divisors: divide_bit_sliced(n, dividends, divisors)[:2],
+}
+
+# generated files go to the ignored results/ directory of the repository
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+MISMATCH_HEADER = "dividend,divisor,quotient,remainder,expected_quotient,expected_remainder"
+
+
+# reference truncating division, divisors must be non zero
+def truncating_divide(dividends, divisors):
+	quotients = np.abs(dividends) // np.abs(divisors)
+	quotients = np.where((dividends < 0) != (divisors < 0), -quotients, quotients)
+	return (quotients, dividends - quotients * divisors)
+
+
+# (n, engine, divisor, first dividend, last dividend + 1) of every shard
+def shards(n, engine):
+	first_dividend = -(1 << (2*n - 1))
+	last_dividend = 1 << (2*n - 1)
+	for divisor in range(-(1 << (n - 1)), 1 << (n - 1)):
+		for start in range(first_dividend, last_dividend, SHARD_SIZE):
+			yield (n, engine, divisor, start, min(start + SHARD_SIZE, last_dividend))
+
+
+# verify one shard, returns (number of checked pairs, number of skipped
+# pairs, array of mismatch rows)
+def verify_shard(shard, check_all=False):
+	n, engine, divisor, start, stop = shard
+	dividends = np.arange(start, stop, dtype=np.int64)
+	divisors = np.full_like(dividends, divisor)
+
+	quotients, remainders = engines[engine](n, dividends, divisors)
+
+	if divisor == 0:
+		expected_quotients = np.zeros_like(dividends)
+		expected_remainders = np.zeros_like(dividends)
+		in_range = np.zeros(dividends.shape, dtype=bool)
+	else:
+		expected_quotients, expected_remainders = truncating_divide(dividends, divisors)
+		in_range = (expected_quotients >= -(1 << (n - 1))) & (expected_quotients < (1 << (n - 1)))
+	checked = np.ones_like(in_range) if check_all else in_range
+
+	mismatch = checked & ((quotients != expected_quotients) | (remainders != expected_remainders))
+	rows = np.stack((dividends, divisors, quotients, remainders, expected_quotients, expected_remainders), axis=1)[mismatch]
+	n_checked = int(np.count_nonzero(checked))
+	return (n_checked, dividends.size - n_checked, rows)
+
+def verify_shard_all(shard):
+	return verify_shard(shard, check_all=True)
+
+
+def get_cli_args():
+	parser = argparse.ArgumentParser(description="Exhaustively verify the divider for all n-bit operand pairs.")
+	parser.add_argument("n", type=int, help="divisor width, the dividend is 2n bits")
+	parser.add_argument("--engine", choices=sorted(engines), default="batch")
+	parser.add_argument("--workers", type=int, default=os.cpu_count())
+	parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "mismatches.csv"), help="CSV file receiving the mismatches")
+	parser.add_argument("--all", action="store_true", help="also check divisions by zero and quotient overflows")
+	return parser.parse_args()
+
+
+def main():
+	args = get_cli_args()
+	n = args.n
+	if not 1 <= n <= MAX_N:
+		sys.exit("n must be in [1, {}]".format(MAX_N))
+
+	total = 1 << (3*n)
+	n_shards = (1 << n) * -(-(1 << (2*n)) // SHARD_SIZE)
+	print("n = {}: {} operand pairs in {} shards on {} workers ({} engine)".format(n, total, n_shards, args.workers, args.engine))
+
+	n_checked = 0
+	n_skipped = 0
+	n_mismatches = 0
+	done = 0
+	start = time.perf_counter()
+	worker = verify_shard_all if args.all else verify_shard
+	os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+	with open(args.output, "w") as output, multiprocessing.Pool(args.workers) as pool:
+		output.write(MISMATCH_HEADER + "\n")
+		for checked, skipped, rows in pool.imap_unordered(worker, shards(n, args.engine)):
+			n_checked += checked
+			n_skipped += skipped
+			n_mismatches += len(rows)
+			if len(rows):
+				np.savetxt(output, rows, fmt="%d", delimiter=",")
+				output.flush()
+			done += 1
+			if done % max(1, n_shards // 100) == 0 or done == n_shards:
+				elapsed = time.perf_counter() - start
+				print("\r  {:6.2f}% {} mismatches, {:.3g} div/s".format(100 * done / n_shards, n_mismatches, n_checked / elapsed), end="", flush=True)
+	elapsed = time.perf_counter() - start
+	print()
+
+	print("checked:    {}".format(n_checked))
+	print("skipped:    {} (division by zero or quotient overflow)".format(n_skipped))
+	print("mismatches: {} written to {}".format(n_mismatches, args.output))
+	# the rate of the pairs compared, the skipped ones are not results
+	print("time:       {:.2f} s, {:.3g} checked divisions/s/core".format(elapsed, n_checked / elapsed / args.workers))
+	sys.exit(1 if n_mismatches else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Wide-operand (hundreds to thousands of bits) mode of the non-restoring
+# divider of schematic_division.py
+#
+# Same algorithm and same results as divider_core.ParallelAdderEngine, but
+# the registers are plain Python ints: the masks and the complement of the
+# divisor are computed once per division, the dividend register is kept as
+# its upper and lower halves so the shift never touches 2n bits, the n-bit
+# adder is a native int addition and the quotient bits are shifted into an
+# int. A cycle is then a handful of big-int operations.
+#
+# usage: python wide_division.py n [number_of_divisions]
+
+import random
+import sys
+import time
+
+from divider_core import ParallelAdderEngine
+
+
+# signed n-bit quotient and remainder of a signed 2n-bit dividend by a signed
+# n-bit divisor
+def divide_wide(n, dividend, divisor):
+	mask = (1 << n) - 1
+	sign_shift = n - 1
+
+	divisor &= mask
+	dividend &= (1 << (2*n)) - 1
+	upper = dividend >> n
+	lower = dividend & mask
+
+	# operands of the adder and carry in, for op_to_perform 0 and 1
+	operand_sub = (~divisor & mask) + 1 # complement and carry in folded
+	operand_add = divisor
+
+	sign_divisor = divisor >> sign_shift
+	sign_dividend_ff = upper >> sign_shift
+
+	quotient = 0
+	for _ in range(n):
+		sign_dividend = upper >> sign_shift
+
+		# left shift the dividend register
+		upper = ((upper << 1) | (lower >> sign_shift)) & mask
+		lower = (lower << 1) & mask
+
+		# addition if 1, substraction if 0
+		op_to_perform = sign_divisor ^ sign_dividend
+		if op_to_perform:
+			upper = (upper + operand_add) & mask
+		else:
+			upper = (upper + operand_sub) & mask
+		quotient = (quotient << 1) | (1 - op_to_perform)
+
+	# quotient correction
+	remainder = upper
+	quotient ^= 1 << sign_shift
+	quotient = ((quotient << 1) + 1) & mask # shift left and insert 1 at LSB
+
+	sign_remainder = upper >> sign_shift
+	if sign_remainder != sign_dividend_ff:
+		if sign_remainder == sign_divisor:
+			quotient = (quotient + 1) & mask
+			remainder = (remainder - divisor) & mask
+		else:
+			quotient = (quotient - 1) & mask
+			remainder = (remainder + divisor) & mask
+
+	if quotient >> sign_shift:
+		quotient -= 1 << n
+	if remainder >> sign_shift:
+		remainder -= 1 << n
+	return (quotient, remainder)
+
+
+# random signed operands, divisors are non zero
+def random_wide_operands(n, count, seed=0):
+	rng = random.Random(seed)
+	operands = []
+	for _ in range(count):
+		dividend = rng.randrange(-(1 << (2*n-1)), 1 << (2*n-1))
+		divisor = rng.choice([-1, 1]) * rng.randrange(1, 1 << (n-1))
+		operands.append((dividend, divisor))
+	return operands
+
+
+def main():
+	n = int(sys.argv[1])
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+	operands = random_wide_operands(n, count)
+
+	start = time.perf_counter()
+	results = [divide_wide(n, dividend, divisor) for dividend, divisor in operands]
+	wide_time = (time.perf_counter() - start) / count
+
+	start = time.perf_counter()
+	for (dividend, divisor), result in zip(operands, results):
+		expected = ParallelAdderEngine(n, dividend, divisor).fast_forward()[:2]
+		if result != expected:
+			print("{} / {}: engine {} wide {}".format(dividend, divisor, expected, result))
+			sys.exit(1)
+	engine_time = (time.perf_counter() - start) / count
+
+	print("n = {}, {} divisions checked against the parallel adder engine".format(n, count))
+	print("  engine: {:.3f} ms/division".format(engine_time * 1e3))
+	print("  wide:   {:.3f} ms/division".format(wide_time * 1e3))
+	print("  speedup: {:.0f}x".format(engine_time / wide_time))
+
+
+if __name__ == "__main__":
+	main()